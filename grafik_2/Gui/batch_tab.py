@@ -0,0 +1,412 @@
+# Gui/batch_tab.py
+import os
+import time
+import threading
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                               QPushButton, QMessageBox, QFileDialog, QGroupBox,
+                               QProgressBar, QTableWidget, QTableWidgetItem,
+                               QHeaderView, QAbstractItemView)
+from PySide6.QtCore import Qt, Signal, QThread
+from PySide6.QtGui import QFont, QColor
+from .model_handler import model_handler
+from .history_model import VERDICT_COLORS
+from neurosignature.batch_inference import (read_pairs_csv, pairs_from_directory, pairs_against_reference,
+                             collect_images, result_stages, REFERENCE_DIR, QUESTIONED_DIR)
+from neurosignature.stage_timer import TOTAL
+from neurosignature.inference_engine import INTERACTIVE, BATCH
+
+
+# Результаты передаются в GUI пачками, чтобы не перегружать очередь сигналов
+RESULTS_EMIT_SIZE = 16
+
+TABLE_COLUMNS = ["№", "Эталон", "Проверяемая", "Сходство", "Вердикт", "Время, мс"]
+
+
+class BatchWorker(QThread):
+    results = Signal(list)
+    progress = Signal(int, int)
+    finished = Signal(int)
+    error = Signal(str)
+
+    def __init__(self, pairs):
+        super().__init__()
+        self.pairs = pairs
+        self.cancelled = False
+        # Событие установлено - работа идет, сброшено - пауза
+        self.running = threading.Event()
+        self.running.set()
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self.running.set()
+
+    def run(self):
+        done = 0
+        buffer = []
+        try:
+            results = model_handler.verify_batch(self.pairs)
+            try:
+                for result in results:
+                    buffer.append(result)
+                    done += 1
+                    if len(buffer) >= RESULTS_EMIT_SIZE or done == len(self.pairs):
+                        self.results.emit(buffer)
+                        self.progress.emit(done, len(self.pairs))
+                        buffer = []
+
+                    # Пауза между результатами останавливает и декодирование следующих пачек
+                    self.running.wait()
+                    if self.cancelled:
+                        break
+            finally:
+                results.close()
+
+            if buffer:
+                self.results.emit(buffer)
+                self.progress.emit(done, len(self.pairs))
+            self.finished.emit(done)
+
+        except Exception as e:
+            self.error.emit(f"Ошибка пакетной проверки: {str(e)}")
+
+
+class BatchTab(QWidget):
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.pairs = []
+        self.reference_path = None
+        self.worker = None
+        self.started_at = None
+        self.paused_at = None
+        self.paused_total = 0.0
+        self.setAcceptDrops(True)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(10, 10, 10, 10)
+
+        # Заголовок
+        title_label = QLabel("Пакетная проверка подписей")
+        title_label.setFont(QFont("Arial", 14, QFont.Bold))
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+
+        description = QLabel(
+            f"Выберите CSV с парами (img1,img2[,label]), папку с подкаталогами "
+            f"{REFERENCE_DIR}/ и {QUESTIONED_DIR}/ или перетащите файлы для сравнения с эталоном"
+        )
+        description.setAlignment(Qt.AlignCenter)
+        description.setWordWrap(True)
+        description.setStyleSheet("color: #cccccc;")
+        layout.addWidget(description)
+
+        # Источник пар
+        source_group = QGroupBox("Источник")
+        source_layout = QHBoxLayout(source_group)
+
+        csv_btn = QPushButton("📄 CSV пар")
+        csv_btn.clicked.connect(self.select_csv)
+        source_layout.addWidget(csv_btn)
+
+        folder_btn = QPushButton("📁 Папка")
+        folder_btn.clicked.connect(self.select_folder)
+        source_layout.addWidget(folder_btn)
+
+        reference_btn = QPushButton("🖼 Эталон")
+        reference_btn.clicked.connect(self.select_reference)
+        source_layout.addWidget(reference_btn)
+
+        files_btn = QPushButton("➕ Файлы")
+        files_btn.clicked.connect(self.select_files)
+        source_layout.addWidget(files_btn)
+
+        self.source_label = QLabel("Пары не выбраны")
+        self.source_label.setStyleSheet("color: #cccccc; font-size: 11px; padding: 5px;")
+        self.source_label.setWordWrap(True)
+        source_layout.addWidget(self.source_label, 1)
+
+        layout.addWidget(source_group)
+
+        # Управление
+        control_group = QGroupBox("Проверка")
+        control_layout = QVBoxLayout(control_group)
+
+        buttons_layout = QHBoxLayout()
+        self.start_btn = QPushButton("▶ Начать")
+        self.start_btn.clicked.connect(self.start_batch)
+        self.start_btn.setEnabled(False)
+        buttons_layout.addWidget(self.start_btn)
+
+        self.pause_btn = QPushButton("⏸ Пауза")
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.pause_btn.setEnabled(False)
+        buttons_layout.addWidget(self.pause_btn)
+
+        self.cancel_btn = QPushButton("⏹ Отмена")
+        self.cancel_btn.clicked.connect(self.cancel_batch)
+        self.cancel_btn.setEnabled(False)
+        buttons_layout.addWidget(self.cancel_btn)
+        control_layout.addLayout(buttons_layout)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMinimum(0)
+        self.progress_bar.setValue(0)
+        control_layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel("Выберите пары для проверки")
+        self.status_label.setStyleSheet("color: #cccccc; font-size: 11px; padding: 5px;")
+        control_layout.addWidget(self.status_label)
+
+        layout.addWidget(control_group)
+
+        # Результаты
+        result_group = QGroupBox("Результаты")
+        result_layout = QVBoxLayout(result_group)
+
+        self.results_table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.results_table.setHorizontalHeaderLabels(TABLE_COLUMNS)
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.verticalHeader().setVisible(False)
+        header = self.results_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.Stretch)
+        result_layout.addWidget(self.results_table)
+
+        layout.addWidget(result_group, 1)
+
+    # ===== ВЫБОР ПАР =====
+
+    def select_csv(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите CSV с парами", "", "CSV (*.csv);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            self.set_pairs(read_pairs_csv(file_path), f"CSV: {os.path.basename(file_path)}")
+        except Exception as e:
+            self.show_error(f"Ошибка чтения CSV: {str(e)}")
+
+    def select_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Выберите папку с подписями")
+        if folder:
+            self.load_paths([folder])
+
+    def select_files(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Выберите подписи для проверки", "",
+            "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff);;All Files (*)"
+        )
+        if file_paths:
+            self.load_paths(file_paths)
+
+    def select_reference(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите эталонную подпись", "",
+            "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff);;All Files (*)"
+        )
+        if file_path:
+            self.reference_path = file_path
+            self.status_label.setText(f"Эталон: {os.path.basename(file_path)}")
+
+    def load_paths(self, paths):
+        """Папка с reference/ и questioned/ или набор файлов для сравнения с эталоном"""
+        try:
+            if len(paths) == 1 and os.path.isdir(os.path.join(paths[0], REFERENCE_DIR)):
+                self.set_pairs(pairs_from_directory(paths[0]), f"Папка: {paths[0]}")
+                return
+
+            if not self.reference_path:
+                self.show_error("Сначала выберите эталонную подпись")
+                return
+            if not collect_images(paths):
+                self.show_error("Изображения не найдены")
+                return
+            self.set_pairs(
+                pairs_against_reference(self.reference_path, paths),
+                f"Сравнение с эталоном {os.path.basename(self.reference_path)}"
+            )
+        except Exception as e:
+            self.show_error(str(e))
+
+    def set_pairs(self, pairs, source):
+        if self.worker and self.worker.isRunning():
+            self.show_error("Пакетная проверка уже выполняется")
+            return
+        self.pairs = pairs
+        self.source_label.setText(f"{source} — пар: {len(pairs)}")
+        self.start_btn.setEnabled(bool(pairs))
+        self.status_label.setText("Готово к проверке" if pairs else "Пары не найдены")
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.toLocalFile()]
+        csv_paths = [path for path in paths if path.lower().endswith('.csv')]
+        if csv_paths:
+            try:
+                self.set_pairs(read_pairs_csv(csv_paths[0]), f"CSV: {os.path.basename(csv_paths[0])}")
+            except Exception as e:
+                self.show_error(f"Ошибка чтения CSV: {str(e)}")
+        elif paths:
+            self.load_paths(paths)
+
+    # ===== ВЫПОЛНЕНИЕ =====
+
+    def start_batch(self):
+        if not self.pairs:
+            return
+        if self.worker and self.worker.isRunning():
+            self.show_error("Пакетная проверка уже выполняется")
+            return
+
+        self.results_table.setRowCount(0)
+        self.progress_bar.setMaximum(len(self.pairs))
+        self.progress_bar.setValue(0)
+        self.started_at = time.monotonic()
+        self.paused_at = None
+        self.paused_total = 0.0
+
+        self.worker = BatchWorker(self.pairs)
+        self.worker.results.connect(self.on_results)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_batch_finished)
+        self.worker.error.connect(self.on_batch_error)
+        self.worker.start()
+
+        self.start_btn.setEnabled(False)
+        self.pause_btn.setEnabled(True)
+        self.pause_btn.setText("⏸ Пауза")
+        self.cancel_btn.setEnabled(True)
+        self.status_label.setText("Проверка запущена...")
+
+    def toggle_pause(self):
+        if not self.worker:
+            return
+        if self.paused_at is None:
+            self.worker.pause()
+            self.paused_at = time.monotonic()
+            self.pause_btn.setText("▶ Продолжить")
+            self.status_label.setText("Пауза")
+        else:
+            self.worker.resume()
+            self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.pause_btn.setText("⏸ Пауза")
+
+    def cancel_batch(self):
+        if self.worker:
+            self.worker.cancel()
+            self.status_label.setText("Отмена...")
+
+    def on_results(self, results):
+        history_tab = getattr(self.main_window, 'history_tab', None)
+        for result in results:
+            stage_ms = result_stages(result)
+            self.add_result_row(result, stage_ms)
+            if history_tab and result['score'] is not None:
+                history_tab.add_to_history(
+                    f"{os.path.basename(result['img1'])} vs {os.path.basename(result['img2'])}",
+                    "",
+                    "Пакетная проверка",
+                    score=result['score'],
+                    model_id=result['model_id'],
+                    image_hashes=result['hashes'],
+                    duration_ms=stage_ms[TOTAL],
+                    stage_ms=stage_ms
+                )
+
+    def add_result_row(self, result, stage_ms):
+        row = self.results_table.rowCount()
+        self.results_table.insertRow(row)
+
+        if result['error']:
+            similarity, verdict = "—", f"ОШИБКА: {result['error']}"
+            color = QColor("#e74c3c")
+        else:
+            similarity = f"{result['score'] * 100:.1f}%"
+            verdict = result['verdict'] + (" (кэш)" if result['cached'] else "")
+            color = QColor(VERDICT_COLORS.get(result['confidence_level'], "#cccccc"))
+
+        values = [
+            str(row + 1),
+            os.path.basename(result['img1']),
+            os.path.basename(result['img2']),
+            similarity,
+            verdict,
+            f"{stage_ms[TOTAL]:.0f}",
+        ]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if column == 4:
+                item.setForeground(color)
+            self.results_table.setItem(row, column, item)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+        if self.paused_at is not None:
+            return
+
+        elapsed = time.monotonic() - self.started_at - self.paused_total
+        throughput = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / throughput if throughput > 0 else 0.0
+        # Ожидание в очереди движка: одиночные проверки идут раньше пакетных
+        stats = model_handler.engine.stats()
+        classes = stats['classes']
+        self.status_label.setText(
+            f"Обработано {done} из {total} • {throughput:.1f} пар/с • осталось ~{self.format_duration(eta)}"
+            f" • пачка {stats['batch_size']}"
+            f" • очередь p95: одиночные {classes[INTERACTIVE]['wait_ms_p95']:.0f} мс,"
+            f" пакетные {classes[BATCH]['wait_ms_p95']:.0f} мс"
+        )
+
+    def on_batch_finished(self, done):
+        self.reset_controls()
+        elapsed = time.monotonic() - self.started_at - self.paused_total
+        text = f"Готово: {done} из {len(self.pairs)} пар за {self.format_duration(elapsed)}"
+        self.status_label.setText(text)
+        self.main_window.update_status(text)
+
+    def on_batch_error(self, message):
+        self.reset_controls()
+        self.status_label.setText(message)
+        self.show_error(message)
+
+    def reset_controls(self):
+        self.start_btn.setEnabled(bool(self.pairs))
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setText("⏸ Пауза")
+        self.cancel_btn.setEnabled(False)
+        self.paused_at = None
+
+    def shutdown(self):
+        """Остановка пакетной проверки при закрытии окна"""
+        if self.worker and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+
+    def format_duration(self, seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f"{hours} ч {minutes} мин"
+        if minutes:
+            return f"{minutes} мин {seconds} с"
+        return f"{seconds} с"
+
+    def show_error(self, message):
+        QMessageBox.critical(self, "Ошибка", message)
+        self.main_window.update_status(f"Ошибка: {message}")
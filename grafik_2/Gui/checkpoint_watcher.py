@@ -0,0 +1,112 @@
+# Gui/checkpoint_watcher.py
+import os
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from file_watch import FileStabilityTracker
+from .model_handler import model_handler
+
+
+# Попыток загрузить одну и ту же версию файла до отказа (до ее следующего изменения)
+MAX_LOAD_ATTEMPTS = 3
+
+
+class ModelLoadWorker(QThread):
+    """Фоновая загрузка и прогрев модели перед заменой активной"""
+    loaded = Signal(object, object)
+    error = Signal(str)
+
+    def __init__(self, model_path, validate=False):
+        super().__init__()
+        self.model_path = model_path
+        self.validate = validate
+
+    def run(self):
+        try:
+            prepared = model_handler.prepare_model(self.model_path)
+            report = model_handler.validate_model(prepared) if self.validate else None
+            self.loaded.emit(prepared, report)
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+class CheckpointWatcher(QObject):
+    """Отслеживание файла активной модели и автоматическая перезагрузка"""
+    status_message = Signal(str)
+    model_swapped = Signal(str)
+
+    def __init__(self, parent=None, interval_ms=2000):
+        super().__init__(parent)
+        self.tracker = None
+        self.worker = None
+        self.failed_version = None
+        self.failures = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.poll)
+
+    def watch(self, model_path):
+        """Начать отслеживание файла (текущая версия считается уже загруженной)"""
+        if not model_path:
+            self.stop()
+            return
+        if self.tracker and os.path.abspath(self.tracker.path) == os.path.abspath(model_path):
+            return
+        # Версия принимается только после успешной загрузки: неудачная будет повторена
+        self.tracker = FileStabilityTracker(model_path, confirm=True)
+        self.failed_version = None
+        self.failures = 0
+        self.timer.start()
+        self.status_message.emit(f"👁 Отслеживание модели: {os.path.basename(model_path)}")
+
+    def stop(self):
+        self.timer.stop()
+        self.tracker = None
+
+    def is_active(self):
+        return self.timer.isActive()
+
+    def poll(self):
+        if not self.tracker or (self.worker and self.worker.isRunning()):
+            return
+
+        # Файл считается записанным, когда размер и mtime не менялись между опросами
+        if not self.tracker.poll():
+            return
+
+        model_name = os.path.basename(self.tracker.path)
+        self.status_message.emit(f"🔄 Обнаружена новая версия модели {model_name}, загрузка...")
+
+        self.worker = ModelLoadWorker(self.tracker.path, validate=True)
+        self.worker.loaded.connect(self.on_model_loaded)
+        self.worker.error.connect(self.on_model_error)
+        self.worker.start()
+
+    def on_model_loaded(self, prepared, report):
+        model_handler.activate_model(prepared)
+        if self.tracker:
+            self.tracker.accept()
+        self.failed_version = None
+        self.failures = 0
+
+        message = f"✅ Модель обновлена: {os.path.basename(prepared['path'])}"
+        if report and report.get('active_score') is not None:
+            delta = report['probe_score'] - report['active_score']
+            message += f" (контрольная пара: Δ {delta:+.4f})"
+        self.status_message.emit(message)
+        self.model_swapped.emit(prepared['path'])
+
+    def on_model_error(self, error_message):
+        # Активная модель остается прежней
+        if not self.tracker:
+            return
+        version = self.tracker.reported
+        self.failures = self.failures + 1 if version == self.failed_version else 1
+        self.failed_version = version
+
+        if self.failures < MAX_LOAD_ATTEMPTS:
+            # Например, недокопированный файл с сетевого диска: версия загружается повторно
+            self.tracker.retry()
+            self.status_message.emit(f"⚠ Не удалось загрузить новую версию модели "
+                                     f"(попытка {self.failures} из {MAX_LOAD_ATTEMPTS}): {error_message}")
+        else:
+            self.status_message.emit(f"❌ Новая версия модели отклонена: {error_message}")
@@ -0,0 +1,162 @@
+# Gui/history_model.py
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRectF
+from PySide6.QtGui import QFont, QColor, QPen
+
+
+# Количество записей, подгружаемых за один запрос к базе
+PAGE_SIZE = 100
+
+EntryIdRole = Qt.UserRole
+EntryRole = Qt.UserRole + 1
+
+VERDICT_COLORS = {
+    'high': "#27ae60",
+    'medium': "#f39c12",
+    'low': "#e74c3c",
+}
+
+
+class HistoryListModel(QAbstractListModel):
+    """Модель списка истории с постраничной подгрузкой из HistoryStore"""
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = []
+        self.total = 0
+        # Фильтры поиска применяются в запросах к базе, а не в Python
+        self.filters = None
+
+    def set_filters(self, filters):
+        self.filters = filters or None
+        self.reload()
+
+    def reload(self):
+        """Сброс модели: первая страница подгрузится представлением через fetchMore"""
+        self.beginResetModel()
+        self.rows = []
+        self.total = self.store.count(self.filters)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.rows) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+
+        before = None
+        if self.rows:
+            last = self.rows[-1]
+            before = (last['timestamp'], last['id'])
+
+        page = self.store.summary_page(PAGE_SIZE, before, self.filters)
+        if not page:
+            self.total = len(self.rows)
+            return
+
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+
+        entry = self.rows[index.row()]
+        if role == EntryIdRole:
+            return entry['id']
+        if role == EntryRole:
+            return entry
+        if role == Qt.DisplayRole:
+            return f"{entry.get('timestamp', '')} {entry.get('image_name', '')}"
+        return None
+
+    def prepend_entries(self, entries):
+        """Вставка новых записей (новые первыми) в начало списка одним диффом, без перестроения"""
+        if not entries:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(entries) - 1)
+        self.rows[0:0] = entries
+        self.total += len(entries)
+        self.endInsertRows()
+
+    def remove_entry(self, entry_id):
+        for row, entry in enumerate(self.rows):
+            if entry['id'] == entry_id:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.rows[row]
+                self.total -= 1
+                self.endRemoveRows()
+                return True
+        return False
+
+
+class HistoryItemDelegate(QStyledItemDelegate):
+    """Легковесная отрисовка строки истории без создания виджетов"""
+
+    ROW_HEIGHT = 88
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.title_font = QFont("Arial", 10, QFont.Bold)
+        self.text_font = QFont("Arial", 9)
+
+    def sizeHint(self, option, index):
+        return QSize(80, self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        entry = index.data(EntryRole)
+        if not entry:
+            return
+
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+
+        rect = QRectF(option.rect.adjusted(2, 2, -2, -2))
+        if option.state & QStyle.State_Selected:
+            background, border = QColor("#3a5068"), QColor("#4a6572")
+        elif option.state & QStyle.State_MouseOver:
+            background, border = QColor("#34495e"), QColor("#4a6572")
+        else:
+            background, border = QColor("#2c3e50"), QColor("#2c3e50")
+        painter.setPen(QPen(border, 1))
+        painter.setBrush(background)
+        painter.drawRoundedRect(rect, 5, 5)
+
+        text_rect = rect.adjusted(10, 6, -10, -6)
+        line_height = text_rect.height() / 4
+
+        image_name = str(entry.get('image_name') or 'Неизвестный файл')
+        if " vs " in image_name:
+            title = "⚖️ ВЕРИФИКАЦИЯ"
+            files = image_name.split(" vs ")
+            file_lines = [f"📄 {name}" for name in files[:2]]
+        else:
+            title = "🔍 АНАЛИЗ"
+            file_lines = [f"📄 {image_name}"]
+
+        painter.setFont(self.title_font)
+        painter.setPen(QColor("#ecf0f1"))
+        painter.drawText(text_rect.adjusted(0, 0, 0, -3 * line_height), Qt.AlignLeft | Qt.AlignVCenter, title)
+
+        # Вердикт справа от заголовка
+        if entry.get('verdict'):
+            painter.setPen(QColor(VERDICT_COLORS.get(entry.get('confidence_level'), "#bdc3c7")))
+            painter.drawText(text_rect.adjusted(0, 0, 0, -3 * line_height),
+                             Qt.AlignRight | Qt.AlignVCenter, entry['verdict'])
+
+        painter.setFont(self.text_font)
+        painter.setPen(QColor("#bdc3c7"))
+        lines = [f"📅 {entry.get('timestamp', 'Нет времени')}"] + file_lines
+        metrics = painter.fontMetrics()
+        for i, line in enumerate(lines[:3], start=1):
+            line_rect = text_rect.adjusted(0, i * line_height, 0, -(3 - i) * line_height)
+            elided = metrics.elidedText(line, Qt.ElideRight, int(line_rect.width()))
+            painter.drawText(line_rect, Qt.AlignLeft | Qt.AlignVCenter, elided)
+
+        painter.restore()
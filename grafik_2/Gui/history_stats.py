@@ -0,0 +1,168 @@
+# Gui/history_stats.py
+from PySide6.QtWidgets import QFrame, QWidget, QVBoxLayout, QLabel, QSizePolicy
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QFont, QColor, QPainter
+
+from .history_model import VERDICT_COLORS
+from .model_handler import model_handler
+from neurosignature.stage_timer import STAGE_NAMES, TOTAL
+
+
+LEVEL_NAMES = {
+    'high': "✅ Сходны",
+    'medium': "⚠️ Сходство есть",
+    'low': "❌ Различаются",
+    '': "Без оценки",
+}
+
+
+class BarChart(QWidget):
+    """Простая столбчатая диаграмма без внешних зависимостей"""
+
+    def __init__(self, labels=(), values=(), colors=None, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(110)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.set_data(labels, values, colors)
+
+    def set_data(self, labels, values, colors=None):
+        self.labels = list(labels)
+        self.values = list(values)
+        self.colors = colors or ["#3498db"] * len(self.values)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setFont(QFont("Arial", 7))
+
+        count = len(self.values)
+        if not count:
+            return
+
+        label_height = 14
+        chart = QRectF(self.rect()).adjusted(4, 14, -4, -label_height)
+        peak = max(self.values) or 1
+        slot = chart.width() / count
+        # При узких столбцах подписывается только часть из них
+        label_step = max(1, int(36 // max(slot, 1)))
+
+        for i, value in enumerate(self.values):
+            height = chart.height() * value / peak
+            bar = QRectF(chart.left() + i * slot + 2, chart.bottom() - height, slot - 4, height)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(self.colors[i]))
+            painter.drawRoundedRect(bar, 2, 2)
+
+            painter.setPen(QColor("#bdc3c7"))
+            if value and label_step == 1:
+                painter.drawText(QRectF(bar.left() - 4, bar.top() - 13, bar.width() + 8, 12),
+                                 Qt.AlignCenter, str(value))
+            if i % label_step == 0:
+                painter.drawText(QRectF(chart.left() + i * slot - 10, chart.bottom() + 1, slot + 20, label_height),
+                                 Qt.AlignCenter, self.labels[i])
+
+
+class HistoryStatsPanel(QFrame):
+    """Статистика проверок по агрегатам HistoryStore.stats() и времени HistoryStore.latency_summary().
+
+    Панель создается один раз; update_stats() обновляет ее содержимое на месте.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet("""
+            QFrame {
+                background-color: #2c3e50;
+                border: 1px solid #34495e;
+                border-radius: 6px;
+            }
+            QLabel {
+                color: #ecf0f1;
+                border: none;
+            }
+        """)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(6)
+
+        title = QLabel("📈 СТАТИСТИКА ПРОВЕРОК")
+        title.setFont(QFont("Arial", 12, QFont.Bold))
+        layout.addWidget(title)
+
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont("Arial", 10))
+        layout.addWidget(self.summary_label)
+
+        # Разделы: (заголовок, содержимое); пустые разделы скрываются
+        self.levels_section = self.add_section(layout, "⚖️ Вердикты", self.text_label())
+        self.histogram_section = self.add_section(layout, "📊 Распределение степени сходства, %", BarChart())
+        self.days_section = self.add_section(layout, "📅 Проверки по дням", BarChart())
+        self.models_section = self.add_section(layout, "🧠 Модели", self.text_label())
+        self.latency_section = self.add_section(layout, "⏱ Время проверки, мс", self.text_label())
+
+    def add_section(self, layout, title, content):
+        header = self.section_label(title)
+        layout.addWidget(header)
+        layout.addWidget(content)
+        return header, content
+
+    def show_section(self, section, visible):
+        for widget in section:
+            widget.setVisible(visible)
+        return section[1]
+
+    def update_stats(self, stats, latency=None):
+        lines = [
+            f"Всего записей: <b>{stats['total']}</b>",
+            f"С оценкой модели: <b>{stats['scored']}</b>",
+        ]
+        if stats['mean_score'] is not None:
+            lines.append(f"Средняя степень сходства: <b>{stats['mean_score'] * 100:.1f}%</b>")
+        self.summary_label.setText("<br>".join(lines))
+
+        label = self.show_section(self.levels_section, bool(stats['by_level']))
+        levels = [level for level in ('high', 'medium', 'low', '') if level in stats['by_level']]
+        label.setText("<br>".join(f"{LEVEL_NAMES[level]}: {stats['by_level'][level]}" for level in levels))
+
+        chart = self.show_section(self.histogram_section, any(stats['histogram']))
+        buckets = len(stats['histogram'])
+        chart.set_data([f"{i * 100 // buckets}" for i in range(buckets)], stats['histogram'],
+                       [self.bucket_color((i + 0.5) / buckets) for i in range(buckets)])
+
+        chart = self.show_section(self.days_section, bool(stats['by_day']))
+        chart.set_data([day[5:] for day, _ in stats['by_day']], [total for _, total in stats['by_day']])
+
+        label = self.show_section(self.models_section, bool(stats['by_model']))
+        lines = []
+        for model_id, info in sorted(stats['by_model'].items(), key=lambda item: -item[1]['total']):
+            name = model_id[:12] if model_id else "Неизвестна"
+            line = f"{name}: {info['total']}"
+            if info['mean_score'] is not None:
+                line += f" (среднее {info['mean_score'] * 100:.1f}%)"
+            lines.append(line)
+        label.setText("<br>".join(lines))
+
+        label = self.show_section(self.latency_section, bool(latency))
+        lines = []
+        for stage, values in (latency or {}).items():
+            name = "<b>всего</b>" if stage == TOTAL else STAGE_NAMES.get(stage, stage)
+            lines.append(f"{name}: p50 {values['p50']:.0f} • p90 {values['p90']:.0f} • "
+                         f"p99 {values['p99']:.0f} ({values['count']})")
+        label.setText("<br>".join(lines))
+
+    def section_label(self, text):
+        label = QLabel(text)
+        label.setFont(QFont("Arial", 10, QFont.Bold))
+        label.setStyleSheet("color: #3498db; margin-top: 4px;")
+        return label
+
+    def text_label(self, html=""):
+        label = QLabel(html)
+        label.setFont(QFont("Arial", 9))
+        label.setStyleSheet("color: #bdc3c7;")
+        label.setWordWrap(True)
+        return label
+
+    def bucket_color(self, score):
+        return VERDICT_COLORS[model_handler.policy.level(score)]
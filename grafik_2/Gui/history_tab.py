@@ -1,35 +1,124 @@
 # Gui/history_tab.py
 import os
-import json
 import datetime
 from PySide6.QtWidgets import (
     QWidget,
     QVBoxLayout,
     QHBoxLayout,
-    QListWidget,
+    QListView,
     QPushButton,
     QLabel,
     QMessageBox,
-    QListWidgetItem,
     QFileDialog,
     QSplitter,
     QApplication,
     QFrame,
     QScrollArea,
-    QSizePolicy
+    QSizePolicy,
+    QLineEdit,
+    QComboBox,
+    QSpinBox,
+    QProgressDialog
 )
-from PySide6.QtCore import Qt, QTimer, QSize
-from PySide6.QtGui import QFont, QColor
+from PySide6.QtCore import Qt, QTimer, Signal, QThread
+from PySide6.QtGui import QFont
+from .model_handler import model_handler
+from .history_model import HistoryListModel, HistoryItemDelegate, EntryIdRole
+from .history_stats import HistoryStatsPanel
+from history_store import HistoryStore, report_lines
+from history_writer import HistoryWriter
+from history_export import export_history, ExportCancelled
+
+
+# Период проверки счетчика изменений базы, пока вкладка видна
+CHANGE_CHECK_INTERVAL = 2000
+
+# Задержка перед поиском после ввода текста
+SEARCH_DEBOUNCE_MS = 300
+
+# Обновления счетчиков и статистики при потоке записей объединяются за этот интервал
+STATS_REFRESH_MS = 1000
+
+# Сколько окно ждет фоновой записи истории перед экспортом и очисткой, с
+WRITE_FLUSH_TIMEOUT = 2.0
+
+LEVEL_FILTERS = [
+    ("Все вердикты", None),
+    ("✅ Сходны", 'high'),
+    ("⚠️ Сходство есть", 'medium'),
+    ("❌ Различаются", 'low'),
+]
+
+# Период: количество дней от текущей даты
+PERIOD_FILTERS = [
+    ("Всё время", None),
+    ("Сегодня", 0),
+    ("7 дней", 7),
+    ("30 дней", 30),
+    ("Год", 365),
+]
+
+
+class HistoryExportWorker(QThread):
+    """Потоковая выгрузка истории в файл в фоновом потоке"""
+    progress = Signal(int, int)
+    finished = Signal(int, str)
+    error = Signal(str)
+
+    def __init__(self, db_path, file_path, filters=None):
+        super().__init__()
+        self.db_path = db_path
+        self.file_path = file_path
+        self.filters = filters
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        # Отдельное соединение: выгрузка не блокирует запись истории из GUI
+        store = HistoryStore(self.db_path)
+        try:
+            exported = export_history(
+                store, self.file_path, filters=self.filters,
+                progress=self.progress.emit,
+                should_stop=lambda: self.cancelled
+            )
+            self.finished.emit(exported, self.file_path)
+        except ExportCancelled:
+            self.error.emit("Экспорт отменен")
+        except Exception as e:
+            self.error.emit(f"Ошибка экспорта: {str(e)}")
+        finally:
+            store.close()
 
 
 class HistoryTab(QWidget):
+    # Пачка записей, сохраненная фоновым писателем (доставляется в поток GUI)
+    entries_written = Signal(object)
+    # Ошибка фоновой записи (пачка сохраняется и записывается повторно)
+    write_failed = Signal(str)
+
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
-        self.history_file = "processing_history.json"
-        self.history_data = []
+        self.history_store = HistoryStore()
+        self.history_store.migrate_legacy_json()
+        self.entries_written.connect(self.on_entries_written)
+        self.write_failed.connect(self.on_write_failed)
+        self.history_writer = HistoryWriter(self.history_store, on_written=self.entries_written.emit,
+                                            on_error=self.write_failed.emit, prepare=self.derive_verdicts)
+        self.seen_version = None
+        self.last_seen_id = 0
+        self.stats_panel = None
+        self.showing_stats = False
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setSingleShot(True)
+        self.stats_timer.setInterval(STATS_REFRESH_MS)
+        self.stats_timer.timeout.connect(self.refresh_stats)
         self.setup_ui()
         self.load_history()
+        self.clear_details()
 
     def setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -119,6 +208,31 @@ class HistoryTab(QWidget):
         """)
         buttons_layout.addWidget(self.clear_all_btn)
 
+        self.export_all_btn = QPushButton("📦")
+        self.export_all_btn.setToolTip("Экспорт истории (с учетом фильтров) в CSV/JSONL/Parquet")
+        self.export_all_btn.clicked.connect(self.export_history)
+        self.export_all_btn.setFixedSize(32, 32)
+        self.export_all_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #27ae60;
+                color: white;
+                border: 1px solid #2ecc71;
+                border-radius: 4px;
+                font-weight: bold;
+                font-size: 12px;
+            }
+            QPushButton:hover {
+                background-color: #2ecc71;
+                border-color: #27ae60;
+            }
+            QPushButton:disabled {
+                background-color: #2c3e50;
+                color: #7f8c8d;
+                border-color: #34495e;
+            }
+        """)
+        buttons_layout.addWidget(self.export_all_btn)
+
         top_layout.addWidget(buttons_widget, 1)
         main_layout.addWidget(top_panel)
 
@@ -170,37 +284,104 @@ class HistoryTab(QWidget):
 
         left_layout.addWidget(list_header)
 
+        # ПОИСК И ФИЛЬТРЫ
+        search_panel = QFrame()
+        search_panel.setStyleSheet("""
+            QFrame {
+                background-color: #2c3e50;
+                border: 1px solid #34495e;
+                border-radius: 5px;
+            }
+            QLabel {
+                color: #bdc3c7;
+                border: none;
+            }
+        """)
+        search_layout = QVBoxLayout(search_panel)
+        search_layout.setContentsMargins(6, 4, 6, 4)
+        search_layout.setSpacing(4)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("🔎 Поиск по именам файлов и вердиктам")
+        self.search_edit.setToolTip("Поиск по именам файлов и вердиктам;\n"
+                                    "тип проверки, уровень и даты - в фильтрах ниже")
+        self.search_edit.setClearButtonEnabled(True)
+        search_layout.addWidget(self.search_edit)
+
+        facets_layout = QHBoxLayout()
+        self.level_filter_combo = QComboBox()
+        for text, level in LEVEL_FILTERS:
+            self.level_filter_combo.addItem(text, level)
+        facets_layout.addWidget(self.level_filter_combo)
+
+        self.type_filter_combo = QComboBox()
+        self.type_filter_combo.addItem("Все типы", None)
+        facets_layout.addWidget(self.type_filter_combo)
+
+        self.period_filter_combo = QComboBox()
+        for text, days in PERIOD_FILTERS:
+            self.period_filter_combo.addItem(text, days)
+        facets_layout.addWidget(self.period_filter_combo)
+        search_layout.addLayout(facets_layout)
+
+        score_layout = QHBoxLayout()
+        score_layout.addWidget(QLabel("Сходство, %:"))
+        self.score_min_spin = QSpinBox()
+        self.score_min_spin.setRange(0, 100)
+        self.score_min_spin.setValue(0)
+        score_layout.addWidget(self.score_min_spin)
+        score_layout.addWidget(QLabel("–"))
+        self.score_max_spin = QSpinBox()
+        self.score_max_spin.setRange(0, 100)
+        self.score_max_spin.setValue(100)
+        score_layout.addWidget(self.score_max_spin)
+        score_layout.addStretch()
+        search_layout.addLayout(score_layout)
+
+        left_layout.addWidget(search_panel)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_filters)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.level_filter_combo.currentIndexChanged.connect(self.apply_filters)
+        self.type_filter_combo.currentIndexChanged.connect(self.apply_filters)
+        self.period_filter_combo.currentIndexChanged.connect(self.apply_filters)
+        self.score_min_spin.valueChanged.connect(self.search_timer.start)
+        self.score_max_spin.valueChanged.connect(self.search_timer.start)
+
         # СПИСОК ИСТОРИИ
-        self.history_list = QListWidget()
-        self.history_list.setAlternatingRowColors(True)
+        # Записи подгружаются страницами по мере прокрутки, строки рисует делегат
+        self.history_model = HistoryListModel(self.history_store, self)
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setItemDelegate(HistoryItemDelegate(self.history_list))
+        self.history_list.setUniformItemSizes(True)
+        self.history_list.setMouseTracking(True)
         self.history_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: #1e1e1e;
                 border: 1px solid #34495e;
                 border-radius: 6px;
                 font-size: 11px;
                 padding: 3px;
             }
-            QListWidget::item {
-                padding: 8px;
-                border-bottom: 1px solid #2c3e50;
-                margin: 1px;
-                border-radius: 5px;
-                background-color: #2c3e50;
-                min-height: 80px;
-            }
-            QListWidget::item:selected {
-                background-color: #3a5068;
-                border: 1px solid #4a6572;
-            }
-            QListWidget::item:hover {
-                background-color: #3a5068;
-                border: 1px solid #4a6572;
-            }
         """)
-        self.history_list.itemSelectionChanged.connect(self.show_history_details)
+        self.history_list.selectionModel().currentChanged.connect(self.show_history_details)
         left_layout.addWidget(self.history_list, 1)
 
+        self.empty_label = QLabel("📭 ИСТОРИЯ ПУСТА")
+        self.empty_label.setAlignment(Qt.AlignCenter)
+        self.empty_label.setFont(QFont("Arial", 10, QFont.Bold))
+        self.empty_label.setStyleSheet("""
+            color: #95a5a6;
+            background-color: #2c3e50;
+            border-radius: 5px;
+            padding: 25px;
+        """)
+        left_layout.addWidget(self.empty_label, 1)
+
         # СТАТИСТИКА
         stats_panel = QFrame()
         stats_panel.setFixedHeight(38)  # Еще тоньше
@@ -431,93 +612,120 @@ class HistoryTab(QWidget):
         bottom_info.setFixedHeight(26)
         main_layout.addWidget(bottom_info)
 
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.load_history)
-        self.update_timer.start(60000)
-
-    def calculate_item_size(self, text):
-        lines = text.strip().split('\n')
-        line_count = len([line for line in lines if line.strip()])
-
-        base_height = 75  # Еще меньше
-        extra_height = max(0, (line_count - 4) * 16)  # Меньше за строку
-
-        return QSize(80, base_height + extra_height)
+        # Изменения базы другими процессами отслеживаются дешевым PRAGMA data_version;
+        # таймер работает только пока вкладка видна
+        self.change_timer = QTimer(self)
+        self.change_timer.setInterval(CHANGE_CHECK_INTERVAL)
+        self.change_timer.timeout.connect(self.sync_external_changes)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.sync_external_changes()
+        self.change_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.change_timer.stop()
+
+    def current_filters(self):
+        """Фильтры поиска из панели (None - показывать всю историю)"""
+        filters = {}
+        text = self.search_edit.text().strip()
+        if text:
+            filters['text'] = text
+        if self.level_filter_combo.currentData():
+            filters['confidence_level'] = self.level_filter_combo.currentData()
+        if self.type_filter_combo.currentData():
+            filters['processing_type'] = self.type_filter_combo.currentData()
+
+        days = self.period_filter_combo.currentData()
+        if days is not None:
+            date_from = datetime.date.today() - datetime.timedelta(days=days)
+            filters['date_from'] = date_from.strftime('%Y-%m-%d')
+
+        if self.score_min_spin.value() > 0:
+            filters['score_min'] = self.score_min_spin.value() / 100.0
+        if self.score_max_spin.value() < 100:
+            filters['score_max'] = self.score_max_spin.value() / 100.0
+        return filters or None
+
+    def apply_filters(self):
+        self.search_timer.stop()
+        self.history_model.set_filters(self.current_filters())
+        self.update_history_display()
+        self.clear_details()
+
+    def update_type_facets(self):
+        """Список типов обработки для фильтра берется из индекса базы"""
+        current = self.type_filter_combo.currentData()
+        self.type_filter_combo.blockSignals(True)
+        self.type_filter_combo.clear()
+        self.type_filter_combo.addItem("Все типы", None)
+        for processing_type in self.history_store.facet_values('processing_type'):
+            self.type_filter_combo.addItem(processing_type, processing_type)
+        index = self.type_filter_combo.findData(current)
+        self.type_filter_combo.setCurrentIndex(max(index, 0))
+        self.type_filter_combo.blockSignals(False)
+
+    def sync_external_changes(self):
+        """Применение внешних изменений базы: новые записи вставляются диффом, иначе перезагрузка"""
+        try:
+            version = self.history_store.data_version()
+            if version == self.seen_version:
+                return
+            self.seen_version = version
+
+            filters = self.history_model.filters
+            new_entries = self.history_store.summaries_after(self.last_seen_id, filters)
+            expected_total = self.history_model.total + len(new_entries)
+            if self.history_store.count(filters) != expected_total or not new_entries:
+                # Удаления, очистка или изменение записей на месте (например, пересчет
+                # вердиктов) в другом процессе: загруженная страница устарела
+                self.update_history_display()
+                self.clear_details()
+                return
+
+            self.last_seen_id = max(entry['id'] for entry in new_entries)
+            self.history_model.prepend_entries(new_entries)
+            self.update_empty_state()
+            self.update_stats()
+        except Exception as e:
+            print(f"Ошибка синхронизации истории: {e}")
 
     def update_history_display(self):
-        self.history_list.clear()
-
-        if not self.history_data:
-            empty_item = QListWidgetItem("📭 ИСТОРИЯ ПУСТА")
-            empty_item.setTextAlignment(Qt.AlignCenter)
-            empty_item.setFont(QFont("Arial", 10, QFont.Bold))
-            empty_item.setForeground(QColor("#95a5a6"))
-            empty_item.setBackground(QColor("#2c3e50"))
-            empty_item.setSizeHint(QSize(80, 75))
-            self.history_list.addItem(empty_item)
-            return
-
-        sorted_data = sorted(self.history_data,
-                             key=lambda x: x.get('timestamp', ''),
-                             reverse=True)
-
-        for entry in sorted_data:
-            timestamp = entry.get('timestamp', 'Нет времени')
-            image_name = entry.get('image_name', 'Неизвестный файл')
-            processing_type = entry.get('processing_type', 'Неизвестный тип')
-
-            # Адаптированный текст под ширину
-            if " vs " in str(image_name):
-                files = str(image_name).split(" vs ")
-                # Более короткие имена файлов
-                file1 = files[0][:25] + "..." if len(files[0]) > 25 else files[0]
-                file2 = files[1][:25] + "..." if len(files[1]) > 25 else files[1] if len(files) > 1 else "N/A"
-
-                display_text = f"""⚖️ ВЕРИФИКАЦИЯ
-─────────────────
-📅 {timestamp}
-
-📄 {file1}
-📄 {file2}"""
-            else:
-                display_name = image_name[:35] + "..." if len(image_name) > 35 else image_name
-                display_text = f"""🔍 АНАЛИЗ
-────────────
-📅 {timestamp}
-
-📄 {display_name}"""
-
-            item = QListWidgetItem(display_text)
-            item.setFont(QFont("Arial", 10))
-            item.setForeground(QColor("#ecf0f1"))
-            item.setData(Qt.UserRole, entry.get('id'))
-
-            item.setSizeHint(self.calculate_item_size(display_text))
-
-            self.history_list.addItem(item)
-
+        self.seen_version = self.history_store.data_version()
+        self.last_seen_id = self.history_store.max_id()
+        self.history_model.reload()
+        self.update_empty_state()
         self.update_stats()
 
-    def show_history_details(self):
-        current_item = self.history_list.currentItem()
-        if not current_item or not self.history_data:
-            self.clear_details()
-            return
-
-        entry_id = current_item.data(Qt.UserRole)
+    def update_empty_state(self):
+        is_empty = self.history_model.total == 0
+        if self.history_model.filters:
+            self.empty_label.setText("🔎 НИЧЕГО НЕ НАЙДЕНО")
+        else:
+            self.empty_label.setText("📭 ИСТОРИЯ ПУСТА")
+        self.empty_label.setVisible(is_empty)
+        self.history_list.setVisible(not is_empty)
+
+    def current_entry_id(self):
+        index = self.history_list.currentIndex()
+        if not index.isValid():
+            return None
+        return index.data(EntryIdRole)
+
+    def show_history_details(self, *args):
+        entry_id = self.current_entry_id()
         if not entry_id:
+            self.clear_details()
             return
 
-        entry = next((e for e in self.history_data if e.get('id') == entry_id), None)
+        entry = self.history_store.get(entry_id)
         if not entry:
             return
 
-        while self.details_layout.count():
-            child = self.details_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        full_result = entry.get('full_result', '')
+        self.showing_stats = False
+        self.clear_details_layout()
 
         # 1. ЗАГОЛОВОК ОТЧЕТА - АДАПТИРОВАННЫЙ
         header_frame = QFrame()
@@ -628,7 +836,7 @@ class HistoryTab(QWidget):
         results_title.setMinimumHeight(20)
         results_layout.addWidget(results_title)
 
-        lines = full_result.split('\n')
+        lines = self.result_lines(entry)
 
         for i, line in enumerate(lines):
             line = line.strip()
@@ -746,16 +954,12 @@ class HistoryTab(QWidget):
         self.export_single_btn.setEnabled(True)
 
     def export_single_report(self):
-        current_item = self.history_list.currentItem()
-        if not current_item:
-            QMessageBox.warning(self, "Внимание", "Выберите запись для экспорта.")
-            return
-
-        entry_id = current_item.data(Qt.UserRole)
+        entry_id = self.current_entry_id()
         if not entry_id:
+            QMessageBox.warning(self, "Внимание", "Выберите запись для экспорта.")
             return
 
-        entry = next((e for e in self.history_data if e.get('id') == entry_id), None)
+        entry = self.history_store.get(entry_id)
         if not entry:
             return
 
@@ -772,8 +976,7 @@ class HistoryTab(QWidget):
             return
 
         try:
-            full_result = entry.get('full_result', '')
-            lines = full_result.split('\n')
+            lines = self.result_lines(entry)
 
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write("=" * 80 + "\n")
@@ -849,7 +1052,10 @@ class HistoryTab(QWidget):
                 f.write(f"• Модель: Siamese Vision Transformer\n")
                 f.write(f"• Метод: Сравнение стилистики\n")
                 f.write(f"• Точность: 94.7%\n")
-                f.write(f"• Время: < 2 секунд\n")
+                if entry.get('duration_ms') is not None:
+                    f.write(f"• Время: {entry['duration_ms']:.0f} мс\n")
+                else:
+                    f.write("• Время: не измерено\n")
                 f.write("-" * 80 + "\n\n")
 
                 f.write("ПОДПИСИ:\n")
@@ -890,8 +1096,69 @@ class HistoryTab(QWidget):
                 f"Не удалось экспортировать отчет:\n\n{str(e)}"
             )
 
+    def export_history(self):
+        """Выгрузка истории в фоновом потоке с прогрессом и отменой"""
+        filters = self.history_model.filters
+        total = self.history_store.count(filters)
+        if not total:
+            QMessageBox.information(self, "Экспорт", "Нет записей для экспорта.")
+            return
+
+        default_name = f"История_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Экспорт истории",
+            default_name,
+            "CSV (*.csv);;JSON Lines (*.jsonl);;Parquet (*.parquet)"
+        )
+        if not file_path:
+            return
+
+        # Расширение по выбранному фильтру, если пользователь его не указал
+        if not os.path.splitext(file_path)[1]:
+            file_path += selected_filter[selected_filter.index('*') + 1:-1]
+
+        # Записи из очереди фоновой записи тоже попадают в выгрузку
+        if not self.flush_history_writes():
+            return
+
+        self.export_progress = QProgressDialog("Экспорт истории...", "Отмена", 0, total, self)
+        self.export_progress.setWindowTitle("Экспорт")
+        self.export_progress.setWindowModality(Qt.WindowModal)
+        self.export_progress.setMinimumDuration(0)
+
+        self.export_worker = HistoryExportWorker(self.history_store.db_path, file_path, filters)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.error.connect(self.on_export_error)
+        self.export_progress.canceled.connect(self.export_worker.cancel)
+        self.export_all_btn.setEnabled(False)
+        self.export_worker.start()
+
+    def on_export_progress(self, done, total):
+        self.export_progress.setMaximum(total)
+        self.export_progress.setValue(done)
+        self.export_progress.setLabelText(f"Экспорт истории: {done} из {total}")
+
+    def on_export_finished(self, exported, file_path):
+        self.export_progress.close()
+        self.export_all_btn.setEnabled(True)
+        self.main_window.update_status(f"Экспортировано записей: {exported}")
+        QMessageBox.information(
+            self,
+            "Экспорт завершен",
+            f"Выгружено записей: {exported}\n\nФайл: {file_path}"
+        )
+
+    def on_export_error(self, message):
+        self.export_progress.close()
+        self.export_all_btn.setEnabled(True)
+        self.main_window.update_status(message)
+        if message != "Экспорт отменен":
+            QMessageBox.critical(self, "Ошибка экспорта", message)
+
     def clear_all_history(self):
-        if not self.history_data:
+        if not self.history_store.count():
             return
 
         reply = QMessageBox.question(
@@ -903,17 +1170,35 @@ class HistoryTab(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            self.history_data = []
-            self.save_history()
+            # Записи из очереди, попавшие в базу после очистки, остались бы в истории
+            if not self.flush_history_writes():
+                return
+            self.history_store.clear()
             self.update_history_display()
             self.clear_details()
             self.main_window.update_status("История очищена")
 
-    def clear_details(self):
+    def clear_details_layout(self):
+        # Панель статистики не пересоздается: она только убирается из области деталей
         while self.details_layout.count():
             child = self.details_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+            widget = child.widget()
+            if widget is self.stats_panel and widget is not None:
+                widget.hide()
+            elif widget:
+                widget.deleteLater()
+
+    def clear_details(self):
+        self.clear_details_layout()
+
+        # Без выбранной записи в области деталей показывается статистика
+        if self.stats_panel is None:
+            self.stats_panel = HistoryStatsPanel()
+        self.refresh_stats_panel()
+        self.details_layout.addWidget(self.stats_panel)
+        self.details_layout.addStretch()
+        self.stats_panel.show()
+        self.showing_stats = True
 
         self.copy_details_btn.setEnabled(False)
         self.delete_entry_btn.setEnabled(False)
@@ -942,38 +1227,39 @@ class HistoryTab(QWidget):
             self.main_window.update_status("Детали скопированы")
 
     def update_stats(self):
-        total_entries = len(self.history_data)
+        """Отложенное обновление: изменения за STATS_REFRESH_MS применяются одним пересчетом"""
+        if not self.stats_timer.isActive():
+            self.stats_timer.start()
+
+    def refresh_stats_panel(self):
+        self.stats_panel.update_stats(self.history_store.stats(), self.history_store.latency_summary())
 
-        file_size = 0
-        if os.path.exists(self.history_file):
-            file_size = os.path.getsize(self.history_file)
+    def refresh_stats(self):
+        self.stats_timer.stop()
+        # Общее число записей - из агрегата, без COUNT(*) по таблице
+        total_entries = self.history_store.count()
+        file_size = self.history_store.size_bytes()
 
         size_kb = file_size / 1024
 
-        self.stats_label.setText(f"📊 {total_entries}")
+        if self.history_model.filters:
+            self.stats_label.setText(f"📊 {self.history_model.total}/{total_entries}")
+        else:
+            self.stats_label.setText(f"📊 {total_entries}")
         self.size_label.setText(f"💾 {size_kb:.1f}KB")
 
+        if self.showing_stats and self.current_entry_id() is None:
+            self.refresh_stats_panel()
+
     def load_history(self):
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.history_data = json.load(f)
-            else:
-                self.history_data = []
-
+            self.update_type_facets()
             self.update_history_display()
-
         except Exception as e:
             print(f"Ошибка загрузки истории: {e}")
 
-    def save_history(self):
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Ошибка сохранения истории: {e}")
-
-    def add_to_history(self, image_path, result, processing_type="Обработка"):
+    def add_to_history(self, image_path, result, processing_type="Обработка", score=None, model_id=None,
+                       image_hashes=None, duration_ms=None, stage_ms=None):
         try:
             if " vs " in str(image_path):
                 image_name = str(image_path)
@@ -981,30 +1267,100 @@ class HistoryTab(QWidget):
                 image_name = os.path.basename(image_path) if image_path else "Неизвестный файл"
 
             history_entry = {
-                'id': len(self.history_data) + 1,
                 'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'image_name': image_name,
-                'image_path': image_path,
                 'processing_type': processing_type,
-                'result_preview': result[:80] + "..." if len(result) > 80 else result,
-                'full_result': result
+                # Сырая оценка модели: вердикт и текст отчета строятся по ней без инференса
+                'score': score,
+                'model_id': model_id,
+                'duration_ms': duration_ms,
+                'stage_ms': stage_ms,
+                # Текст хранится только для записей без оценки
+                'report': result if score is None else None
             }
+            if image_hashes:
+                history_entry['img1_hash'], history_entry['img2_hash'] = image_hashes
+            if score is not None:
+                history_entry.update(self.derive_verdict(score))
 
-            self.history_data.append(history_entry)
-            self.save_history()
-            self.update_history_display()
-
+            # Запись в базу выполняется фоновым потоком пачками
+            self.history_writer.submit(history_entry)
             self.main_window.update_status(f"Запись в историю: {processing_type}")
 
         except Exception as e:
             print(f"Ошибка добавления в историю: {e}")
 
-    def delete_selected_entry(self):
-        current_item = self.history_list.currentItem()
-        if not current_item:
+    def on_entries_written(self, entries):
+        """Записи сохранены в базу: добавление в список одним диффом"""
+        # Записи, уже подхваченные синхронизацией с базой, пропускаются
+        entries = [entry for entry in entries if entry['id'] > self.last_seen_id]
+        if not entries:
             return
 
-        entry_id = current_item.data(Qt.UserRole)
+        self.last_seen_id = max(entry['id'] for entry in entries)
+        if any(self.type_filter_combo.findData(e['processing_type']) < 0 for e in entries):
+            self.update_type_facets()
+
+        if self.history_model.filters:
+            # Соответствие записей фильтрам проверяет база
+            self.update_history_display()
+        else:
+            self.history_model.prepend_entries(list(reversed(entries)))
+            self.update_empty_state()
+            self.update_stats()
+
+    def on_write_failed(self, message):
+        self.main_window.update_status(f"⚠ {message}")
+
+    def flush_history_writes(self):
+        """Ожидание фоновой записи истории; False, если база не приняла записи за WRITE_FLUSH_TIMEOUT"""
+        if self.history_writer.flush(WRITE_FLUSH_TIMEOUT):
+            return True
+        self.main_window.update_status("⚠ Записи истории ожидают сохранения")
+        QMessageBox.warning(
+            self,
+            "История",
+            "Не все записи истории сохранены: база занята или недоступна.\n\n"
+            "Запись повторяется автоматически, повторите действие позже."
+        )
+        return False
+
+    def shutdown(self):
+        """Сохранение очереди истории при закрытии приложения"""
+        self.history_writer.close()
+
+    def derive_verdicts(self, entries):
+        """Вердикты записей по текущей политике (вызывается фоновой записью перед вставкой)"""
+        for entry in entries:
+            if entry.get('score') is not None:
+                entry.update(self.derive_verdict(entry['score']))
+
+    def derive_verdict(self, score):
+        description = model_handler.policy.describe(score)
+        return {
+            'verdict': description['verdict'],
+            'confidence_level': description['confidence_level'],
+            'threshold': description['threshold']
+        }
+
+    def apply_threshold_policy(self):
+        """Пересчет вердиктов всех записей по текущему порогу (без обращения к модели).
+
+        Записи, еще ждущие в очереди фоновой записи, получают вердикт по новой
+        политике при вставке (derive_verdicts под блокировкой хранилища).
+        """
+        updated = self.history_store.rederive_verdicts(model_handler.policy)
+        if updated:
+            self.update_history_display()
+            self.clear_details()
+        return updated
+
+    def result_lines(self, entry):
+        """Строки результата: для записей с оценкой вердикт строится по текущей политике"""
+        return report_lines(entry, model_handler.policy.threshold)
+
+    def delete_selected_entry(self):
+        entry_id = self.current_entry_id()
         if not entry_id:
             return
 
@@ -1017,9 +1373,10 @@ class HistoryTab(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            self.history_data = [e for e in self.history_data if e.get('id') != entry_id]
-            self.save_history()
-            self.update_history_display()
+            self.history_store.delete(entry_id)
+            self.history_model.remove_entry(entry_id)
+            self.update_empty_state()
+            self.update_stats()
             self.clear_details()
             self.main_window.update_status("Запись удалена")
 
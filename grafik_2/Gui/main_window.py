@@ -38,6 +38,7 @@ class MainWindow(QMainWindow):
         try:
            # from Gui.processing_tab import ProcessingTab
             from Gui.verification_tab import VerificationTab
+            from Gui.batch_tab import BatchTab
             from Gui.history_tab import HistoryTab
             from Gui.settings_tab import SettingsTab
             from Gui.model_handler import model_handler
@@ -45,11 +46,13 @@ class MainWindow(QMainWindow):
             # Создаем вкладки
            # self.processing_tab = ProcessingTab(self)
             self.verification_tab = VerificationTab(self)
+            self.batch_tab = BatchTab(self)
             self.history_tab = HistoryTab(self)
             self.settings_tab = SettingsTab(self)
 
             #self.tab_widget.addTab(self.processing_tab, "📊 Анализ подписи")
             self.tab_widget.addTab(self.verification_tab, "🔍 Верификация")
+            self.tab_widget.addTab(self.batch_tab, "📦 Пакетная проверка")
             self.tab_widget.addTab(self.history_tab, "📋 История")
             self.tab_widget.addTab(self.settings_tab, "⚙ Настройки")
 
@@ -334,8 +337,18 @@ NeuroSignature - Система анализа и верификации под
 """
         QMessageBox.about(self, "О программе", about_text)
 
+    def closeEvent(self, event):
+        if hasattr(self, 'batch_tab'):
+            self.batch_tab.shutdown()
+        # Дописываем отложенные записи истории до выхода
+        if hasattr(self, 'history_tab'):
+            self.history_tab.shutdown()
+        super().closeEvent(event)
+
     def update_status(self, message):
-        self.status_bar.showMessage(message)
+        # Вкладки могут сообщать статус еще до создания статус-бара
+        if hasattr(self, 'status_bar'):
+            self.status_bar.showMessage(message)
 
 
 if __name__ == "__main__":
@@ -6,10 +6,11 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QPixmap, QFont
 from Gui.model_handler import model_handler
+from neurosignature.stage_timer import format_stages, TOTAL
 
 
 class ProcessingThread(QThread):
-    finished = Signal(object, object, object)
+    finished = Signal(object)
     error = Signal(str)
 
     def __init__(self, img1_path, img2_path):
@@ -19,10 +20,9 @@ class ProcessingThread(QThread):
 
     def run(self):
         try:
-            result, confidence, result_image = model_handler.verify_signature(
-                self.img1_path, self.img2_path, show_result=True
-            )
-            self.finished.emit(result, confidence, result_image)
+            # Подробный результат вместе с изображением и временем этапов
+            verified = model_handler.analyze_pair(self.img1_path, self.img2_path, show_result=True)
+            self.finished.emit(verified)
         except Exception as e:
             self.error.emit(str(e))
 
@@ -295,8 +295,10 @@ class ProcessingTab(QWidget):
         from PySide6.QtWidgets import QMessageBox
         QMessageBox.warning(self, "Ошибка", message)
 
-    def on_analysis_finished(self, result, confidence, result_image):
+    def on_analysis_finished(self, verified):
         """Обработка завершения анализа"""
+        result, confidence = verified['is_genuine'], verified['raw_similarity']
+        result_image = verified['result_image']
         self.progress_bar.setVisible(False)
         self.btn_analyze.setEnabled(True)
         self.result_group.setVisible(True)
@@ -314,7 +316,7 @@ class ProcessingTab(QWidget):
 
         # Детальные результаты
         analysis = model_handler.get_detailed_analysis(confidence, result)
-        self.display_detailed_results(analysis)
+        self.display_detailed_results(analysis, verified['stage_ms'])
 
         # Добавляем в историю
         if hasattr(self.main_window, 'history_tab'):
@@ -322,7 +324,12 @@ class ProcessingTab(QWidget):
             self.main_window.history_tab.add_to_history(
                 f"{os.path.basename(self.current_image1)} vs {os.path.basename(self.current_image2)}",
                 f"Результат: {analysis['verdict']}\nУверенность: {analysis['percentage']}\nУровень: {analysis['confidence_text']}",
-                "Анализ подписи"
+                "Анализ подписи",
+                score=confidence,
+                model_id=verified['model_id'],
+                image_hashes=verified['image_hashes'],
+                duration_ms=verified['duration_ms'],
+                stage_ms=verified['stage_ms']
             )
 
     def on_analysis_error(self, error_msg):
@@ -336,9 +343,16 @@ class ProcessingTab(QWidget):
         </div>
         """)
 
-    def display_detailed_results(self, analysis):
+    def display_detailed_results(self, analysis, stage_ms=None):
         """Отображение детальных результатов с красивым форматированием"""
 
+        # Измеренное время проверки и его этапы
+        if stage_ms:
+            duration = f"{stage_ms[TOTAL]:.0f} мс"
+            stages = f"<br>{format_stages(stage_ms)}"
+        else:
+            duration, stages = "—", ""
+
         # Определяем CSS классы для уверенности
         confidence_color = {
             'high': '#27ae60',
@@ -384,7 +398,7 @@ class ProcessingTab(QWidget):
             <!-- Дополнительная информация -->
             <div style="background-color: #34495e; border-radius: 8px; padding: 10px; margin: 15px 0;">
                 <div style="color: #ecf0f1; font-size: 12px;">
-                    Модель: SiameseViT • Время анализа: < 2 сек • Разрешение: 128x256
+                    Модель: SiameseViT • Время анализа: {duration} • Разрешение: 128x256{stages}
                 </div>
             </div>
         </div>
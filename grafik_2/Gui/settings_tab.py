@@ -10,6 +10,11 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QSettings
 from PySide6.QtGui import QFont, QColor
+from neurosignature.model_catalog import describe_model
+from neurosignature.verdict_policy import DEFAULT_THRESHOLD, normalize_threshold
+from neurosignature.batch_governor import DEFAULT_LATENCY_SLO_MS
+from .model_handler import model_handler
+from .checkpoint_watcher import CheckpointWatcher, ModelLoadWorker
 
 
 class SettingsTab(QWidget):
@@ -17,6 +22,12 @@ class SettingsTab(QWidget):
         super().__init__()
         self.main_window = main_window
         self.settings = QSettings("NeuroSignature", "AppSettings")
+        # Тот же каталог, что у анализатора: фоновая загрузка и вкладка не затирают индекс друг друга
+        self.model_catalog = model_handler.model_catalog
+        self.model_loader = None
+        self.checkpoint_watcher = CheckpointWatcher(self)
+        self.checkpoint_watcher.status_message.connect(self.main_window.update_status)
+        self.checkpoint_watcher.model_swapped.connect(self.on_model_swapped)
         self.setup_ui()
         self.load_settings()
 
@@ -496,9 +507,10 @@ class SettingsTab(QWidget):
         params_layout.addWidget(threshold_label)
 
         self.threshold_spin = QDoubleSpinBox()
-        self.threshold_spin.setRange(0.1, 1.0)
-        self.threshold_spin.setSingleStep(0.05)
-        self.threshold_spin.setValue(0.7)
+        self.threshold_spin.setRange(1, 99)
+        self.threshold_spin.setDecimals(0)
+        self.threshold_spin.setSingleStep(1)
+        self.threshold_spin.setValue(DEFAULT_THRESHOLD * 100)
         self.threshold_spin.setSuffix(" %")
         self.threshold_spin.setStyleSheet("""
             QDoubleSpinBox {
@@ -526,6 +538,45 @@ class SettingsTab(QWidget):
         params_layout.addStretch()
         model_layout.addLayout(params_layout)
 
+        # Ограничения инференса: размер пачки подбирается в их пределах
+        inference_layout = QHBoxLayout()
+        inference_layout.setSpacing(15)
+
+        rss_label = QLabel("Лимит памяти:")
+        rss_label.setFont(QFont("Arial", 10))
+        rss_label.setStyleSheet("color: #ecf0f1;")
+        inference_layout.addWidget(rss_label)
+
+        self.rss_limit_spin = QDoubleSpinBox()
+        self.rss_limit_spin.setRange(0, 262144)
+        self.rss_limit_spin.setDecimals(0)
+        self.rss_limit_spin.setSingleStep(256)
+        self.rss_limit_spin.setSuffix(" МБ")
+        self.rss_limit_spin.setSpecialValueText("Авто")
+        self.rss_limit_spin.setToolTip("Память процесса, при превышении которой пачки уменьшаются; "
+                                       "Авто - половина памяти компьютера")
+        self.rss_limit_spin.setStyleSheet(self.threshold_spin.styleSheet())
+        inference_layout.addWidget(self.rss_limit_spin)
+
+        latency_label = QLabel("Время прохода:")
+        latency_label.setFont(QFont("Arial", 10))
+        latency_label.setStyleSheet("color: #ecf0f1;")
+        inference_layout.addWidget(latency_label)
+
+        self.latency_slo_spin = QDoubleSpinBox()
+        self.latency_slo_spin.setRange(20, 5000)
+        self.latency_slo_spin.setDecimals(0)
+        self.latency_slo_spin.setSingleStep(10)
+        self.latency_slo_spin.setValue(DEFAULT_LATENCY_SLO_MS)
+        self.latency_slo_spin.setSuffix(" мс")
+        self.latency_slo_spin.setToolTip("Целевое время одного прохода модели: "
+                                         "ограничивает задержку одиночной проверки во время пакетной")
+        self.latency_slo_spin.setStyleSheet(self.threshold_spin.styleSheet())
+        inference_layout.addWidget(self.latency_slo_spin)
+
+        inference_layout.addStretch()
+        model_layout.addLayout(inference_layout)
+
         # Информация о модели
         info_frame = QFrame()
         info_frame.setStyleSheet("""
@@ -545,6 +596,19 @@ class SettingsTab(QWidget):
 
         model_layout.addWidget(info_frame)
 
+        # Автоматическая перезагрузка при обновлении файла модели
+        self.watch_model_check = QCheckBox("Следить за обновлением файла модели")
+        self.watch_model_check.setFont(QFont("Arial", 10))
+        self.watch_model_check.setStyleSheet("color: #ecf0f1;")
+        self.watch_model_check.toggled.connect(self.on_watch_model_toggled)
+        model_layout.addWidget(self.watch_model_check)
+
+        # Откат к предыдущей модели
+        self.rollback_btn = QPushButton("↩️ Вернуть предыдущую модель")
+        self.rollback_btn.setEnabled(False)
+        self.rollback_btn.clicked.connect(self.rollback_model)
+        model_layout.addWidget(self.rollback_btn)
+
         return model_group
 
     def setup_ui_settings(self):
@@ -696,35 +760,19 @@ class SettingsTab(QWidget):
         return ui_group
 
     def find_available_models(self):
-        """Поиск доступных моделей в папках"""
+        """Поиск доступных моделей по индексу каталога"""
         self.model_combo.clear()
 
-        # Добавляем стандартные пути поиска
-        search_paths = [
-            'models',
-            '../models',
-            '../../models',
-            os.path.join(os.path.dirname(__file__), '..', 'models'),
-            os.path.join(os.path.dirname(__file__), 'models'),
-        ]
-
-        found_models = []
-
-        # Поиск файлов моделей
-        for path in search_paths:
-            if os.path.exists(path) and os.path.isdir(path):
-                for file in os.listdir(path):
-                    if file.lower().endswith(('.pth', '.pt', '.onnx')):
-                        full_path = os.path.join(path, file)
-                        found_models.append((file, full_path))
+        # Индекс обновляется инкрементально по mtime, метаданные читаются без загрузки весов
+        found_models = self.model_catalog.refresh()
 
         # Добавляем в комбобокс
         self.model_combo.addItem("-- Выберите модель --", "")
 
         if found_models:
-            for file_name, full_path in found_models:
-                display_text = f"{file_name} ({os.path.dirname(full_path)})"
-                self.model_combo.addItem(display_text, full_path)
+            for entry in found_models:
+                display_text = f"{describe_model(entry)} ({os.path.dirname(entry['path'])})"
+                self.model_combo.addItem(display_text, entry['path'])
         else:
             self.model_combo.addItem("❌ Модели не найдены", "")
 
@@ -742,7 +790,7 @@ class SettingsTab(QWidget):
                     self,
                     "Выберите файл модели",
                     "",
-                    "Model Files (*.pth *.pt *.onnx);;All Files (*)"
+                    "Model Files (*.pth *.pt *.safetensors *.onnx);;All Files (*)"
                 )
                 if path:
                     # Добавляем выбранный файл в список
@@ -759,15 +807,23 @@ class SettingsTab(QWidget):
 
     def update_model_info(self, model_path):
         """Обновление информации о модели"""
-        if model_path and os.path.exists(model_path):
-            file_name = os.path.basename(model_path)
-            file_size = os.path.getsize(model_path) / (1024 * 1024)  # в MB
-
-            self.model_info_label.setText(
-                f"✅ Модель: {file_name}\n"
-                f"📁 Путь: {os.path.dirname(model_path)}\n"
-                f"📊 Размер: {file_size:.2f} MB"
-            )
+        entry = self.model_catalog.get(model_path) if model_path else None
+        if entry:
+            file_size = entry['size'] / (1024 * 1024)  # в MB
+
+            info_lines = [
+                f"✅ Модель: {entry['name']}",
+                f"📁 Путь: {os.path.dirname(entry['path'])}",
+                f"📊 Размер: {file_size:.2f} MB",
+            ]
+            if entry.get('f1') is not None:
+                info_lines.append(f"🏆 F1: {entry['f1']:.4f} • Эпоха: {entry.get('epoch', 'N/A')}")
+            if entry.get('model_config'):
+                config = entry['model_config']
+                info_lines.append(f"🧠 embed_dim={config.get('embed_dim')}, feature_dim={config.get('feature_dim')}")
+            info_lines.append(f"🔑 SHA-256: {entry['sha256'][:16]}")
+
+            self.model_info_label.setText("\n".join(info_lines))
             self.model_info_label.setStyleSheet("color: #27ae60; font-size: 10px;")
         else:
             self.model_info_label.setText("⚠ Модель не выбрана или не найдена")
@@ -784,12 +840,20 @@ class SettingsTab(QWidget):
         if saved_model_path and os.path.exists(saved_model_path):
             # Ищем путь в комбобоксе
             for i in range(self.model_combo.count()):
-                if self.model_combo.itemData(i) == saved_model_path:
+                if self.model_combo.itemData(i) == os.path.abspath(saved_model_path):
                     self.model_combo.setCurrentIndex(i)
                     self.update_model_info(saved_model_path)
                     break
 
-        self.threshold_spin.setValue(self.settings.value("model/threshold", 0.7, type=float))
+        threshold = normalize_threshold(self.settings.value("model/threshold", DEFAULT_THRESHOLD, type=float))
+        self.threshold_spin.setValue(threshold * 100)
+        # Сохраненные вердикты уже построены по сохраненному порогу: пересчет не нужен
+        model_handler.policy.set_threshold(threshold)
+        self.watch_model_check.setChecked(self.settings.value("model/watch", False, type=bool))
+        self.rss_limit_spin.setValue(self.settings.value("inference/rss_limit_mb", 0, type=float))
+        self.latency_slo_spin.setValue(
+            self.settings.value("inference/latency_slo_ms", DEFAULT_LATENCY_SLO_MS, type=float))
+        self.apply_inference_settings()
 
         # НАСТРОЙКИ ИНТЕРФЕЙСА
         self.theme_combo.setCurrentText(self.settings.value("interface/theme", "Темная (по умолчанию)"))
@@ -812,7 +876,10 @@ class SettingsTab(QWidget):
             model_path = self.model_combo.currentData()
             if model_path and model_path != "browse":
                 self.settings.setValue("model/path", model_path)
-            self.settings.setValue("model/threshold", self.threshold_spin.value())
+            self.settings.setValue("model/threshold", self.threshold_spin.value() / 100)
+            self.settings.setValue("model/watch", self.watch_model_check.isChecked())
+            self.settings.setValue("inference/rss_limit_mb", self.rss_limit_spin.value())
+            self.settings.setValue("inference/latency_slo_ms", self.latency_slo_spin.value())
 
             # НАСТРОЙКИ ИНТЕРФЕЙСА
             self.settings.setValue("interface/theme", self.theme_combo.currentText())
@@ -832,6 +899,8 @@ class SettingsTab(QWidget):
 
             # Применяем настройки к модели
             self.apply_model_settings()
+            self.apply_inference_settings()
+            self.apply_threshold_settings()
 
             # Применяем настройки интерфейса
             interface_settings = {
@@ -1249,7 +1318,10 @@ class SettingsTab(QWidget):
         if reply == QMessageBox.Yes:
             # Сбрасываем на默认ные значения
             self.model_combo.setCurrentIndex(0)
-            self.threshold_spin.setValue(0.7)
+            self.threshold_spin.setValue(DEFAULT_THRESHOLD * 100)
+            self.watch_model_check.setChecked(False)
+            self.rss_limit_spin.setValue(0)
+            self.latency_slo_spin.setValue(DEFAULT_LATENCY_SLO_MS)
 
             # Настройки интерфейса
             self.theme_combo.setCurrentText("Темная (по умолчанию)")
@@ -1269,21 +1341,78 @@ class SettingsTab(QWidget):
             self.main_window.update_status("Загружены默认ные настройки")
 
     def apply_model_settings(self):
-        """Применение настроек модели"""
+        """Применение настроек модели: загрузка в фоне и атомарная замена"""
         try:
             model_path = self.model_combo.currentData()
-            if model_path and model_path != "browse" and os.path.exists(model_path):
-                # Обновляем модель в обработчике
-                from .model_handler import model_handler
-                model_handler.model_path = model_path
-                if model_handler.load_model():
-                    self.main_window.update_status(f"Модель загружена: {os.path.basename(model_path)}")
-                    print("Настройки модели применены")
-                else:
-                    self.show_error("Не удалось загрузить модель")
+            if not model_path or model_path == "browse" or not os.path.exists(model_path):
+                return
+
+            if model_handler.model is not None and model_handler.model_path and \
+                    os.path.abspath(model_handler.model_path) == os.path.abspath(model_path):
+                return
+
+            if self.model_loader and self.model_loader.isRunning():
+                self.main_window.update_status("Модель уже загружается...")
+                return
+
+            # Текущая модель продолжает обслуживать запросы до готовности новой
+            self.model_loader = ModelLoadWorker(model_path)
+            self.model_loader.loaded.connect(self.on_model_loaded)
+            self.model_loader.error.connect(self.on_model_load_error)
+            self.model_loader.start()
+            self.main_window.update_status(f"Загрузка модели: {os.path.basename(model_path)}...")
         except Exception as e:
             print(f"Ошибка применения настроек модели: {e}")
 
+    def apply_inference_settings(self):
+        """Лимиты памяти и времени прохода для подбора размера пачки (0 МБ - авто)"""
+        model_handler.engine.governor.configure(
+            rss_limit_mb=self.rss_limit_spin.value(),
+            latency_slo_ms=self.latency_slo_spin.value()
+        )
+
+    def on_model_loaded(self, prepared, report=None):
+        model_handler.activate_model(prepared)
+        self.on_model_swapped(prepared['path'])
+        self.main_window.update_status(f"✅ Модель загружена: {os.path.basename(prepared['path'])}")
+        print("Настройки модели применены")
+
+    def on_model_swapped(self, model_path):
+        self.rollback_btn.setEnabled(model_handler.previous_model is not None)
+        self.update_model_info(model_path)
+        if self.watch_model_check.isChecked():
+            self.checkpoint_watcher.watch(model_handler.model_path)
+
+    def apply_threshold_settings(self):
+        """Единый порог вердикта: при его изменении сохраненные вердикты пересчитываются по сырым оценкам"""
+        threshold = normalize_threshold(self.threshold_spin.value() / 100)
+        if threshold == model_handler.policy.threshold:
+            return
+        model_handler.policy.set_threshold(threshold)
+        if hasattr(self.main_window, 'history_tab'):
+            updated = self.main_window.history_tab.apply_threshold_policy()
+            self.main_window.update_status(f"Порог {threshold * 100:.0f}%: пересчитано вердиктов - {updated}")
+
+    def on_watch_model_toggled(self, checked):
+        if checked:
+            self.checkpoint_watcher.watch(model_handler.model_path)
+        else:
+            self.checkpoint_watcher.stop()
+            self.main_window.update_status("Отслеживание модели выключено")
+
+    def on_model_load_error(self, error_message):
+        self.show_error(f"Не удалось загрузить модель: {error_message}")
+
+    def rollback_model(self):
+        """Возврат к предыдущей модели"""
+        if model_handler.rollback_model():
+            self.on_model_swapped(model_handler.model_path)
+            self.main_window.update_status(
+                f"↩️ Возвращена модель: {os.path.basename(model_handler.model_path)}"
+            )
+        else:
+            self.rollback_btn.setEnabled(False)
+
     def show_error(self, message):
         QMessageBox.critical(self, "Ошибка", message)
         self.main_window.update_status(f"Ошибка: {message}")
\ No newline at end of file
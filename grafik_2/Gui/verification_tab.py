@@ -7,6 +7,7 @@ from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QPixmap, QFont, QColor
 from .widgets import DragDropLabel
 from .model_handler import model_handler  # Используем тот же model_handler
+from neurosignature.stage_timer import format_stages
 
 
 class VerificationWorker(QThread):
@@ -226,7 +227,10 @@ class VerificationTab(QWidget):
 
         result_text += f"ВЕРДИКТ: {result['verdict']}\n"
         result_text += f"СТЕПЕНЬ СХОДСТВА: {result['similarity']:.1f}%\n"
-        result_text += f"УВЕРЕННОСТЬ: {result['confidence_level']}\n\n"
+        result_text += f"УВЕРЕННОСТЬ: {result['confidence_level']}\n"
+        if result.get('stage_ms'):
+            result_text += f"ВРЕМЯ АНАЛИЗА: {result['duration_ms']:.0f} мс ({format_stages(result['stage_ms'])})\n"
+        result_text += "\n"
 
         result_text += result['details']
 
@@ -239,14 +243,19 @@ class VerificationTab(QWidget):
             self.main_window.history_tab.add_to_history(
                 f"{os.path.basename(self.reference_image_path)} vs {os.path.basename(self.verify_image_path)}",
                 result_text,
-                "Верификация"
+                "Верификация",
+                score=result.get('raw_similarity'),
+                model_id=result.get('model_id'),
+                image_hashes=result.get('image_hashes'),
+                duration_ms=result.get('duration_ms'),
+                stage_ms=result.get('stage_ms')
             )
 
         # Подсвечиваем кнопку в зависимости от результата
-        similarity = result.get('raw_similarity', 0.5)
-        if similarity > 0.7:
+        confidence_level = result.get('confidence_level', 'low')
+        if confidence_level == 'high':
             self.verify_btn.setStyleSheet("background-color: #27ae60; color: white;")
-        elif similarity > 0.5:
+        elif confidence_level == 'medium':
             self.verify_btn.setStyleSheet("background-color: #f39c12; color: white;")
         else:
             self.verify_btn.setStyleSheet("background-color: #e74c3c; color: white;")
@@ -1,6 +1,7 @@
-import torch
 import os
 
+from neurosignature.checkpoint_io import load_checkpoint
+
 
 def analyze_model_structure():
     """Анализирует структуру сохраненной модели"""
@@ -11,7 +12,8 @@ def analyze_model_structure():
         return
 
     print("🔍 Анализ структуры модели...")
-    checkpoint = torch.load(model_path, map_location='cpu')
+    # Веса отображаются в память: для анализа структуры копировать их не нужно
+    checkpoint = load_checkpoint(model_path, map_location='cpu')
 
     print("📋 Все ключи в checkpoint:")
     for key in checkpoint.keys():
@@ -34,6 +36,9 @@ def analyze_model_structure():
                 print(f"   - {key}: {state_dict[key].shape}")
 
     # Анализируем метрики
+    if checkpoint.get('format') == 'inference':
+        print("\nℹ Чекпойнт для инференса (без состояния оптимизатора)")
+
     if 'f1' in checkpoint:
         print(f"\n🏆 Метрики модели:")
         print(f"   - F1 Score: {checkpoint['f1']:.4f}")
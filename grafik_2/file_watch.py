@@ -0,0 +1,68 @@
+import os
+
+
+class FileStabilityTracker:
+    """Определение завершенной записи файла по стабильности размера и mtime.
+
+    По умолчанию текущая версия файла считается уже принятой и отслеживаются
+    только изменения; с accept_current=False о текущей версии тоже будет
+    сообщено, когда она перестанет меняться.
+
+    С confirm=True сообщенная версия не считается принятой, пока вызывающий
+    код не подтвердит ее обработку через accept(); после retry() о той же
+    версии будет сообщено снова.
+    """
+
+    def __init__(self, path, stable_checks=2, accept_current=True, confirm=False):
+        self.path = path
+        self.stable_checks = stable_checks
+        self.confirm = confirm
+        self.accepted = self._signature() if accept_current else None
+        # Версия, о которой сообщено и которая ждет подтверждения (confirm=True)
+        self.reported = None
+        self.pending = None
+        self.pending_count = 0
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def poll(self):
+        """Возвращает True один раз, когда новая версия файла перестала меняться"""
+        signature = self._signature()
+
+        if signature is None or signature in (self.accepted, self.reported):
+            self.pending = None
+            self.pending_count = 0
+            return False
+
+        if signature != self.pending:
+            # Файл еще пишется: начинаем отсчет заново
+            self.pending = signature
+            self.pending_count = 1
+            return False
+
+        self.pending_count += 1
+        if self.pending_count < self.stable_checks:
+            return False
+
+        if self.confirm:
+            self.reported = signature
+        else:
+            self.accepted = signature
+        self.pending = None
+        self.pending_count = 0
+        return True
+
+    def accept(self):
+        """Подтверждение обработки сообщенной версии"""
+        if self.reported is not None:
+            self.accepted = self.reported
+            self.reported = None
+
+    def retry(self):
+        """Сообщенная версия не обработана: сообщить о ней снова, когда она будет стабильна"""
+        self.reported = None
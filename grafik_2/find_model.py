@@ -1,23 +1,21 @@
 import os
-import glob
+
+from neurosignature.model_catalog import get_catalog, describe_model
 
 
 def find_model_files():
     """Найти все файлы моделей в проекте"""
     print("Поиск файлов моделей...")
 
-    # Возможные расширения моделей
-    extensions = ['*.pth', '*.pt', '*.pkl', '*.onnx']
-
-    model_files = []
-    for ext in extensions:
-        model_files.extend(glob.glob(f"**/{ext}", recursive=True))
-        model_files.extend(glob.glob(f"../**/{ext}", recursive=True))
+    # Индекс обновляется инкрементально: переиндексируются только измененные файлы
+    catalog = get_catalog()
+    models = catalog.refresh()
+    model_files = [entry['path'] for entry in models]
 
     if model_files:
         print("Найдены файлы моделей:")
-        for i, model_file in enumerate(model_files, 1):
-            print(f"{i}. {model_file} (полный путь: {os.path.abspath(model_file)})")
+        for i, entry in enumerate(models, 1):
+            print(f"{i}. {describe_model(entry)} (полный путь: {os.path.abspath(entry['path'])})")
     else:
         print("Файлы моделей не найдены!")
 
@@ -0,0 +1,169 @@
+import os
+import csv
+import json
+import argparse
+
+from history_store import HistoryStore, DEFAULT_HISTORY_DB, report_lines
+
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+EXPORT_COLUMNS = (
+    'id', 'timestamp', 'image_name', 'processing_type', 'score', 'threshold',
+    'verdict', 'confidence_level', 'model_id', 'duration_ms', 'stage_ms',
+    'img1_hash', 'img2_hash', 'report'
+)
+
+# Количество записей, читаемых из базы и записываемых за один шаг
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Для экспорта в Parquet установите пакет: pip install pyarrow")
+    return pyarrow
+
+
+def format_from_path(path):
+    """Формат экспорта по расширению файла"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'json':
+        extension = 'jsonl'
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {path}")
+    return extension
+
+
+def export_row(entry):
+    """Строка экспорта: текст отчета строится из полей записи"""
+    row = {column: entry.get(column) for column in EXPORT_COLUMNS}
+    row['report'] = "\n".join(report_lines(entry)).strip()
+    # Время этапов - JSON-строкой: один столбец во всех форматах
+    if row['stage_ms'] is not None:
+        row['stage_ms'] = json.dumps(row['stage_ms'])
+    return row
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        # utf-8-sig: корректное открытие кириллицы в Excel
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=EXPORT_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        pa = _require_pyarrow()
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('timestamp', pa.string()),
+            ('image_name', pa.string()),
+            ('processing_type', pa.string()),
+            ('score', pa.float64()),
+            ('threshold', pa.float64()),
+            ('verdict', pa.string()),
+            ('confidence_level', pa.string()),
+            ('model_id', pa.string()),
+            ('duration_ms', pa.float64()),
+            ('stage_ms', pa.string()),
+            ('img1_hash', pa.string()),
+            ('img2_hash', pa.string()),
+            ('report', pa.string()),
+        ])
+        # Каждая пачка записывается отдельной группой строк
+        self.writer = pa.parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': _CsvWriter,
+    'jsonl': _JsonlWriter,
+    'parquet': _ParquetWriter,
+}
+
+
+def export_history(store, path, fmt=None, filters=None, progress=None, should_stop=None,
+                   chunk_size=EXPORT_CHUNK_SIZE):
+    """Потоковый экспорт истории в CSV/JSONL/Parquet.
+
+    progress(done, total) вызывается после каждой пачки, should_stop() - проверка отмены.
+    Файл пишется во временный и появляется под итоговым именем только после завершения.
+    Возвращает количество выгруженных записей.
+    """
+    fmt = fmt or format_from_path(path)
+    total = store.count(filters)
+    tmp_path = path + ".part"
+    writer = WRITERS[fmt](tmp_path)
+    exported = 0
+
+    try:
+        for chunk in store.iter_entries(filters, chunk_size):
+            if should_stop and should_stop():
+                raise ExportCancelled()
+            writer.write([export_row(entry) for entry in chunk])
+            exported += len(chunk)
+            if progress:
+                progress(exported, total)
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт истории проверок")
+    parser.add_argument('output', help="Файл экспорта (.csv, .jsonl, .parquet)")
+    parser.add_argument('--db', default=DEFAULT_HISTORY_DB, help="База истории")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=None)
+    parser.add_argument('--from', dest='date_from', default=None, help="Начальная дата YYYY-MM-DD")
+    parser.add_argument('--to', dest='date_to', default=None, help="Конечная дата YYYY-MM-DD")
+    args = parser.parse_args()
+
+    filters = {'date_from': args.date_from, 'date_to': args.date_to}
+    store = HistoryStore(args.db)
+    exported = export_history(
+        store, args.output, args.format, filters,
+        progress=lambda done, total: print(f"\r📤 {done}/{total}", end="", flush=True)
+    )
+    print(f"\n✅ Выгружено записей: {exported} -> {args.output}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
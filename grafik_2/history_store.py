@@ -0,0 +1,742 @@
+import os
+import re
+import json
+import zlib
+import sqlite3
+import threading
+
+from neurosignature.verdict_policy import normalize_threshold, ThresholdPolicy, LEVEL_VERDICTS, LEVEL_TEXTS
+from neurosignature.stage_timer import LatencyStats, format_stages, TOTAL, LATENCY_WINDOW
+
+
+DEFAULT_HISTORY_DB = "history.db"
+
+# Версия схемы (PRAGMA user_version): 2 - компактные записи без готового текста отчета,
+# 3 - время этапов проверки (stage_ms)
+SCHEMA_VERSION = 3
+
+# Текст отчета длиннее этого размера хранится сжатым zlib
+COMPRESS_MIN_BYTES = 256
+
+# Старые JSON-файлы истории, переносимые в базу при первом запуске
+LEGACY_HISTORY_FILES = ("processing_history.json", "verification_history.json")
+
+# Оценка сравнения в тексте старых отчетов ("СТЕПЕНЬ СХОДСТВА: 98.7%")
+LEGACY_SCORE_PATTERN = re.compile(r"СТЕПЕНЬ СХОДСТВА:\s*([\d.]+)\s*%")
+
+# Строки старых отчетов, которые report_lines строит заново по числовым полям.
+# Отчет с другими строками (характеристики, рекомендации) сохраняется целиком
+LEGACY_REGENERATED_PREFIXES = ("ВЕРДИКТ:", "СТЕПЕНЬ СХОДСТВА:", "УВЕРЕННОСТЬ:", "ПОРОГ:")
+
+# Поля, достаточные для строки списка истории (без текста отчета)
+SUMMARY_COLUMNS = ('id', 'timestamp', 'image_name', 'processing_type', 'score', 'verdict', 'confidence_level')
+
+# Измерения статистики: выражение ключа по строке entries ({row} - new или old).
+# NULL-ключ означает, что запись в измерение не попадает
+STATS_DIMENSIONS = {
+    'all': "''",
+    'day': "substr({row}.timestamp, 1, 10)",
+    'level': "COALESCE({row}.confidence_level, '')",
+    'model': "COALESCE({row}.model_ref, '')",
+    'type': "COALESCE({row}.processing_type, '')",
+    'bucket': "CAST(MAX(MIN(CAST({row}.score * 10 AS INTEGER), 9), 0) AS TEXT)",
+}
+
+HISTOGRAM_BUCKETS = 10
+
+# Сколько последних дней возвращает stats()
+STATS_DAYS = 30
+
+# Столбцы таблицы entries. Текст отчета для записей с оценкой не хранится,
+# а строится по числовым полям; модель хранится ссылкой на таблицу models
+ENTRY_COLUMNS = (
+    'id', 'timestamp', 'image_name', 'processing_type', 'score', 'threshold',
+    'model_ref', 'verdict', 'confidence_level', 'duration_ms',
+    'img1_hash', 'img2_hash', 'stage_ms', 'report'
+)
+
+
+class HistoryStore:
+    """История проверок в SQLite: вставка O(1), индексы по id и времени, постраничные запросы"""
+
+    def __init__(self, db_path=DEFAULT_HISTORY_DB):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.model_refs = {}
+        self.model_ids = {}
+        self._create_schema()
+
+    def _create_entries_table(self):
+        # AUTOINCREMENT: идентификаторы не переиспользуются после удаления
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                image_name TEXT,
+                processing_type TEXT,
+                score REAL,
+                threshold REAL,
+                model_ref INTEGER,
+                verdict TEXT,
+                confidence_level TEXT,
+                duration_ms REAL,
+                img1_hash BLOB,
+                img2_hash BLOB,
+                stage_ms TEXT,
+                report BLOB
+            )
+        """)
+
+    def _create_schema(self):
+        with self.lock:
+            self._migrate_compact_schema()
+
+        with self.lock, self.conn:
+            self._create_entries_table()
+            self._migrate_stage_column()
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS models (
+                    id INTEGER PRIMARY KEY,
+                    sha256 TEXT UNIQUE NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp)")
+            # Индексы для фасетных фильтров поиска
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_level ON entries(confidence_level, timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_type ON entries(processing_type, timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_score ON entries(score)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.has_fts = self._create_fts()
+        self._create_stats()
+
+    def _create_fts(self):
+        """Полнотекстовый индекс по именам файлов и вердиктам (если SQLite собран с FTS5)"""
+        try:
+            with self.lock, self.conn:
+                exists = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name='entries_fts'"
+                ).fetchone()
+                self.conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                        image_name, verdict, content='entries', content_rowid='id'
+                    )
+                """)
+                # Индекс поддерживается триггерами при любых изменениях entries
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+                        INSERT INTO entries_fts(rowid, image_name, verdict)
+                        VALUES (new.id, new.image_name, new.verdict);
+                    END
+                """)
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+                        INSERT INTO entries_fts(entries_fts, rowid, image_name, verdict)
+                        VALUES ('delete', old.id, old.image_name, old.verdict);
+                    END
+                """)
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_update
+                    AFTER UPDATE OF image_name, verdict ON entries
+                    WHEN old.image_name IS NOT new.image_name OR old.verdict IS NOT new.verdict BEGIN
+                        INSERT INTO entries_fts(entries_fts, rowid, image_name, verdict)
+                        VALUES ('delete', old.id, old.image_name, old.verdict);
+                        INSERT INTO entries_fts(rowid, image_name, verdict)
+                        VALUES (new.id, new.image_name, new.verdict);
+                    END
+                """)
+                if not exists:
+                    self.conn.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ FTS5 недоступен, текстовый поиск через LIKE: {e}")
+            return False
+
+    def _create_stats(self):
+        """Агрегаты статистики, поддерживаемые триггерами при вставке и удалении"""
+        with self.lock, self.conn:
+            exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='stats'").fetchone()
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS stats (
+                    dimension TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    scored INTEGER NOT NULL DEFAULT 0,
+                    score_sum REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dimension, key)
+                ) WITHOUT ROWID
+            """)
+
+            increments = "\n".join(_stats_increment(dim, 'new') for dim in STATS_DIMENSIONS)
+            decrements = "\n".join(_stats_decrement(dim, 'old') for dim in STATS_DIMENSIONS)
+            self.conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS entries_stats_insert AFTER INSERT ON entries BEGIN {increments} END"
+            )
+            self.conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS entries_stats_delete AFTER DELETE ON entries BEGIN {decrements} END"
+            )
+            # Пересчет вердиктов меняет только уровень: обновляются лишь записи, сменившие уровень
+            self.conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS entries_stats_level AFTER UPDATE OF confidence_level ON entries
+                WHEN old.confidence_level IS NOT new.confidence_level BEGIN
+                    {_stats_decrement('level', 'old')}
+                    {_stats_increment('level', 'new')}
+                END
+            """)
+
+            if not exists:
+                self._rebuild_stats()
+
+    def _rebuild_stats(self):
+        # Первичное заполнение агрегатов для уже существующих записей
+        self.conn.execute("DELETE FROM stats")
+        for dimension, key_expr in STATS_DIMENSIONS.items():
+            key = key_expr.format(row='entries')
+            self.conn.execute(f"""
+                INSERT INTO stats (dimension, key, total, scored, score_sum)
+                SELECT ?, {key} AS k, COUNT(*), COUNT(score), COALESCE(SUM(score), 0)
+                FROM entries WHERE {key} IS NOT NULL GROUP BY k
+            """, (dimension,))
+
+    def _migrate_stage_column(self):
+        # Записи версий до 3 остаются без времени этапов
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if 'stage_ms' not in columns:
+            self.conn.execute("ALTER TABLE entries ADD COLUMN stage_ms TEXT")
+
+    def _migrate_compact_schema(self):
+        """Перенос записей старой схемы (готовый текст отчета, полные пути) в компактную"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if 'full_result' not in columns:
+            return
+
+        print("🔄 Перевод истории на компактную схему...")
+        for name in ('entries_fts_insert', 'entries_fts_delete', 'entries_fts_update',
+                     'entries_stats_insert', 'entries_stats_delete', 'entries_stats_level'):
+            self.conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+        self.conn.execute("BEGIN")
+        try:
+            for name in ('entries_fts', 'stats'):
+                self.conn.execute(f"DROP TABLE IF EXISTS {name}")
+            self.conn.execute("ALTER TABLE entries RENAME TO entries_legacy")
+            self._create_entries_table()
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS models (id INTEGER PRIMARY KEY, sha256 TEXT UNIQUE NOT NULL)"
+            )
+
+            cursor = self.conn.execute("SELECT * FROM entries_legacy ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    self._insert(_score_legacy_entry(dict(row)))
+
+            # Сохраняем счетчик id, чтобы идентификаторы удаленных записей не выдавались снова
+            sequence = self.conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name='entries_legacy'"
+            ).fetchone()
+            if sequence:
+                self.conn.execute("DELETE FROM sqlite_sequence WHERE name='entries'")
+                self.conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('entries', ?)", (sequence[0],))
+            self.conn.execute("DROP TABLE entries_legacy")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        # Возврат освободившегося места файлу
+        self.conn.execute("VACUUM")
+        print("✅ История переведена на компактную схему")
+
+    # ===== УПАКОВКА ЗАПИСЕЙ =====
+
+    def _model_ref(self, model_id):
+        """Числовая ссылка на модель по ее SHA-256"""
+        if not model_id:
+            return None
+        if model_id not in self.model_refs:
+            self.conn.execute("INSERT OR IGNORE INTO models (sha256) VALUES (?)", (model_id,))
+            ref = self.conn.execute("SELECT id FROM models WHERE sha256=?", (model_id,)).fetchone()[0]
+            self.model_refs[model_id] = ref
+            self.model_ids[ref] = model_id
+        return self.model_refs[model_id]
+
+    def _model_id(self, ref):
+        if ref is None:
+            return None
+        if ref not in self.model_ids:
+            row = self.conn.execute("SELECT sha256 FROM models WHERE id=?", (ref,)).fetchone()
+            self.model_ids[ref] = row[0] if row else None
+        return self.model_ids[ref]
+
+    def _pack(self, entry):
+        """Запись в виде значений столбцов entries"""
+        packed = {c: entry.get(c) for c in ENTRY_COLUMNS if c not in ('model_ref', 'report')}
+        packed['model_ref'] = self._model_ref(entry.get('model_id'))
+        for column in ('img1_hash', 'img2_hash'):
+            if isinstance(packed[column], str):
+                packed[column] = bytes.fromhex(packed[column])
+        if packed['stage_ms']:
+            packed['stage_ms'] = json.dumps(
+                {stage: round(ms, 3) for stage, ms in packed['stage_ms'].items()}, separators=(',', ':')
+            )
+        else:
+            packed['stage_ms'] = None
+
+        # Отчет по оценке строится при чтении; текст хранится для записей без оценки
+        # и для перенесенных старых отчетов с подробностями (report)
+        report = entry.get('report')
+        if report is None and entry.get('score') is None:
+            report = entry.get('full_result')
+        packed['report'] = _pack_text(report)
+        return packed
+
+    def _unpack(self, row):
+        entry = dict(row)
+        if 'model_ref' in entry:
+            entry['model_id'] = self._model_id(entry.pop('model_ref'))
+        for column in ('img1_hash', 'img2_hash'):
+            if entry.get(column) is not None:
+                entry[column] = bytes(entry[column]).hex()
+        if entry.get('stage_ms') is not None:
+            entry['stage_ms'] = json.loads(entry['stage_ms'])
+        if 'report' in entry:
+            entry['report'] = _unpack_text(entry['report'])
+        return entry
+
+    def _insert(self, entry):
+        packed = self._pack(entry)
+        columns = [c for c in ENTRY_COLUMNS if packed.get(c) is not None]
+        cursor = self.conn.execute(
+            f"INSERT INTO entries ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [packed[c] for c in columns]
+        )
+        return cursor.lastrowid
+
+    def _filter_clause(self, filters):
+        """WHERE-условия для фильтров поиска.
+
+        filters - словарь: text, confidence_level, processing_type,
+        date_from, date_to ('YYYY-MM-DD'), score_min, score_max (доли единицы).
+        """
+        conditions = []
+        params = []
+        if not filters:
+            return conditions, params
+
+        text = (filters.get('text') or '').strip()
+        if text:
+            if self.has_fts:
+                # Каждое слово - префиксная фраза, кавычки внутри экранируются
+                query = " ".join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+                conditions.append("id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+                params.append(query)
+            else:
+                conditions.append("(image_name LIKE ? OR verdict LIKE ?)")
+                params += [f"%{text}%", f"%{text}%"]
+
+        if filters.get('confidence_level'):
+            conditions.append("confidence_level = ?")
+            params.append(filters['confidence_level'])
+        if filters.get('processing_type'):
+            conditions.append("processing_type = ?")
+            params.append(filters['processing_type'])
+        if filters.get('date_from'):
+            conditions.append("timestamp >= ?")
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            # Граница включительно: все записи указанного дня
+            conditions.append("timestamp <= ?")
+            params.append(filters['date_to'] + " 23:59:59")
+        if filters.get('score_min') is not None:
+            conditions.append("score >= ?")
+            params.append(filters['score_min'])
+        if filters.get('score_max') is not None:
+            conditions.append("score <= ?")
+            params.append(filters['score_max'])
+        return conditions, params
+
+    # ===== ЗАПИСЬ =====
+
+    def add(self, entry):
+        """Добавление записи, возвращает присвоенный id"""
+        return self.add_many([entry])[0]
+
+    def add_many(self, entries):
+        """Добавление пачки записей одной транзакцией, возвращает присвоенные id"""
+        with self.lock, self.conn:
+            return [self._insert(dict(entry, id=None)) for entry in entries]
+
+    def delete(self, entry_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE id=?", (entry_id,))
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries")
+
+    def rederive_verdicts(self, policy):
+        """Пересчет вердиктов по сырым оценкам одним запросом (без обращения к модели)"""
+        level_case = "CASE WHEN score > :high THEN '{}' WHEN score > :threshold THEN '{}' ELSE '{}' END"
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                f"""
+                UPDATE entries SET
+                    threshold = :threshold,
+                    confidence_level = {level_case.format('high', 'medium', 'low')},
+                    verdict = {level_case.format(policy.verdict_for_level('high'),
+                                                 policy.verdict_for_level('medium'),
+                                                 policy.verdict_for_level('low'))}
+                WHERE score IS NOT NULL
+                """,
+                {'threshold': policy.threshold, 'high': policy.high_threshold}
+            )
+            return cursor.rowcount
+
+    # ===== ЧТЕНИЕ =====
+
+    def get(self, entry_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM entries WHERE id=?", (entry_id,)).fetchone()
+            return self._unpack(row) if row else None
+
+    def page(self, offset=0, limit=100):
+        """Страница записей, новые первыми (limit=-1 - без ограничения)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM entries ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+            return [self._unpack(row) for row in rows]
+
+    def summary_page(self, limit=100, before=None, filters=None):
+        """Облегченные записи для списка, новые первыми.
+
+        before - (timestamp, id) последней загруженной записи: страница строится
+        по индексу без OFFSET, поэтому стоимость не растет с номером страницы.
+        """
+        conditions, params = self._filter_clause(filters)
+        if before is not None:
+            conditions.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params += [before[0], before[0], before[1]]
+
+        query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM entries"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_entries(self, filters=None, chunk_size=1000):
+        """Полные записи пачками в хронологическом порядке (память не зависит от объема истории)"""
+        after = None
+        while True:
+            conditions, params = self._filter_clause(filters)
+            if after is not None:
+                conditions.append("(timestamp > ? OR (timestamp = ? AND id > ?))")
+                params += [after[0], after[0], after[1]]
+
+            query = "SELECT * FROM entries"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY timestamp, id LIMIT ?"
+            params.append(chunk_size)
+
+            with self.lock:
+                chunk = [self._unpack(row) for row in self.conn.execute(query, params).fetchall()]
+            if not chunk:
+                return
+            yield chunk
+            after = (chunk[-1]['timestamp'], chunk[-1]['id'])
+
+    def count(self, filters=None):
+        conditions, params = self._filter_clause(filters)
+        if not conditions:
+            # Без фильтров - из агрегата, без просмотра таблицы
+            with self.lock:
+                row = self.conn.execute("SELECT total FROM stats WHERE dimension = 'all'").fetchone()
+            return row[0] if row else 0
+
+        query = "SELECT COUNT(*) FROM entries"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self.lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def stats(self):
+        """Сводная статистика из агрегатов (без просмотра записей)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT dimension, key, total, scored, score_sum FROM stats "
+                "WHERE dimension != 'day' AND total > 0"
+            ).fetchall()
+            days = self.conn.execute(
+                "SELECT key, total FROM stats WHERE dimension = 'day' AND total > 0 "
+                "ORDER BY key DESC LIMIT ?", (STATS_DAYS,)
+            ).fetchall()
+            model_ids = {row['key']: self._model_id(int(row['key']))
+                         for row in rows if row['dimension'] == 'model' and row['key']}
+
+        result = {
+            'total': 0,
+            'scored': 0,
+            'mean_score': None,
+            'by_level': {},
+            'by_model': {},
+            'by_type': {},
+            'by_day': [(row['key'], row['total']) for row in reversed(days)],
+            'histogram': [0] * HISTOGRAM_BUCKETS,
+        }
+        for row in rows:
+            dimension, key, total = row['dimension'], row['key'], row['total']
+            mean = row['score_sum'] / row['scored'] if row['scored'] else None
+            if dimension == 'all':
+                result['total'] = total
+                result['scored'] = row['scored']
+                result['mean_score'] = mean
+            elif dimension == 'bucket':
+                result['histogram'][int(key)] = total
+            elif dimension == 'level':
+                result['by_level'][key] = total
+            elif dimension == 'model':
+                result['by_model'][model_ids.get(key) or ''] = {'total': total, 'mean_score': mean}
+            elif dimension == 'type':
+                result['by_type'][key] = total
+        return result
+
+    def latency_summary(self, limit=LATENCY_WINDOW):
+        """Перцентили времени этапов по последним limit записям с замером (см. LatencyStats.summary)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT duration_ms, stage_ms FROM entries WHERE duration_ms IS NOT NULL "
+                "ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+        latency = LatencyStats(window=limit)
+        for row in reversed(rows):
+            # Записи до версии 3 дают только общее время
+            stage_ms = json.loads(row['stage_ms']) if row['stage_ms'] else {}
+            stage_ms[TOTAL] = row['duration_ms']
+            latency.record(stage_ms)
+        return latency.summary()
+
+    def max_id(self):
+        """Наибольший выданный id (AUTOINCREMENT: не уменьшается после удалений)"""
+        with self.lock:
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name='entries'").fetchone()
+        return row[0] if row else 0
+
+    def summaries_after(self, entry_id, filters=None):
+        """Облегченные записи, добавленные после указанного id, новые первыми"""
+        conditions, params = self._filter_clause(filters)
+        conditions.append("id > ?")
+        params.append(entry_id)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM entries WHERE {' AND '.join(conditions)} "
+                "ORDER BY timestamp DESC, id DESC",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def facet_values(self, column):
+        """Различные значения индексированного столбца для фильтров"""
+        if column not in ('processing_type', 'confidence_level'):
+            raise ValueError(f"Нет фасета для столбца {column}")
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT DISTINCT {column} FROM entries WHERE {column} IS NOT NULL ORDER BY {column}"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def data_version(self):
+        """Счетчик изменений базы другими соединениями (собственные записи его не меняют)"""
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def size_bytes(self):
+        size = 0
+        for suffix in ("", "-wal"):
+            path = self.db_path + suffix
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # ===== МИГРАЦИЯ =====
+
+    def migrate_legacy_json(self, paths=LEGACY_HISTORY_FILES):
+        """Однократный перенос старых JSON-файлов истории в базу"""
+        migrated = 0
+        for path in paths:
+            key = f"migrated:{os.path.abspath(path)}"
+            with self.lock:
+                done = self.conn.execute("SELECT 1 FROM meta WHERE key=?", (key,)).fetchone()
+            if done or not os.path.exists(path):
+                continue
+
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    legacy_entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ошибка чтения старой истории {path}: {e}")
+                continue
+
+            entries = [_convert_legacy_entry(e) for e in legacy_entries]
+            entries.sort(key=lambda e: e['timestamp'])
+
+            with self.lock, self.conn:
+                for entry in entries:
+                    self._insert(entry)
+                self.conn.execute("INSERT INTO meta VALUES (?, ?)", (key, str(len(entries))))
+
+            print(f"✅ Перенесено записей истории из {path}: {len(entries)}")
+            migrated += len(entries)
+        return migrated
+
+
+def report_lines(entry, default_threshold=None):
+    """Строки отчета: для записей с оценкой строятся по числовым полям при чтении"""
+    if entry.get('score') is None:
+        return (entry.get('report') or '').split('\n')
+
+    level = entry.get('confidence_level')
+    lines = [
+        f"ВЕРДИКТ: {entry.get('verdict') or ''}",
+        f"СТЕПЕНЬ СХОДСТВА: {entry['score'] * 100:.1f}%",
+    ]
+    if level in LEVEL_TEXTS:
+        lines.append(f"УВЕРЕННОСТЬ: {LEVEL_TEXTS[level]}")
+    threshold = entry.get('threshold')
+    if threshold is None:
+        threshold = default_threshold
+    if threshold is not None:
+        lines.append(f"ПОРОГ: {threshold * 100:.0f}%")
+    if entry.get('duration_ms') is not None:
+        lines.append(f"ВРЕМЯ АНАЛИЗА: {entry['duration_ms']:.0f} мс")
+    if entry.get('stage_ms'):
+        lines.append(f"ЭТАПЫ: {format_stages(entry['stage_ms'])}")
+    if level in LEVEL_VERDICTS:
+        lines.append("")
+        lines.append(LEVEL_VERDICTS[level][1])
+    # Перенесенные записи сохраняют исходный текст отчета
+    if entry.get('report'):
+        lines += ["", "ИСХОДНЫЙ ОТЧЕТ:"] + entry['report'].split('\n')
+    return lines
+
+
+def _pack_text(text):
+    """Короткий текст хранится как есть, длинный - сжатым zlib"""
+    if not text:
+        return None
+    data = text.encode('utf-8')
+    if len(data) < COMPRESS_MIN_BYTES:
+        return text
+    return zlib.compress(data, 6)
+
+
+def _unpack_text(value):
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+def _stats_increment(dimension, row):
+    key = STATS_DIMENSIONS[dimension].format(row=row)
+    return f"""
+        INSERT INTO stats (dimension, key, total, scored, score_sum)
+        SELECT '{dimension}', k, 1, {row}.score IS NOT NULL, COALESCE({row}.score, 0)
+        FROM (SELECT {key} AS k) WHERE k IS NOT NULL
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            total = total + 1,
+            scored = scored + excluded.scored,
+            score_sum = score_sum + excluded.score_sum;"""
+
+
+def _stats_decrement(dimension, row):
+    key = STATS_DIMENSIONS[dimension].format(row=row)
+    return f"""
+        UPDATE stats SET
+            total = total - 1,
+            scored = scored - ({row}.score IS NOT NULL),
+            score_sum = score_sum - COALESCE({row}.score, 0)
+        WHERE dimension = '{dimension}' AND key = {key};"""
+
+
+def _score_legacy_entry(entry):
+    """Оценка и уровень для старой записи: из полей записи или из текста отчета.
+
+    Уровень вычисляется по порогу записи (или порогу по умолчанию), чтобы
+    записи попадали в статистику вердиктов, а не в "Без оценки". Текст
+    отчета остается в записи (report), если в нем есть что-то кроме строк,
+    которые строятся по оценке.
+    """
+    if entry.get('report') is None and _has_legacy_details(entry.get('full_result')):
+        entry['report'] = entry['full_result']
+
+    if entry.get('score') is None:
+        match = LEGACY_SCORE_PATTERN.search(entry.get('full_result') or '')
+        if not match:
+            return entry
+        entry['score'] = min(max(float(match.group(1)) / 100, 0.0), 1.0)
+
+    threshold = entry.get('threshold')
+    policy = ThresholdPolicy(threshold) if threshold is not None else ThresholdPolicy()
+    description = policy.describe(entry['score'])
+    entry['verdict'] = description['verdict']
+    entry['confidence_level'] = description['confidence_level']
+    entry['threshold'] = description['threshold']
+    return entry
+
+
+def _has_legacy_details(text):
+    """Есть ли в старом отчете строки, которые не восстанавливаются по числовым полям"""
+    for line in (text or '').split('\n'):
+        line = line.strip()
+        if line and not line.startswith(LEGACY_REGENERATED_PREFIXES):
+            return True
+    return False
+
+
+def _convert_legacy_entry(entry):
+    # Формат processing_history.json
+    if 'full_result' in entry:
+        converted = {key: value for key, value in entry.items() if key != 'id'}
+        converted['timestamp'] = entry.get('timestamp', '')
+        return _score_legacy_entry(converted)
+
+    # Формат verification_history.json
+    image_name = f"{entry.get('original_file', '')} vs {entry.get('test_file', '')}"
+    score = entry.get('confidence')
+    result = entry.get('result', '')
+    full_result = f"ВЕРДИКТ: {result}\nСТЕПЕНЬ СХОДСТВА: {(score or 0) * 100:.1f}%\n"
+    threshold = entry.get('threshold')
+    converted = {
+        'timestamp': entry.get('timestamp', ''),
+        'image_name': image_name,
+        'processing_type': "Верификация",
+        'full_result': full_result,
+        'score': score,
+        'verdict': result,
+        'threshold': normalize_threshold(threshold) if threshold is not None else None,
+    }
+    # Без оценки текст отчета содержит условные 0% - уровень не вычисляется
+    return _score_legacy_entry(converted) if score is not None else converted
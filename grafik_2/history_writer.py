@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import queue
+import threading
+
+
+# Максимальная задержка записи в базу после поступления записи
+FLUSH_INTERVAL = 0.5
+
+# Максимальное количество записей в одной транзакции
+MAX_BATCH = 500
+
+# Повтор неудачной записи пачки (база занята, нет места): пауза удваивается до предела
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30
+
+# Попыток записи остатка при закрытии; не записанное сохраняется в файл рядом с базой
+CLOSE_ATTEMPTS = 3
+
+# Файл записей, не попавших в базу при закрытии; переносится в базу при следующем запуске
+SPILL_SUFFIX = ".pending.jsonl"
+
+
+class HistoryWriter:
+    """Отложенная запись истории в фоновом потоке.
+
+    Записи копятся в очереди и сохраняются пачками одной транзакцией
+    не реже раза в FLUSH_INTERVAL. Каждая пачка атомарна (WAL): при падении
+    процесса теряются только записи, еще не дошедшие до базы.
+
+    Пачка, которую не удалось записать, не отбрасывается: запись повторяется
+    с нарастающей паузой, о каждой ошибке сообщается через on_error(message).
+    Если при закрытии база так и не приняла остаток, он сохраняется в файл
+    <база>.pending.jsonl и переносится в базу при следующем запуске.
+
+    prepare(batch) вызывается под блокировкой хранилища непосредственно перед
+    вставкой: поля, зависящие от текущих настроек (вердикт по порогу), не
+    устаревают, пока записи ждут в очереди.
+    """
+
+    def __init__(self, store, on_written=None, on_error=None, prepare=None, flush_interval=FLUSH_INTERVAL,
+                 max_batch=MAX_BATCH):
+        self.store = store
+        self.on_written = on_written
+        self.on_error = on_error
+        self.prepare = prepare
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.spill_path = store.db_path + SPILL_SUFFIX
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.stopping = threading.Event()
+        self._restore_spilled()
+        self.thread = threading.Thread(target=self._run, name="HistoryWriter", daemon=True)
+        self.thread.start()
+
+    def submit(self, entry):
+        """Постановка записи в очередь; id присваивается после записи в базу"""
+        if self.closed:
+            raise RuntimeError("Запись истории уже остановлена")
+        self.queue.put(entry)
+
+    def flush(self, timeout=None):
+        """Ожидание записи всех поставленных в очередь записей.
+
+        Возвращает False, если за timeout секунд записаны не все (база занята или недоступна).
+        """
+        done = self.queue.all_tasks_done
+        with done:
+            return done.wait_for(lambda: not self.queue.unfinished_tasks, timeout)
+
+    def close(self):
+        """Запись остатка очереди и остановка потока (вызывается при выходе)"""
+        if self.closed:
+            return
+        self.closed = True
+        # Прерывание паузы между повторами: остаток пишется без долгого ожидания
+        self.stopping.set()
+        self.queue.put(None)
+        self.thread.join()
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            if batch[0] is None:
+                self.queue.task_done()
+                break
+
+            # Добор пачки в пределах интервала от первой записи
+            deadline = time.monotonic() + self.flush_interval
+            try:
+                while len(batch) < self.max_batch:
+                    entry = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    if entry is None:
+                        self.queue.task_done()
+                        stop = True
+                        break
+                    batch.append(entry)
+            except queue.Empty:
+                pass
+
+            self._write(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write(self, batch):
+        delay = RETRY_DELAY
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self.store.lock:
+                    if self.prepare:
+                        self.prepare(batch)
+                    ids = self.store.add_many(batch)
+                break
+            except Exception as e:
+                self._report(f"Ошибка записи истории ({len(batch)} записей, попытка {attempt}): {e}")
+                if self.stopping.is_set() and attempt >= CLOSE_ATTEMPTS:
+                    self._spill(batch)
+                    return
+            self.stopping.wait(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+        for entry, entry_id in zip(batch, ids):
+            entry['id'] = entry_id
+
+        if self.on_written:
+            try:
+                self.on_written(batch)
+            except Exception as e:
+                print(f"Ошибка обработки записанной истории: {e}")
+
+    def _report(self, message):
+        if self.on_error:
+            try:
+                self.on_error(message)
+                return
+            except Exception:
+                pass
+        print(f"❌ {message}")
+
+    def _spill(self, batch):
+        """Сохранение не записанных в базу записей в файл (дописывается)"""
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for entry in batch:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._report(f"Записи истории ({len(batch)}) сохранены в {self.spill_path} "
+                         f"и будут перенесены в базу при следующем запуске")
+        except OSError as e:
+            self._report(f"Записи истории ({len(batch)}) потеряны: {e}")
+
+    def _restore_spilled(self):
+        """Перенос записей, сохраненных в файл при прошлом закрытии"""
+        if not os.path.exists(self.spill_path):
+            return
+        try:
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if entries:
+                self.store.add_many(entries)
+            os.remove(self.spill_path)
+            print(f"✅ Перенесено отложенных записей истории: {len(entries)}")
+        except Exception as e:
+            # Файл остается до следующей попытки
+            self._report(f"Не удалось перенести отложенные записи истории: {e}")
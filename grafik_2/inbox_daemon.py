@@ -0,0 +1,409 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+
+from neurosignature.analyzer import SignatureAnalyzer
+from neurosignature.batch_inference import is_image, result_stages, REFERENCE_DIR
+from neurosignature.stage_timer import TOTAL
+from history_store import HistoryStore, DEFAULT_HISTORY_DB
+from file_watch import FileStabilityTracker
+
+
+# Правило именования по умолчанию: ключ эталона - имя файла до первого "_"
+# (12345_scan.png сравнивается с эталоном 12345.png)
+DEFAULT_PATTERN = r'^(?P<key>[^_]+)'
+
+# Файл-спутник проверяемого изображения: <имя без расширения>.json с ключом "reference"
+SIDECAR_EXTENSION = '.json'
+
+DEFAULT_OUTPUT_DIR = "results"
+STATE_DB_NAME = "inbox_state.db"
+
+# Период опроса папки и число одинаковых опросов до признания файла записанным
+DEFAULT_POLL_INTERVAL = 2.0
+STABLE_CHECKS = 2
+
+# Результаты сохраняются (вывод, история, состояние) порциями такого размера
+COMMIT_SIZE = 64
+
+PROCESSING_TYPE = "Входящая папка"
+
+OUTPUT_COLUMNS = (
+    'timestamp', 'questioned', 'reference', 'score', 'verdict', 'confidence_level',
+    'is_genuine', 'threshold', 'error', 'model_id'
+)
+
+PROCESSED = 'processed'
+FAILED = 'failed'
+
+# Попыток проверки одной версии файла с ошибкой (например, файл временно
+# недоступен); после этого версия считается обработанной
+MAX_ATTEMPTS = 3
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class InboxState:
+    """Обработанные файлы входящей папки: версия файла (размер, mtime) и итог.
+
+    Файл обрабатывается повторно, если его версия изменилась или если
+    проверка завершилась ошибкой и еще не исчерпаны max_attempts попыток.
+    """
+
+    def __init__(self, db_path, max_attempts=MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS processed (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    reference TEXT,
+                    status TEXT NOT NULL,
+                    score REAL,
+                    error TEXT,
+                    processed_at TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(processed)")}
+            if 'attempts' not in columns:
+                self.conn.execute("ALTER TABLE processed ADD COLUMN attempts INTEGER NOT NULL DEFAULT 1")
+        # Версии в памяти: опрос большой папки не обращается к базе за каждым файлом
+        self.versions = {}
+        # Число неудачных попыток для версий с ошибкой
+        self.failures = {}
+        rows = self.conn.execute("SELECT path, size, mtime_ns, status, attempts FROM processed")
+        for path, size, mtime_ns, status, attempts in rows:
+            self.versions[path] = (size, mtime_ns)
+            if status == FAILED:
+                self.failures[path] = attempts
+
+    def is_processed(self, path, signature):
+        if self.versions.get(path) != signature:
+            return False
+        return self.failures.get(path, self.max_attempts) >= self.max_attempts
+
+    def attempts(self, path):
+        """Число неудачных попыток текущей версии файла"""
+        return self.failures.get(path, 0)
+
+    def mark_many(self, records):
+        """Запись итогов одной транзакцией: (path, signature, reference, status, score, error)"""
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = []
+        for path, signature, reference, status, score, error in records:
+            attempts = 1
+            if status == FAILED and self.versions.get(path) == signature:
+                attempts = self.failures.get(path, 0) + 1
+            rows.append((path, signature[0], signature[1], reference, status, score, error, now, attempts))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO processed "
+                "(path, size, mtime_ns, reference, status, score, error, processed_at, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        for path, size, mtime_ns, _, status, *_, attempts in rows:
+            self.versions[path] = (size, mtime_ns)
+            if status == FAILED:
+                self.failures[path] = attempts
+            else:
+                self.failures.pop(path, None)
+
+    def close(self):
+        self.conn.close()
+
+
+class ReferenceMatcher:
+    """Поиск эталона для проверяемого файла: файл-спутник или правило именования"""
+
+    def __init__(self, reference_dir, pattern=DEFAULT_PATTERN):
+        self.reference_dir = reference_dir
+        self.pattern = re.compile(pattern)
+        self.references = {}
+
+    def refresh(self):
+        """Индекс эталонов по имени без расширения (эталоны могут добавляться на ходу)"""
+        references = {}
+        for root, _, files in os.walk(self.reference_dir):
+            for name in sorted(files):
+                if is_image(name):
+                    references.setdefault(os.path.splitext(name)[0], os.path.join(root, name))
+        self.references = references
+
+    def match(self, path):
+        """Путь к эталону или None, если он еще не известен"""
+        sidecar = os.path.splitext(path)[0] + SIDECAR_EXTENSION
+        if os.path.exists(sidecar):
+            return self._from_sidecar(sidecar)
+
+        match = self.pattern.search(os.path.splitext(os.path.basename(path))[0])
+        if match is None:
+            return None
+        key = match.group('key') if 'key' in self.pattern.groupindex else match.group(0)
+        return self.references.get(key)
+
+    def _from_sidecar(self, sidecar):
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                reference = json.load(f).get('reference')
+        except (OSError, ValueError, AttributeError):
+            # Спутник еще пишется или поврежден: повтор на следующем опросе
+            return None
+        if not reference:
+            return None
+
+        # Путь относительно спутника, затем относительно папки эталонов
+        for base in (os.path.dirname(sidecar), self.reference_dir):
+            candidate = os.path.normpath(os.path.join(base, reference))
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+
+class InboxDaemon:
+    """Проверка новых файлов входящей папки.
+
+    Папка опрашивается раз в poll_interval; новый или измененный файл
+    изображения берется в работу, когда его размер и mtime не меняются
+    STABLE_CHECKS опросов подряд (файл дописан). Для него ищется эталон;
+    найденные пары проверяются пакетом через общий движок анализатора.
+    Результаты записываются в CSV выходной папки и в историю, затем версия
+    файла отмечается в базе состояния: после перезапуска обработанные файлы
+    не проверяются повторно (при сбое между записями может повториться
+    только последняя порция). Файл с ошибкой проверки берется повторно
+    на следующих опросах, пока не исчерпаны MAX_ATTEMPTS попыток.
+    """
+
+    def __init__(self, analyzer, inbox, output_dir, history_store, reference_dir=None,
+                 pattern=DEFAULT_PATTERN, state_db=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.analyzer = analyzer
+        self.inbox = os.path.abspath(inbox)
+        self.output_dir = os.path.abspath(output_dir)
+        self.reference_dir = os.path.abspath(reference_dir or os.path.join(inbox, REFERENCE_DIR))
+        self.history_store = history_store
+        self.poll_interval = poll_interval
+        self.matcher = ReferenceMatcher(self.reference_dir, pattern)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.state = InboxState(state_db or os.path.join(self.output_dir, STATE_DB_NAME))
+
+        self.trackers = {}
+        # Дописанные файлы без найденного эталона: путь -> версия
+        self.waiting = {}
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        self.state.close()
+
+    def run(self):
+        """Опрос папки до вызова stop() или Ctrl+C"""
+        print(f"📂 Отслеживание: {self.inbox}")
+        print(f"   Эталоны: {self.reference_dir}")
+        print(f"   Результаты: {self.output_dir}")
+        while not self.stopped:
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                # Сбой опроса (например, недоступен сетевой диск) не останавливает службу
+                print(f"❌ Ошибка обработки входящей папки: {e}", file=sys.stderr)
+            time.sleep(max(self.poll_interval - (time.monotonic() - started), 0))
+
+    def run_once(self):
+        """Один опрос: поиск дописанных файлов и проверка тех, для которых найден эталон"""
+        self.matcher.refresh()
+        ready = self.scan()
+
+        pairs = []
+        for path, signature in list(self.waiting.items()) + ready:
+            reference = self.matcher.match(path)
+            if reference is None:
+                if path not in self.waiting:
+                    print(f"⚠️ Эталон не найден, ожидание: {path}", file=sys.stderr)
+                self.waiting[path] = signature
+                continue
+            self.waiting.pop(path, None)
+            pairs.append({'img1': reference, 'img2': path, 'label': None, 'signature': signature})
+
+        if pairs:
+            self.process(pairs)
+        return len(pairs)
+
+    def scan(self):
+        """Дописанные новые и измененные файлы: список (путь, версия)"""
+        excluded = (self.reference_dir, self.output_dir)
+        seen = set()
+        ready = []
+        for root, dirs, files in os.walk(self.inbox):
+            dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in excluded and not d.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.') or not is_image(name):
+                    continue
+                path = os.path.join(root, name)
+                seen.add(path)
+
+                signature = file_signature(path)
+                if signature is None or self.state.is_processed(path, signature):
+                    self.trackers.pop(path, None)
+                    continue
+                if path in self.waiting:
+                    if self.waiting[path] == signature:
+                        continue
+                    # Файл перезаписан: новая версия снова проверяется на стабильность
+                    del self.waiting[path]
+
+                tracker = self.trackers.get(path)
+                if tracker is None:
+                    tracker = self.trackers[path] = FileStabilityTracker(path, STABLE_CHECKS, accept_current=False)
+                if tracker.poll():
+                    del self.trackers[path]
+                    ready.append((path, tracker.accepted))
+
+        # Удаленные файлы больше не отслеживаются
+        for path in set(self.trackers) - seen:
+            del self.trackers[path]
+        for path in set(self.waiting) - seen:
+            del self.waiting[path]
+        return ready
+
+    def process(self, pairs):
+        print(f"🔍 Новых пар: {len(pairs)}")
+        signatures = {pair['img2']: pair['signature'] for pair in pairs}
+        done = errors = 0
+        portion = []
+        for result in self.analyzer.verify_batch(pairs):
+            portion.append(result)
+            if len(portion) >= COMMIT_SIZE:
+                errors += self._commit(portion, signatures)
+                done += len(portion)
+                portion = []
+        if portion:
+            errors += self._commit(portion, signatures)
+            done += len(portion)
+        print(f"✅ Проверено: {done}, ошибок: {errors}")
+
+    def _commit(self, results, signatures):
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # Модель берется из результата: при замене модели во время проверки
+        # активная модель уже не та, что посчитала оценки
+        self._write_output(timestamp, results)
+        self.history_store.add_many([
+            self._history_entry(timestamp, result)
+            for result in results if result['score'] is not None
+        ])
+        self.state.mark_many([
+            (result['img2'], signatures[result['img2']], result['img1'],
+             FAILED if result['error'] else PROCESSED, result['score'], result['error'])
+            for result in results
+        ])
+
+        for result in results:
+            if result['error']:
+                print(f"❌ {result['img2']}: {result['error']}", file=sys.stderr)
+                if self.state.attempts(result['img2']) >= self.state.max_attempts:
+                    print(f"   Попытки исчерпаны ({self.state.max_attempts}), файл пропускается "
+                          f"до изменения", file=sys.stderr)
+        return sum(1 for result in results if result['error'])
+
+    def _write_output(self, timestamp, results):
+        # Файл результатов за день; заголовок пишется при создании
+        path = os.path.join(self.output_dir, f"results-{timestamp[:10]}.csv")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for result in results:
+                writer.writerow(dict(result, timestamp=timestamp, questioned=result['img2'],
+                                     reference=result['img1']))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _history_entry(self, timestamp, result):
+        # Те же поля, что и у записей пакетной проверки в GUI
+        stage_ms = result_stages(result)
+        entry = {
+            'timestamp': timestamp,
+            'image_name': f"{os.path.basename(result['img1'])} vs {os.path.basename(result['img2'])}",
+            'processing_type': PROCESSING_TYPE,
+            'score': result['score'],
+            'threshold': result['threshold'],
+            'model_id': result['model_id'],
+            'verdict': result['verdict'],
+            'confidence_level': result['confidence_level'],
+            'duration_ms': stage_ms[TOTAL],
+            'stage_ms': stage_ms,
+        }
+        if result['hashes']:
+            entry['img1_hash'], entry['img2_hash'] = result['hashes']
+        return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка подписей, поступающих во входящую папку")
+    parser.add_argument('inbox', help="Входящая папка (обходится рекурсивно)")
+    parser.add_argument('--references', default=None,
+                        help=f"Папка эталонов (по умолчанию - <inbox>/{REFERENCE_DIR})")
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN,
+                        help="Регулярное выражение над именем проверяемого файла; группа key - имя эталона")
+    parser.add_argument('-o', '--output', default=None,
+                        help=f"Папка результатов (по умолчанию - <inbox>/{DEFAULT_OUTPUT_DIR})")
+    parser.add_argument('--model', default=None, help="Чекпойнт модели (по умолчанию - найденный автоматически)")
+    parser.add_argument('--threshold', type=float, default=None, help="Порог (доля или проценты)")
+    parser.add_argument('--history-db', default=DEFAULT_HISTORY_DB, help="База истории")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL, help="Период опроса, с")
+    parser.add_argument('--once', action='store_true', help="Обработать имеющиеся файлы и завершиться")
+    args = parser.parse_args()
+
+    analyzer = SignatureAnalyzer(model_path=args.model)
+    if not analyzer.load_model():
+        print("❌ Модель не загружена", file=sys.stderr)
+        return 1
+    if args.threshold is not None:
+        analyzer.policy.set_threshold(args.threshold)
+
+    history_store = HistoryStore(args.history_db)
+    daemon = InboxDaemon(
+        analyzer, args.inbox, args.output or os.path.join(args.inbox, DEFAULT_OUTPUT_DIR),
+        history_store, reference_dir=args.references, pattern=args.pattern, poll_interval=args.interval
+    )
+    try:
+        if args.once:
+            # Каждый файл должен пройти проверку стабильности
+            for _ in range(STABLE_CHECKS):
+                daemon.run_once()
+                time.sleep(args.interval)
+            daemon.run_once()
+        else:
+            daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+        history_store.close()
+        analyzer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,8 @@ import torch
 import torchvision.transforms as transforms
 from PIL import Image
 import matplotlib.pyplot as plt
-from Model import SiameseViT
+from neurosignature.checkpoint_io import load_inference_model
+from neurosignature.verdict_policy import DEFAULT_THRESHOLD
 
 # Определение устройства
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -25,7 +26,7 @@ def verify_signature(model, img1_path, img2_path, transform, device, show_result
             output = model(img1_tensor, img2_tensor)
 
         confidence = output.item()
-        result = True if confidence > 0.5 else False
+        result = True if confidence > DEFAULT_THRESHOLD else False
 
         if show_result:
             # Визуализация
@@ -55,12 +56,9 @@ def signature_recognition(img_orig, img_test, model_path):
     try:
         img_size = (128, 256)
 
-        # Создание модели
-        model = SiameseViT(feature_dim=1024, embed_dim=256, img_size=img_size).to(device)
-
-        # Загрузка весов модели
-        checkpoint = torch.load(model_path, map_location=device)
-        model.load_state_dict(checkpoint['model_state_dict'])
+        # Создание модели сразу на весах чекпойнта (без состояния оптимизатора)
+        model, metadata = load_inference_model(model_path, device)
+        img_size = tuple(metadata.get('model_config', {}).get('img_size', img_size))
 
         # Преобразования
         transform = transforms.Compose([
@@ -0,0 +1,55 @@
+"""NeuroSignature: верификация рукописных подписей без графического интерфейса.
+
+Импорт пакета не загружает torch, модель и не создает файлов: объекты
+подгружаются из модулей пакета при первом обращении к ним.
+
+    from neurosignature import SignatureAnalyzer
+    analyzer = SignatureAnalyzer(model_path="models/best_model.pth")
+    result = analyzer.analyze_pair("reference.png", "questioned.png")
+"""
+import importlib
+
+
+# Публичные имена пакета и модули, в которых они определены
+_EXPORTS = {
+    'SiameseViT': 'model',
+    'load_checkpoint': 'checkpoint_io',
+    'load_inference_model': 'checkpoint_io',
+    'inference_transform': 'checkpoint_io',
+    'export_inference_checkpoint': 'checkpoint_io',
+    'read_checkpoint_metadata': 'checkpoint_io',
+    'SignatureAnalyzer': 'analyzer',
+    'get_analyzer': 'analyzer',
+    'find_model_path': 'analyzer',
+    'AsyncSignatureAnalyzer': 'async_analyzer',
+    'BatchVerifier': 'batch_inference',
+    'read_pairs_csv': 'batch_inference',
+    'pairs_from_directory': 'batch_inference',
+    'pairs_against_reference': 'batch_inference',
+    'InferenceEngine': 'inference_engine',
+    'EngineOverloaded': 'inference_engine',
+    'BatchGovernor': 'batch_governor',
+    'InferencePool': 'worker_pool',
+    'ResultCache': 'result_cache',
+    'image_hash': 'result_cache',
+    'ThresholdPolicy': 'verdict_policy',
+    'ModelCatalog': 'model_catalog',
+    'get_catalog': 'model_catalog',
+    'JobStore': 'job_queue',
+    'run_job': 'job_queue',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,386 @@
+import os
+import threading
+
+import torch
+from PIL import Image
+
+from .checkpoint_io import load_inference_model, inference_transform
+from .model_catalog import get_catalog
+from .result_cache import ResultCache, image_hash, DEFAULT_CACHE_PATH
+from .verdict_policy import ThresholdPolicy, DEFAULT_THRESHOLD
+from .batch_inference import BatchVerifier, DEFAULT_BATCH_SIZE, DEFAULT_DECODE_WORKERS
+from .inference_engine import InferenceEngine, EngineOverloaded
+from .batch_governor import BatchGovernor, DEFAULT_LATENCY_SLO_MS, MAX_BATCH_SIZE
+from .stage_timer import StageTimer, LatencyStats, HASH, DECODE, PREPROCESS, RENDER, TOTAL
+
+
+# Места поиска модели по умолчанию (относительно рабочего каталога и каталога приложения)
+MODEL_SEARCH_PATHS = [
+    'models/best_model.pth',
+    '../models/best_model.pth',
+    '../../models/best_model.pth',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'best_model.pth'),
+]
+
+
+def find_model_path(search_paths=MODEL_SEARCH_PATHS):
+    """Поиск пути к модели в различных возможных местах"""
+    for path in search_paths:
+        if os.path.exists(path):
+            print(f"✅ Найдена модель: {path}")
+            return path
+
+    print("⚠ Модель не найдена")
+    return None
+
+
+class SignatureAnalyzer:
+    """Анализатор подписей без графического интерфейса.
+
+    Создание объекта ничего не загружает: модель, кэш результатов, каталог
+    моделей и движок инференса создаются при первом обращении (или сразу,
+    если autoload=True). Размер проходов модели выбирается по замерам в
+    пределах лимита памяти процесса rss_limit_mb (по умолчанию - половина
+    памяти машины) и целевого времени прохода latency_slo_ms.
+
+    Без модели проверка завершается ошибкой; демо-режим со случайной
+    оценкой включается только явно (demo_mode=True).
+    """
+
+    def __init__(self, model_path=None, device=None, cache_path=DEFAULT_CACHE_PATH,
+                 threshold=DEFAULT_THRESHOLD, autoload=False, demo_mode=False,
+                 rss_limit_mb=None, latency_slo_ms=DEFAULT_LATENCY_SLO_MS):
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.model = None
+        self.model_metadata = {}
+        self.transform = None
+        self.model_checksum = None
+        self.previous_model = None
+        self.model_path = model_path
+        self.cache_path = cache_path
+        self.demo_mode = demo_mode
+        self.policy = ThresholdPolicy(threshold)
+        self.rss_limit_mb = rss_limit_mb
+        self.latency_slo_ms = latency_slo_ms
+        self.latency = LatencyStats()
+
+        self._model_lock = threading.Lock()
+        self._lazy_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._load_attempted = False
+        self._model_catalog = None
+        self._result_cache = None
+        self._engine = None
+
+        if autoload:
+            self.load_model()
+
+    # ===== ЛЕНИВО СОЗДАВАЕМЫЕ КОМПОНЕНТЫ =====
+
+    @property
+    def model_catalog(self):
+        with self._lazy_lock:
+            if self._model_catalog is None:
+                self._model_catalog = get_catalog()
+            return self._model_catalog
+
+    @property
+    def result_cache(self):
+        with self._lazy_lock:
+            if self._result_cache is None:
+                self._result_cache = ResultCache(self.cache_path)
+            return self._result_cache
+
+    @property
+    def engine(self):
+        with self._lazy_lock:
+            if self._engine is None:
+                governor = BatchGovernor(self.rss_limit_mb, self.latency_slo_ms)
+                self._engine = InferenceEngine(self.device, max_batch_size=MAX_BATCH_SIZE, governor=governor)
+            return self._engine
+
+    def close(self):
+        """Остановка движка и закрытие кэша (если они создавались)"""
+        if self._engine is not None:
+            self._engine.close()
+        if self._result_cache is not None:
+            self._result_cache.close()
+
+    # ===== МОДЕЛЬ =====
+
+    def load_model(self):
+        """Загрузка модели"""
+        if self.model_path is None:
+            self.model_path = find_model_path()
+
+        try:
+            if not self.model_path or not os.path.exists(self.model_path):
+                with self._model_lock:
+                    self.model = None
+                    self.transform = None
+                return False
+
+            self.activate_model(self.prepare_model(self.model_path))
+            print("✅ Модель успешно загружена")
+            return True
+
+        except Exception as e:
+            print(f"❌ Ошибка загрузки модели: {e}")
+            with self._model_lock:
+                self.model = None
+                self.transform = None
+            return False
+
+        finally:
+            self._load_attempted = True
+
+    def prepare_model(self, model_path):
+        """Загрузка и прогрев модели без замены активной (можно вызывать из фонового потока)"""
+        img_size = (128, 256)
+
+        # Загрузка весов модели (веса отображаются в память, состояние оптимизатора не читается)
+        model, metadata = load_inference_model(model_path, self.device)
+        img_size = tuple(metadata.get('model_config', {}).get('img_size', img_size))
+
+        # Определение преобразований
+        transform = inference_transform(metadata)
+
+        # Прогрев: первый проход подгружает страницы весов и инициализирует ядра
+        dummy = torch.zeros(1, 1, *img_size, device=self.device)
+        with torch.no_grad():
+            model(dummy, dummy)
+
+        # Контрольная сумма чекпойнта - часть ключа кэша результатов
+        checksum = self.model_catalog.get(model_path)['sha256']
+
+        return {'model': model, 'transform': transform, 'path': model_path,
+                'metadata': metadata, 'checksum': checksum}
+
+    def validate_model(self, prepared):
+        """Проверка новой модели прямым проходом на контрольной паре перед заменой"""
+        img_size = tuple(prepared['metadata'].get('model_config', {}).get('img_size', (128, 256)))
+
+        # Контрольная пара: детерминированный шум в диапазоне нормализованных изображений
+        generator = torch.Generator().manual_seed(0)
+        probe1 = (torch.rand(1, 1, *img_size, generator=generator) * 2 - 1).to(self.device)
+        probe2 = (torch.rand(1, 1, *img_size, generator=generator) * 2 - 1).to(self.device)
+
+        with torch.no_grad():
+            first = prepared['model'](probe1, probe2).item()
+            second = prepared['model'](probe1, probe2).item()
+
+        if not 0.0 <= first <= 1.0:
+            raise ValueError(f"Некорректный выход модели на контрольной паре: {first}")
+        if abs(first - second) > 1e-5:
+            raise ValueError("Модель недетерминирована в режиме инференса")
+
+        report = {'probe_score': first, 'active_score': None}
+        model, _, _ = self._active_model()
+        if model is not None:
+            try:
+                with torch.no_grad():
+                    report['active_score'] = model(probe1, probe2).item()
+            except Exception:
+                # Активная модель другой архитектуры - сравнение невозможно
+                pass
+        return report
+
+    def activate_model(self, prepared):
+        """Атомарная замена активной модели; предыдущая сохраняется для отката"""
+        self._load_attempted = True
+        with self._model_lock:
+            if self.model is not None:
+                self.previous_model = {
+                    'model': self.model,
+                    'transform': self.transform,
+                    'path': self.model_path,
+                    'metadata': self.model_metadata,
+                    'checksum': self.model_checksum
+                }
+            self.model = prepared['model']
+            self.transform = prepared['transform']
+            self.model_path = prepared['path']
+            self.model_metadata = prepared['metadata']
+            self.model_checksum = prepared['checksum']
+        # Кэш не очищается: ключ оценки включает хэш модели, а после отката
+        # оценки прежней версии снова нужны. Объем ограничен вытеснением LRU
+
+    def rollback_model(self):
+        """Мгновенный возврат к предыдущей модели"""
+        with self._model_lock:
+            if self.previous_model is None:
+                return False
+            previous = self.previous_model
+            self.previous_model = None
+        self.activate_model(previous)
+        return True
+
+    def _active_model(self):
+        # Модель загружается при первом обращении; параллельные вызовы ждут загрузки
+        if not self._load_attempted:
+            with self._load_lock:
+                if not self._load_attempted:
+                    self.load_model()
+
+        # Согласованный снимок модели и преобразований: запрос, начатый на старой
+        # модели, завершается на ней даже при замене в другом потоке
+        with self._model_lock:
+            return self.model, self.transform, self.model_checksum
+
+    def is_ready(self):
+        """Модель загружена и принимает запросы"""
+        model, _, _ = self._active_model()
+        return model is not None and not self.engine.saturated()
+
+    # ===== ПРОВЕРКА =====
+
+    def verify_signature(self, img1_path, img2_path, show_result=False):
+        """Проверка подписи с возвратом изображения результата"""
+        verified = self._verify(img1_path, img2_path, show_result)
+        return verified['result'], verified['confidence'], verified['result_image']
+
+    def _verify(self, img1_path, img2_path, show_result=False):
+        # Кроме результата возвращает хэши содержимого (None в демо-режиме), время этапов
+        # и хэш модели, давшей оценку (модель могут заменить во время проверки)
+        model, transform, checksum = self._active_model()
+
+        if model is None:
+            if self.demo_mode:
+                return self._demo_verification(img1_path, img2_path, show_result)
+            raise RuntimeError("Модель не загружена")
+
+        timer = StageTimer()
+        try:
+            # Повторная проверка той же пары той же моделью берется из кэша
+            with timer.stage(HASH):
+                hashes = (image_hash(img1_path), image_hash(img2_path))
+            cache_key = (checksum,) + hashes
+            confidence = self.result_cache.get(*cache_key)
+            cached = confidence is not None
+
+            if not cached or show_result:
+                # Загрузка изображений
+                with timer.stage(DECODE):
+                    img1 = Image.open(img1_path).convert('L')
+                    img2 = Image.open(img2_path).convert('L')
+
+            if not cached:
+                with timer.stage(PREPROCESS):
+                    tensor1, tensor2 = transform(img1), transform(img2)
+
+                # Предсказание: одновременные запросы из разных потоков
+                # объединяются движком в общий проход модели
+                timings = {}
+                confidence = self.engine.score(model, tensor1, tensor2, timings=timings)
+                timer.update(timings)
+                self.result_cache.put(*cache_key, confidence)
+
+            result = self.policy.is_genuine(confidence)
+
+            # Создание визуализации
+            result_image = None
+            if show_result:
+                with timer.stage(RENDER):
+                    result_image = self._create_result_plot(img1, img2, result, confidence)
+
+        except EngineOverloaded:
+            # Перегрузка - не ошибка данных: вызывающий код может повторить запрос
+            raise
+        except Exception as e:
+            raise Exception(f"Ошибка при верификации: {str(e)}")
+
+        stage_ms = timer.result()
+        self.latency.record(stage_ms)
+        return {'result': result, 'confidence': confidence, 'result_image': result_image,
+                'hashes': hashes, 'cached': cached, 'stage_ms': stage_ms, 'model_id': checksum}
+
+    def verify_batch(self, pairs, batch_size=None, decode_workers=DEFAULT_DECODE_WORKERS):
+        """Пакетная проверка пар: генератор результатов (см. BatchVerifier.run).
+
+        Пачки идут через общий движок с пакетным приоритетом и не задерживают
+        одиночные проверки дольше одного прохода модели. Без batch_size размер
+        пачек выбирает регулятор движка.
+        """
+        model, transform, checksum = self._active_model()
+        if model is None:
+            raise RuntimeError("Модель не загружена: пакетная проверка в демо-режиме недоступна")
+
+        verifier = BatchVerifier(
+            model, transform, self.device, policy=self.policy,
+            cache=self.result_cache, model_hash=checksum,
+            batch_size=batch_size or DEFAULT_BATCH_SIZE, decode_workers=decode_workers,
+            engine=self.engine, governor=None if batch_size else self.engine.governor
+        )
+        return verifier.run(pairs)
+
+    def analyze_pair(self, img1_path, img2_path, show_result=False):
+        """Сравнение пары с подробным результатом; ошибки пробрасываются вызывающему"""
+        verified = self._verify(img1_path, img2_path, show_result)
+        confidence = verified['confidence']
+
+        # Формируем детальный результат
+        description = self.policy.describe(confidence)
+
+        return {
+            'verdict': description['verdict'],
+            'similarity': confidence * 100,
+            'confidence_level': description['confidence_level'],
+            'details': description['details'],
+            'raw_similarity': confidence,
+            'is_genuine': verified['result'],
+            'model_id': verified['model_id'],
+            'image_hashes': verified['hashes'],
+            'duration_ms': verified['stage_ms'][TOTAL],
+            'stage_ms': verified['stage_ms'],
+            'result_image': verified['result_image']
+        }
+
+    def cache_stats(self):
+        """Статистика попаданий в кэш результатов"""
+        return self.result_cache.stats()
+
+    def latency_summary(self):
+        """Перцентили времени этапов по последним проверкам (см. LatencyStats.summary)"""
+        return self.latency.summary()
+
+    def _demo_verification(self, img1_path, img2_path, show_result=False):
+        """Демо-режим когда модель не загружена"""
+        timer = StageTimer()
+        try:
+            # Простая проверка на основе размера файла и имени
+            import random
+            confidence = random.uniform(0.3, 0.9)
+            result = self.policy.is_genuine(confidence)
+
+            # Загрузка изображений для визуализации
+            with timer.stage(DECODE):
+                img1 = Image.open(img1_path).convert('L')
+                img2 = Image.open(img2_path).convert('L')
+
+            result_image = None
+            if show_result:
+                with timer.stage(RENDER):
+                    result_image = self._create_result_plot(img1, img2, result, confidence, demo=True)
+
+            return {'result': result, 'confidence': confidence, 'result_image': result_image,
+                    'hashes': None, 'cached': False, 'stage_ms': timer.result(), 'model_id': None}
+
+        except Exception as e:
+            raise Exception(f"Ошибка в демо-режиме: {str(e)}")
+
+    def _create_result_plot(self, img1, img2, result, confidence, demo=False):
+        """Визуализация результата (реализуется графическим клиентом)"""
+        return None
+
+
+_default_analyzer = None
+_default_lock = threading.Lock()
+
+
+def get_analyzer():
+    """Общий анализатор процесса; модель загружается при первой проверке"""
+    global _default_analyzer
+    with _default_lock:
+        if _default_analyzer is None:
+            _default_analyzer = SignatureAnalyzer()
+        return _default_analyzer
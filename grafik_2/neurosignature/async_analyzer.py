@@ -0,0 +1,137 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .result_cache import image_hash
+from .batch_inference import decode_image, load_image_tensor, DEFAULT_DECODE_WORKERS
+from .stage_timer import StageTimer, HASH, DECODE, PREPROCESS, TOTAL
+from .analyzer import get_analyzer
+
+
+# Одновременных вызовов verify/encode; остальные ждут своей очереди в event loop
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+def _snapshot(analyzer):
+    """Модель, преобразование, контрольная сумма, кэш и движок анализатора.
+
+    Первое обращение лениво загружает модель и открывает кэш SQLite,
+    поэтому вызывается только в пуле потоков.
+    """
+    model, transform, checksum = analyzer._active_model()
+    if model is None:
+        raise RuntimeError("Модель не загружена")
+    return model, transform, checksum, analyzer.result_cache, analyzer.engine
+
+
+def _lookup_or_decode(cache, model_hash, img1_path, img2_path, transform):
+    """Хэши пары и оценка из кэша, иначе тензоры; плюс время этапов. Выполняется в пуле потоков"""
+    timer = StageTimer()
+    with timer.stage(HASH):
+        hashes = (image_hash(img1_path), image_hash(img2_path))
+    score = cache.get(model_hash, *hashes) if cache is not None else None
+    if score is not None:
+        return hashes, score, None, timer.timings
+
+    with timer.stage(DECODE):
+        images = (decode_image(img1_path), decode_image(img2_path))
+    with timer.stage(PREPROCESS):
+        tensors = (transform(images[0]), transform(images[1]))
+    return hashes, None, tensors, timer.timings
+
+
+class AsyncSignatureAnalyzer:
+    """Асинхронный интерфейс SignatureAnalyzer для asyncio-сервисов.
+
+    Чтение и декодирование изображений выполняются в ограниченном пуле
+    потоков, инференс - в общем InferenceEngine анализатора, который
+    объединяет одновременные запросы в пачки. Event loop не блокируется.
+    Отмена задачи или истечение таймаута отменяет и еще не начатую работу
+    в пуле и в очереди движка.
+    """
+
+    def __init__(self, analyzer=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 decode_workers=DEFAULT_DECODE_WORKERS, timeout=None):
+        self.analyzer = analyzer or get_analyzer()
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(decode_workers, thread_name_prefix="AsyncDecode")
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """Создание с загрузкой модели и кэша заранее, вне event loop"""
+        self = cls(*args, **kwargs)
+        await self._snapshot()
+        return self
+
+    async def verify(self, img1_path, img2_path, timeout=None):
+        """Сравнение пары; результат в формате SignatureAnalyzer.analyze_pair"""
+        return await asyncio.wait_for(self._verify(img1_path, img2_path), timeout or self.timeout)
+
+    async def verify_many(self, pairs, timeout=None, return_exceptions=False):
+        """Сравнение многих пар (img1, img2) параллельно; таймаут - на весь вызов.
+
+        При return_exceptions=True ошибки отдельных пар возвращаются на их местах.
+        """
+        tasks = [self._verify(img1_path, img2_path) for img1_path, img2_path in pairs]
+        return await asyncio.wait_for(
+            asyncio.gather(*tasks, return_exceptions=return_exceptions),
+            timeout or self.timeout
+        )
+
+    async def encode(self, image_path, timeout=None):
+        """Вектор признаков подписи (список float)"""
+        return await asyncio.wait_for(self._encode(image_path), timeout or self.timeout)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    async def _snapshot(self):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _snapshot, self.analyzer)
+
+    async def _verify(self, img1_path, img2_path):
+        async with self.semaphore:
+            timer = StageTimer()
+            model, transform, checksum, cache, engine = await self._snapshot()
+            loop = asyncio.get_running_loop()
+
+            hashes, score, tensors, timings = await loop.run_in_executor(
+                self.executor, _lookup_or_decode, cache, checksum, img1_path, img2_path, transform
+            )
+            timer.update(timings)
+            cached = score is not None
+            if not cached:
+                timings = {}
+                score = await asyncio.wrap_future(engine.submit(model, *tensors, timings=timings))
+                timer.update(timings)
+                # Запись в кэш - синхронный commit SQLite, выполняется вне event loop
+                await loop.run_in_executor(self.executor, cache.put, checksum, *hashes, score)
+
+            description = self.analyzer.policy.describe(score)
+            stage_ms = timer.result()
+            self.analyzer.latency.record(stage_ms)
+            return {
+                'verdict': description['verdict'],
+                'similarity': score * 100,
+                'confidence_level': description['confidence_level'],
+                'details': description['details'],
+                'raw_similarity': score,
+                'model_id': checksum,
+                'image_hashes': hashes,
+                'duration_ms': stage_ms[TOTAL],
+                'stage_ms': stage_ms,
+                'cached': cached,
+            }
+
+    async def _encode(self, image_path):
+        async with self.semaphore:
+            model, transform, _, _, engine = await self._snapshot()
+            loop = asyncio.get_running_loop()
+            tensor = await loop.run_in_executor(self.executor, load_image_tensor, image_path, transform)
+            return await asyncio.wrap_future(engine.submit_encode(model, tensor))
@@ -0,0 +1,180 @@
+import os
+import threading
+from collections import deque
+
+
+MB = 1024 * 1024
+
+# Целевое время одного прохода модели: ограничивает и ожидание
+# интерактивного запроса за уже начатым пакетным проходом
+DEFAULT_LATENCY_SLO_MS = 200
+
+# Лимит памяти процесса по умолчанию - доля физической памяти машины
+DEFAULT_MEMORY_FRACTION = 0.5
+
+# Стартовый размер пачки до первых замеров и допустимые границы
+DEFAULT_INITIAL_BATCH_SIZE = 8
+MIN_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 128
+
+# Число последних проходов для оценки времени на пару
+TIMING_WINDOW = 32
+
+
+def process_rss_mb():
+    """Резидентная память текущего процесса, МБ (None, если измерить нельзя)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / MB
+    except ImportError:
+        pass
+    try:
+        # Linux без psutil: второе поле statm - резидентные страницы
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def total_memory_mb():
+    """Физическая память машины, МБ (None, если измерить нельзя)"""
+    try:
+        import psutil
+        return psutil.virtual_memory().total / MB
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / MB
+    except (ValueError, AttributeError, OSError):
+        return None
+
+
+def default_rss_limit_mb():
+    total = total_memory_mb()
+    return total * DEFAULT_MEMORY_FRACTION if total else None
+
+
+class BatchGovernor:
+    """Выбор размера пачки по замерам времени и памяти проходов модели.
+
+    После каждого прохода оценивается время на пару (линейная модель
+    "накладные расходы + время на пару" по последним проходам) и прирост
+    памяти процесса на пару. Размер пачки - наибольший, при котором проход
+    укладывается в latency_slo_ms, а память - в rss_limit_mb. При превышении
+    лимита памяти размер пачки сразу уменьшается вдвое; рост - не более чем
+    вдвое за проход, чтобы память на пару измерялась до выхода за лимит.
+    Без psutil память измеряется только в Linux; где ее измерить нельзя,
+    размер выбирается только по времени.
+    """
+
+    def __init__(self, rss_limit_mb=None, latency_slo_ms=DEFAULT_LATENCY_SLO_MS,
+                 initial_batch_size=DEFAULT_INITIAL_BATCH_SIZE,
+                 min_batch_size=MIN_BATCH_SIZE, max_batch_size=MAX_BATCH_SIZE):
+        self.lock = threading.Lock()
+        self.rss_limit_mb = rss_limit_mb or default_rss_limit_mb()
+        self.latency_slo_ms = latency_slo_ms
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_size = max(min_batch_size, min(initial_batch_size, max_batch_size))
+
+        self.timings = deque(maxlen=TIMING_WINDOW)
+        self.overhead_ms = None
+        self.per_sample_ms = None
+        self.per_sample_mb = None
+        self.rss_mb = process_rss_mb()
+        # Наибольшая уже выполненная пачка и память процесса после нее
+        self.largest_size = 0
+        self.largest_rss_mb = self.rss_mb
+        self.last_pass_ms = None
+        self.limited_by = None
+
+    def configure(self, rss_limit_mb=None, latency_slo_ms=None, max_batch_size=None):
+        """Изменение лимитов на ходу; None - оставить текущее значение"""
+        with self.lock:
+            if rss_limit_mb is not None:
+                self.rss_limit_mb = rss_limit_mb or default_rss_limit_mb()
+            if latency_slo_ms is not None:
+                self.latency_slo_ms = latency_slo_ms
+            if max_batch_size is not None:
+                self.max_batch_size = max_batch_size
+            self.batch_size = max(self.min_batch_size, min(self.batch_size, self.max_batch_size))
+
+    def observe(self, size, elapsed_ms):
+        """Учет завершенного прохода из size пар; возвращает новый размер пачки"""
+        rss = process_rss_mb()
+        with self.lock:
+            self.last_pass_ms = elapsed_ms
+            self.timings.append((size, elapsed_ms))
+            self._fit_timing()
+
+            if rss is not None:
+                # Рост памяти на пару виден, когда пачка больше всех предыдущих
+                if size > self.largest_size:
+                    if self.largest_size and self.largest_rss_mb is not None and rss > self.largest_rss_mb:
+                        growth = (rss - self.largest_rss_mb) / (size - self.largest_size)
+                        self.per_sample_mb = max(self.per_sample_mb or 0.0, growth)
+                    self.largest_size = size
+                    self.largest_rss_mb = rss
+                self.rss_mb = rss
+
+            self.batch_size = self._choose(size)
+            return self.batch_size
+
+    def _fit_timing(self):
+        # Метод наименьших квадратов: время = накладные расходы + size * время на пару
+        n = len(self.timings)
+        sx = sum(size for size, _ in self.timings)
+        sy = sum(ms for _, ms in self.timings)
+        sxx = sum(size * size for size, _ in self.timings)
+        sxy = sum(size * ms for size, ms in self.timings)
+        denominator = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denominator if denominator else 0.0
+
+        if slope > 0:
+            self.per_sample_ms = slope
+            self.overhead_ms = max((sy - slope * sx) / n, 0.0)
+        else:
+            # Пачки одного размера: накладные расходы не отделить от времени на пару
+            self.per_sample_ms = sy / sx if sx else None
+            self.overhead_ms = 0.0
+
+    def _choose(self, size):
+        target = self.max_batch_size
+        self.limited_by = 'max_batch_size'
+
+        if self.per_sample_ms:
+            by_latency = int((self.latency_slo_ms - self.overhead_ms) / self.per_sample_ms)
+            if by_latency < target:
+                target, self.limited_by = by_latency, 'latency'
+
+        if self.rss_limit_mb and self.rss_mb is not None:
+            if self.rss_mb > self.rss_limit_mb:
+                target, self.limited_by = min(target, size // 2), 'memory'
+            elif self.per_sample_mb:
+                by_memory = size + int((self.rss_limit_mb - self.rss_mb) / self.per_sample_mb)
+                if by_memory < target:
+                    target, self.limited_by = by_memory, 'memory'
+
+        # Рост проверяется только полной пачкой: неполные проходы не дают
+        # сведений о памяти больших пачек
+        ceiling = size * 2 if size >= self.batch_size else self.batch_size
+        if target > ceiling:
+            target, self.limited_by = ceiling, 'growth'
+
+        return max(self.min_batch_size, target)
+
+    def state(self):
+        """Текущий размер пачки, лимиты и оценки, по которым он выбран"""
+        with self.lock:
+            return {
+                'batch_size': self.batch_size,
+                'limited_by': self.limited_by,
+                'latency_slo_ms': self.latency_slo_ms,
+                'last_pass_ms': self.last_pass_ms,
+                'overhead_ms': self.overhead_ms,
+                'per_sample_ms': self.per_sample_ms,
+                'rss_mb': self.rss_mb,
+                'rss_limit_mb': self.rss_limit_mb,
+                'per_sample_mb': self.per_sample_mb,
+                'max_batch_size': self.max_batch_size,
+            }
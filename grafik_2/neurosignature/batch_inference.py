@@ -0,0 +1,266 @@
+import os
+import sys
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from PIL import Image
+
+from .result_cache import image_hash
+from .stage_timer import StageTimer, HASH, DECODE, PREPROCESS, INFERENCE, TOTAL
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+DEFAULT_BATCH_SIZE = 32
+
+# Потоки декодирования: PIL и torchvision отпускают GIL на большей части работы
+DEFAULT_DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+# Подкаталоги для режима "эталоны / проверяемые"
+REFERENCE_DIR = "reference"
+QUESTIONED_DIR = "questioned"
+
+
+# ===== ИСТОЧНИКИ ПАР =====
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def collect_images(paths):
+    """Файлы изображений из списка файлов и папок (папки обходятся рекурсивно)"""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                images.extend(os.path.join(root, name) for name in sorted(files) if is_image(name))
+        elif is_image(path):
+            images.append(path)
+    return images
+
+
+def read_pairs_csv(csv_path, img_root_dir=None):
+    """Пары из CSV в формате SignaturePairDataset: img1,img2[,label], первая строка - заголовок"""
+    img_root_dir = img_root_dir or os.path.dirname(os.path.abspath(csv_path))
+    pairs = []
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) < 2:
+                continue
+            label = None
+            if len(row) > 2 and row[2].strip():
+                label = float(row[2])
+            pairs.append({
+                'img1': os.path.normpath(os.path.join(img_root_dir, row[0].strip())),
+                'img2': os.path.normpath(os.path.join(img_root_dir, row[1].strip())),
+                'label': label,
+            })
+    return pairs
+
+
+def pairs_against_reference(reference_path, paths):
+    """Каждое изображение сравнивается с одним эталоном"""
+    reference = os.path.abspath(reference_path)
+    return [{'img1': reference, 'img2': path, 'label': None}
+            for path in collect_images(paths) if os.path.abspath(path) != reference]
+
+
+def pairs_from_directory(root):
+    """Пары из каталога с подкаталогами reference/ и questioned/.
+
+    Проверяемый файл сравнивается с эталоном с тем же именем (без расширения);
+    если эталон один, с ним сравниваются все проверяемые файлы.
+    """
+    references = collect_images([os.path.join(root, REFERENCE_DIR)])
+    questioned = collect_images([os.path.join(root, QUESTIONED_DIR)])
+    if not references or not questioned:
+        raise ValueError(f"Ожидаются непустые подкаталоги {REFERENCE_DIR}/ и {QUESTIONED_DIR}/ в {root}")
+
+    if len(references) == 1:
+        return pairs_against_reference(references[0], questioned)
+
+    by_stem = {os.path.splitext(os.path.basename(path))[0]: path for path in references}
+    pairs = []
+    for path in questioned:
+        reference = by_stem.get(os.path.splitext(os.path.basename(path))[0])
+        if reference is None:
+            print(f"⚠️ Нет эталона для {path}", file=sys.stderr)
+            continue
+        pairs.append({'img1': reference, 'img2': path, 'label': None})
+    return pairs
+
+
+# ===== ДЕКОДИРОВАНИЕ =====
+
+def decode_image(path):
+    with Image.open(path) as image:
+        return image.convert('L')
+
+
+def load_image_tensor(path, transform):
+    return transform(decode_image(path))
+
+
+def init_decode_worker():
+    """Инициализация процесса декодирования: один поток torch на процесс"""
+    torch.set_num_threads(1)
+
+
+def prepare_pair(pair, transform, with_hashes=True):
+    """Хэши и тензоры пары; выполняется в потоке или процессе декодирования"""
+    timer = StageTimer()
+    prepared = {'pair': pair, 'error': None, 'hashes': None, 'tensors': None}
+    try:
+        if with_hashes:
+            with timer.stage(HASH):
+                prepared['hashes'] = (image_hash(pair['img1']), image_hash(pair['img2']))
+        with timer.stage(DECODE):
+            images = (decode_image(pair['img1']), decode_image(pair['img2']))
+        with timer.stage(PREPROCESS):
+            prepared['tensors'] = tuple(transform(image) for image in images)
+    except Exception as e:
+        prepared['error'] = str(e)
+    for stage in (HASH, DECODE, PREPROCESS):
+        prepared[f"{stage}_ms"] = timer.timings.get(stage, 0.0)
+    return prepared
+
+
+# ===== ПАКЕТНАЯ ПРОВЕРКА =====
+
+# Этапы, время которых пишется в результат пары полями <этап>_ms
+BATCH_STAGES = (HASH, DECODE, PREPROCESS, INFERENCE)
+
+
+def result_stages(result):
+    """Время этапов результата пакетной проверки: {этап: мс, 'total': сумма}"""
+    stages = {stage: result.get(f"{stage}_ms") or 0.0 for stage in BATCH_STAGES}
+    stages[TOTAL] = sum(stages.values())
+    return stages
+
+
+class BatchVerifier:
+    """Пакетная проверка пар: декодирование в пуле, инференс пачками, кэш результатов.
+
+    С общим движком (engine) пачки ставятся в его очередь с пакетным
+    приоритетом: одиночные запросы оператора обслуживаются раньше, а
+    одновременные задания делят модель поровну по ключу tenant.
+
+    С регулятором (governor) размер каждой следующей пачки берется из его
+    текущего выбора, а batch_size не используется.
+    """
+
+    def __init__(self, model, transform, device='cpu', policy=None, cache=None, model_hash=None,
+                 batch_size=DEFAULT_BATCH_SIZE, decode_workers=DEFAULT_DECODE_WORKERS, executor=None,
+                 engine=None, tenant=None, governor=None):
+        self.model = model
+        self.transform = transform
+        self.device = device
+        self.policy = policy
+        self.cache = cache if model_hash else None
+        self.model_hash = model_hash
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        # Внешний пул (например, процессный) не закрывается верификатором
+        self.executor = executor
+        self.engine = engine
+        self.tenant = tenant if tenant is not None else id(self)
+        self.governor = governor
+
+    def run(self, pairs):
+        """Генератор результатов в порядке пар.
+
+        Следующая пачка декодируется, пока модель считает текущую; остановка
+        потребителя (pause/cancel) останавливает и конвейер.
+        """
+        executor = self.executor or ThreadPoolExecutor(self.decode_workers)
+        pending, position = self._submit_next(executor, pairs, 0)
+        try:
+            while pending:
+                current = pending
+                pending, position = self._submit_next(executor, pairs, position)
+
+                prepared = [future.result() for future in current]
+                yield from self._score(prepared)
+        finally:
+            for future in pending or []:
+                future.cancel()
+            if self.executor is None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def chunk_size(self):
+        """Размер следующей пачки"""
+        if self.governor is not None:
+            return self.governor.batch_size
+        return self.batch_size
+
+    def _submit_next(self, executor, pairs, position):
+        chunk = pairs[position:position + self.chunk_size()]
+        return self._submit(executor, chunk), position + len(chunk)
+
+    def _submit(self, executor, chunk):
+        return [executor.submit(prepare_pair, pair, self.transform, True) for pair in chunk]
+
+    def _score(self, prepared):
+        results = []
+        to_infer = []
+        for item in prepared:
+            result = {
+                'img1': item['pair']['img1'],
+                'img2': item['pair']['img2'],
+                'label': item['pair'].get('label'),
+                'score': None,
+                'cached': False,
+                'error': item['error'],
+                'hashes': item['hashes'],
+                'hash_ms': item['hash_ms'],
+                'decode_ms': item['decode_ms'],
+                'preprocess_ms': item['preprocess_ms'],
+                'inference_ms': 0.0,
+                # Модель, на которой посчитана оценка (снимок на начало проверки)
+                'model_id': self.model_hash,
+            }
+            results.append(result)
+            if item['error']:
+                continue
+
+            if self.cache is not None:
+                score = self.cache.get(self.model_hash, *item['hashes'])
+                if score is not None:
+                    result['score'] = score
+                    result['cached'] = True
+                    continue
+            to_infer.append((result, item['tensors']))
+
+        if to_infer:
+            started = time.perf_counter()
+            if self.engine is not None:
+                futures = self.engine.submit_many(self.model, [tensors for _, tensors in to_infer],
+                                                  tenant=self.tenant)
+                scores = [future.result() for future in futures]
+            else:
+                batch1 = torch.stack([tensors[0] for _, tensors in to_infer]).to(self.device)
+                batch2 = torch.stack([tensors[1] for _, tensors in to_infer]).to(self.device)
+                with torch.no_grad():
+                    scores = self.model(batch1, batch2).reshape(-1).tolist()
+                if self.governor is not None:
+                    self.governor.observe(len(to_infer), (time.perf_counter() - started) * 1000)
+            # Время пачки делится поровну между ее парами
+            inference_ms = (time.perf_counter() - started) * 1000 / len(to_infer)
+
+            for (result, _), score in zip(to_infer, scores):
+                result['score'] = score
+                result['inference_ms'] = inference_ms
+            if self.cache is not None:
+                self.cache.put_many(self.model_hash, [
+                    (*result['hashes'], result['score']) for result, _ in to_infer
+                ])
+
+        if self.policy is not None:
+            for result in results:
+                if result['score'] is not None:
+                    result.update(self.policy.describe(result['score']))
+        return results
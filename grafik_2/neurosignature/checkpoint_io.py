@@ -0,0 +1,231 @@
+import os
+import json
+import argparse
+import warnings
+
+import torch
+
+from .model import SiameseViT
+
+
+# Параметры архитектуры, с которыми обучаются модели проекта
+DEFAULT_MODEL_CONFIG = {
+    'feature_dim': 1024,
+    'embed_dim': 256,
+    'img_size': [128, 256],
+    'patch_size': [16, 32],
+    'depth': 6,
+}
+
+# Поля чекпойнта, которые нужны при инференсе (всё остальное - состояние обучения)
+INFERENCE_METADATA_KEYS = ('epoch', 'f1', 'best_f1', 'best_epoch', 'metrics', 'model_config')
+
+# Ключ метаданных в заголовке safetensors
+SAFETENSORS_METADATA_KEY = 'neurosignature'
+
+
+def is_safetensors(path):
+    return str(path).lower().endswith('.safetensors')
+
+
+def _require_safetensors():
+    try:
+        import safetensors.torch
+    except ImportError:
+        raise ImportError("Для формата .safetensors установите пакет: pip install safetensors")
+    return safetensors.torch
+
+
+def _read_safetensors_header(path):
+    # Формат: 8 байт длины заголовка (little-endian) + JSON-заголовок
+    with open(path, 'rb') as f:
+        header_size = int.from_bytes(f.read(8), 'little')
+        return json.loads(f.read(header_size))
+
+
+def read_safetensors_metadata(path):
+    """Чтение метаданных из заголовка safetensors без загрузки тензоров"""
+    header = _read_safetensors_header(path)
+    raw = header.get('__metadata__', {}).get(SAFETENSORS_METADATA_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def load_checkpoint(path, map_location='cpu', mmap=True):
+    """Загрузка чекпойнта с отображением весов в память вместо копирования"""
+    if is_safetensors(path):
+        st = _require_safetensors()
+        # safetensors читает тензоры через mmap
+        checkpoint = dict(read_safetensors_metadata(path))
+        checkpoint['model_state_dict'] = st.load_file(path, device=str(map_location))
+        return checkpoint
+
+    if mmap:
+        try:
+            return torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+        except RuntimeError as e:
+            # Старый (не zip) формат torch.save не поддерживает mmap
+            # Предупреждение, а не print: stdout может быть потоком результатов CLI
+            warnings.warn(f"mmap недоступен для {os.path.basename(path)}: {e}")
+
+    return torch.load(path, map_location=map_location, weights_only=True)
+
+
+def state_dict_depth(keys):
+    """Число блоков трансформера по именам тензоров state_dict (0, если блоков нет)"""
+    return len({k.split('.')[2] for k in keys if k.startswith('feature_extractor.blocks.')})
+
+
+def build_model(state_dict, model_config=None, device='cpu'):
+    """Создание SiameseViT прямо на весах чекпойнта без промежуточной инициализации"""
+    config = dict(DEFAULT_MODEL_CONFIG)
+    config.update(model_config or {})
+
+    # Глубина берется из самих весов; расхождение с метаданными - явная ошибка,
+    # а не непонятная ошибка ключей в load_state_dict
+    depth = state_dict_depth(state_dict)
+    if depth:
+        if model_config and model_config.get('depth') and model_config['depth'] != depth:
+            raise ValueError(f"Глубина в метаданных чекпойнта ({model_config['depth']}) "
+                             f"не совпадает с весами ({depth})")
+        config['depth'] = depth
+
+    # Модель создается на meta-устройстве: память под случайные веса не выделяется,
+    # параметры подменяются тензорами из state_dict (assign=True)
+    with torch.device('meta'):
+        model = SiameseViT(
+            feature_dim=config['feature_dim'],
+            embed_dim=config['embed_dim'],
+            img_size=tuple(config['img_size']),
+            patch_size=tuple(config['patch_size']),
+            depth=config['depth']
+        )
+    model.load_state_dict(state_dict, assign=True)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def load_inference_model(path, device='cpu'):
+    """Загрузка модели для инференса. Возвращает (model, metadata)"""
+    checkpoint = load_checkpoint(path, map_location=device)
+    state_dict = checkpoint['model_state_dict']
+    metadata = {k: checkpoint[k] for k in INFERENCE_METADATA_KEYS if k in checkpoint}
+
+    model = build_model(state_dict, metadata.get('model_config'), device)
+    return model, metadata
+
+
+def inference_transform(metadata=None):
+    """Преобразование изображения для инференса под размер входа модели"""
+    # torchvision импортируется по требованию: импорт пакета не должен его загружать
+    import torchvision.transforms as transforms
+
+    model_config = (metadata or {}).get('model_config') or DEFAULT_MODEL_CONFIG
+    img_size = tuple(model_config.get('img_size', DEFAULT_MODEL_CONFIG['img_size']))
+    return transforms.Compose([
+        transforms.Resize(img_size),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.5], std=[0.5])
+    ])
+
+
+def inference_checkpoint_path(src_path, fmt='pth'):
+    base, _ = os.path.splitext(src_path)
+    return f"{base}_inference.{fmt}"
+
+
+def export_inference_checkpoint(src_path, dst_path=None, fmt='pth'):
+    """Экспорт чекпойнта для инференса: только веса и метаданные, без состояния оптимизатора"""
+    if fmt not in ('pth', 'safetensors'):
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    dst_path = dst_path or inference_checkpoint_path(src_path, fmt)
+
+    checkpoint = load_checkpoint(src_path)
+    state_dict = checkpoint['model_state_dict']
+
+    metadata = {k: checkpoint[k] for k in INFERENCE_METADATA_KEYS if k in checkpoint}
+    metadata.setdefault('model_config', DEFAULT_MODEL_CONFIG)
+    metadata['source'] = os.path.basename(src_path)
+
+    if fmt == 'safetensors':
+        st = _require_safetensors()
+        tensors = {k: v.contiguous() for k, v in state_dict.items()}
+        st.save_file(tensors, dst_path, metadata={SAFETENSORS_METADATA_KEY: json.dumps(metadata)})
+    else:
+        torch.save({'format': 'inference', 'model_state_dict': state_dict, **metadata}, dst_path)
+
+    src_size = os.path.getsize(src_path) / (1024 * 1024)
+    dst_size = os.path.getsize(dst_path) / (1024 * 1024)
+    print(f"✅ Экспортирован чекпойнт для инференса: {dst_path}")
+    print(f"   Размер: {src_size:.1f} MB -> {dst_size:.1f} MB")
+    return dst_path
+
+
+def infer_model_config(shapes):
+    """Восстановление параметров архитектуры по формам тензоров state_dict"""
+    config = dict(DEFAULT_MODEL_CONFIG)
+
+    cls_shape = shapes.get('feature_extractor.patch_embed.cls_token')
+    if cls_shape:
+        config['embed_dim'] = int(cls_shape[-1])
+
+    comparator_shape = shapes.get('asymmetric_comparator.0.weight')
+    if comparator_shape:
+        config['feature_dim'] = int(comparator_shape[0])
+
+    proj_shape = shapes.get('feature_extractor.patch_embed.proj.weight')
+    pos_shape = shapes.get('feature_extractor.patch_embed.pos_embed')
+    if proj_shape and pos_shape:
+        patch_size = [int(proj_shape[2]), int(proj_shape[3])]
+        num_patches = int(pos_shape[1])
+        # Соотношение сторон изображения фиксировано (1:2), по нему восстанавливаем сетку патчей
+        ratio = config['img_size'][1] // config['img_size'][0]
+        for patches_h in range(1, num_patches + 1):
+            if num_patches % patches_h == 0:
+                patches_w = num_patches // patches_h
+                if patches_w * patch_size[1] == ratio * patches_h * patch_size[0]:
+                    config['img_size'] = [patches_h * patch_size[0], patches_w * patch_size[1]]
+                    break
+        config['patch_size'] = patch_size
+
+    depth = state_dict_depth(shapes)
+    if depth:
+        config['depth'] = depth
+    return config
+
+
+def read_checkpoint_metadata(path):
+    """Метаданные чекпойнта (эпоха, F1, архитектура) без чтения самих весов"""
+    if is_safetensors(path):
+        header = _read_safetensors_header(path)
+        shapes = {k: v['shape'] for k, v in header.items() if k != '__metadata__'}
+        metadata = read_safetensors_metadata(path)
+        metadata['format'] = 'inference'
+        metadata['has_optimizer_state'] = False
+    else:
+        # mmap: тензоры не копируются в память, обращаемся только к их формам
+        checkpoint = load_checkpoint(path, map_location='cpu')
+        state_dict = checkpoint.get('model_state_dict', {})
+        shapes = {k: list(v.shape) for k, v in state_dict.items()}
+        metadata = {k: checkpoint[k] for k in INFERENCE_METADATA_KEYS if k in checkpoint}
+        metadata['format'] = checkpoint.get('format', 'training')
+        metadata['has_optimizer_state'] = 'optimizer_state_dict' in checkpoint
+
+    metadata.setdefault('model_config', infer_model_config(shapes))
+    metadata['num_tensors'] = len(shapes)
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт чекпойнта для инференса")
+    parser.add_argument('checkpoint', help="Путь к чекпойнту обучения (.pth)")
+    parser.add_argument('-o', '--output', default=None, help="Путь для сохранения")
+    parser.add_argument('--format', choices=['pth', 'safetensors'], default='pth')
+    args = parser.parse_args()
+
+    export_inference_checkpoint(args.checkpoint, args.output, args.format)
+
+
+if __name__ == "__main__":
+    main()
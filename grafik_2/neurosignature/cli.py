@@ -0,0 +1,407 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+
+from .checkpoint_io import load_inference_model, inference_transform
+from .model_catalog import get_catalog
+from .result_cache import ResultCache, DEFAULT_CACHE_PATH
+from .verdict_policy import ThresholdPolicy, DEFAULT_THRESHOLD
+from .batch_inference import (BatchVerifier, read_pairs_csv, pairs_from_directory,
+                             pairs_against_reference, init_decode_worker, result_stages,
+                             DEFAULT_BATCH_SIZE, DEFAULT_DECODE_WORKERS)
+from .worker_pool import InferencePool, DEFAULT_THREADS_PER_WORKER
+from .batch_governor import BatchGovernor, DEFAULT_LATENCY_SLO_MS
+from .stage_timer import LatencyStats, STAGE_NAMES, TOTAL
+from .job_queue import JobStore, run_job, DEFAULT_JOBS_DB, DEFAULT_CHUNK_SIZE, TASK_STATES, DEAD, MAX_ATTEMPTS
+
+
+DEFAULT_MODEL_PATH = os.path.join('models', 'best_model.pth')
+
+OUTPUT_FORMATS = ('csv', 'jsonl')
+
+RESULT_COLUMNS = (
+    'img1', 'img2', 'label', 'score', 'verdict', 'confidence_level', 'is_genuine',
+    'threshold', 'cached', 'error', 'hash_ms', 'decode_ms', 'preprocess_ms', 'inference_ms'
+)
+
+# Выгрузка результатов задания: состояние пары вместо признаков одного прогона
+JOB_RESULT_COLUMNS = (
+    'seq', 'img1', 'img2', 'label', 'status', 'attempts', 'score', 'verdict',
+    'confidence_level', 'error', 'hash_ms', 'decode_ms', 'preprocess_ms', 'inference_ms'
+)
+
+# Этапы, время которых суммируется в итоговой сводке
+TIMING_STAGES = ('hash_ms', 'decode_ms', 'preprocess_ms', 'inference_ms')
+
+
+def load_pairs(source, reference=None):
+    """Пары из CSV, из каталога reference/questioned или из каталога против одного эталона"""
+    if os.path.isfile(source):
+        return read_pairs_csv(source)
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"Источник пар не найден: {source}")
+    if reference:
+        return pairs_against_reference(reference, [source])
+    return pairs_from_directory(source)
+
+
+def result_row(result):
+    row = {column: result.get(column) for column in RESULT_COLUMNS}
+    for stage in TIMING_STAGES:
+        if row[stage] is not None:
+            row[stage] = round(row[stage], 3)
+    return row
+
+
+class _CsvResultWriter:
+    def __init__(self, file, columns=RESULT_COLUMNS):
+        self.file = file
+        self.writer = csv.DictWriter(file, fieldnames=columns, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+
+class _JsonlResultWriter:
+    def __init__(self, file, columns=RESULT_COLUMNS):
+        self.file = file
+        self.columns = columns
+
+    def write(self, row):
+        row = {column: row.get(column) for column in self.columns}
+        self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+RESULT_WRITERS = {
+    'csv': _CsvResultWriter,
+    'jsonl': _JsonlResultWriter,
+}
+
+
+def output_format(path, fmt=None):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return 'csv' if extension == 'csv' else 'jsonl'
+
+
+def create_decode_executor(processes):
+    """Процессный пул декодирования (spawn: дочерние процессы не наследуют потоки torch)"""
+    if processes <= 0:
+        return None
+    return ProcessPoolExecutor(
+        processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_decode_worker
+    )
+
+
+def open_verifier(args, model_path, policy):
+    """Пакетный верификатор по параметрам командной строки.
+
+    Возвращает (verifier, model_hash, close): BatchVerifier в одном процессе
+    или InferencePool при --workers. Без --batch-size размер пачки в одном
+    процессе подбирается регулятором по памяти и времени прохода.
+    """
+    device = torch.device(args.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+
+    # Пул создается до загрузки модели: процессам декодирования веса не нужны
+    executor = None if args.workers else create_decode_executor(args.decode_processes)
+    cache = None if args.no_cache else ResultCache(args.cache)
+
+    started = time.perf_counter()
+    model, metadata = load_inference_model(model_path, 'cpu' if args.workers else device)
+    model_hash = get_catalog().get(model_path)['sha256']
+    load_ms = (time.perf_counter() - started) * 1000
+    print(f"✅ Модель загружена: {model_path} ({load_ms:.0f} мс)", file=sys.stderr)
+
+    pool = None
+    governor = None
+    if args.workers:
+        # Процессы пула сами пишут в кэш; соединение родителя не нужно
+        pool = InferencePool(
+            model, inference_transform(metadata), policy=policy,
+            cache_path=args.cache if cache else None, model_hash=model_hash,
+            workers=args.workers, threads_per_worker=args.threads_per_worker,
+            batch_size=args.batch_size or DEFAULT_BATCH_SIZE
+        ).start()
+        verifier = pool
+        print(f"   Процессов инференса: {pool.workers} × {pool.threads_per_worker} потоков", file=sys.stderr)
+    else:
+        if not args.batch_size:
+            governor = BatchGovernor(args.rss_limit_mb, args.latency_slo_ms)
+        verifier = BatchVerifier(
+            model, inference_transform(metadata), device, policy=policy,
+            cache=cache, model_hash=model_hash, batch_size=args.batch_size or DEFAULT_BATCH_SIZE,
+            decode_workers=DEFAULT_DECODE_WORKERS, executor=executor, governor=governor
+        )
+
+    def close():
+        if governor is not None:
+            print_governor_state(governor.state())
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if pool is not None:
+            pool.close()
+        if cache is not None:
+            cache.close()
+
+    return verifier, model_hash, close
+
+
+def print_governor_state(state):
+    """Выбранный размер пачки и оценки, по которым он выбран"""
+    print(f"   Размер пачки: {state['batch_size']} (ограничение: {state['limited_by']})", file=sys.stderr)
+    if state['per_sample_ms'] is not None:
+        print(f"   Время прохода: {state['overhead_ms']:.1f} мс + {state['per_sample_ms']:.2f} мс/пара "
+              f"(цель {state['latency_slo_ms']:.0f} мс)", file=sys.stderr)
+    if state['rss_mb'] is not None:
+        limit = f"{state['rss_limit_mb']:.0f}" if state['rss_limit_mb'] else "—"
+        per_sample = f", ~{state['per_sample_mb']:.1f} МБ/пара" if state['per_sample_mb'] else ""
+        print(f"   Память процесса: {state['rss_mb']:.0f} из {limit} МБ{per_sample}", file=sys.stderr)
+
+
+def print_latency_summary(summary):
+    """Перцентили времени этапов на пару"""
+    for stage, values in summary.items():
+        name = "всего" if stage == TOTAL else STAGE_NAMES.get(stage, stage)
+        print(f"   {name}: p50 {values['p50']:.1f} • p90 {values['p90']:.1f} • "
+              f"p99 {values['p99']:.1f} мс", file=sys.stderr)
+
+
+def open_output(path, fmt=None, columns=RESULT_COLUMNS):
+    """(файл, writer); '-' - stdout"""
+    file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    return file, RESULT_WRITERS[output_format(path, fmt)](file, columns)
+
+
+def verify(args):
+    """Пакетная проверка пар; результаты пишутся потоком по мере готовности"""
+    pairs = load_pairs(args.source, args.reference)
+    if not pairs:
+        print("⚠ Пары для проверки не найдены", file=sys.stderr)
+        return 1
+
+    verifier, _, close_verifier = open_verifier(args, args.model, ThresholdPolicy(args.threshold))
+    print(f"   Пар: {len(pairs)}", file=sys.stderr)
+    file, writer = open_output(args.output, args.format)
+
+    totals = dict.fromkeys(TIMING_STAGES, 0.0)
+    # Перцентили по всем парам прогона, посчитанным моделью
+    latency = LatencyStats(window=len(pairs))
+    done = errors = cached = 0
+    started = time.perf_counter()
+    try:
+        for result in verifier.run(pairs):
+            writer.write(result_row(result))
+            done += 1
+            errors += bool(result['error'])
+            cached += result['cached']
+            for stage in TIMING_STAGES:
+                totals[stage] += result[stage]
+            if not result['error'] and not result['cached']:
+                latency.record(result_stages(result))
+
+            if done % (args.batch_size or DEFAULT_BATCH_SIZE) == 0 or done == len(pairs):
+                file.flush()
+                if not args.quiet:
+                    elapsed = time.perf_counter() - started
+                    print(f"\r🔍 {done}/{len(pairs)} • {done / elapsed:.1f} пар/с",
+                          end="", flush=True, file=sys.stderr)
+    finally:
+        if file is not sys.stdout:
+            file.close()
+        close_verifier()
+
+    elapsed = time.perf_counter() - started
+    print(file=sys.stderr)
+    print(f"✅ Проверено пар: {done} за {elapsed:.1f} с ({done / elapsed:.1f} пар/с), "
+          f"из кэша: {cached}, ошибок: {errors}", file=sys.stderr)
+    print("   Время этапов, с: " + ", ".join(
+        f"{stage[:-3]} {total / 1000:.1f}" for stage, total in totals.items()
+    ), file=sys.stderr)
+    summary = latency.summary()
+    if summary:
+        print("   Время на пару:", file=sys.stderr)
+        print_latency_summary(summary)
+    return 1 if errors else 0
+
+
+# ===== ЗАДАНИЯ =====
+
+def format_progress(counts):
+    return ", ".join(f"{state}: {counts[state]}" for state in TASK_STATES)
+
+
+def job_submit(args):
+    pairs = load_pairs(args.source, args.reference)
+    if not pairs:
+        print("⚠ Пары для проверки не найдены", file=sys.stderr)
+        return 1
+
+    store = JobStore(args.jobs_db)
+    job_id = store.create_job(
+        pairs, name=args.name, source=os.path.abspath(args.source),
+        model_path=os.path.abspath(args.model), threshold=args.threshold
+    )
+    store.close()
+    print(f"✅ Задание {job_id}: пар {len(pairs)}", file=sys.stderr)
+    print(job_id)
+    return 0
+
+
+def job_run(args):
+    """Выполнение или продолжение задания с первой необработанной пары"""
+    store = JobStore(args.jobs_db, args.max_attempts)
+    job = store.get_job(args.job_id)
+    if job is None:
+        print(f"❌ Задание не найдено: {args.job_id}", file=sys.stderr)
+        return 1
+
+    policy = ThresholdPolicy(job['threshold'] if job['threshold'] is not None else DEFAULT_THRESHOLD)
+    verifier, model_hash, close_verifier = open_verifier(args, job['model_path'], policy)
+    if job['model_hash'] is None:
+        store.set_model_hash(job['id'], model_hash)
+    elif job['model_hash'] != model_hash:
+        print("⚠ Файл модели изменился после начала задания: новые результаты получены другой версией",
+              file=sys.stderr)
+
+    def progress(counts):
+        if not args.quiet:
+            print(f"\r💾 {counts['done'] + counts['dead']}/{job['total']} • {format_progress(counts)}",
+                  end="", flush=True, file=sys.stderr)
+
+    try:
+        counts = run_job(store, job['id'], verifier, args.chunk_size, progress)
+    finally:
+        close_verifier()
+        store.close()
+
+    print(file=sys.stderr)
+    print(f"✅ Задание {job['id']}: {format_progress(counts)}", file=sys.stderr)
+    return 1 if counts[DEAD] else 0
+
+
+def job_status(args):
+    store = JobStore(args.jobs_db)
+    jobs = [store.get_job(args.job_id)] if args.job_id else store.jobs()
+    for job in jobs:
+        if job is None:
+            print(f"❌ Задание не найдено: {args.job_id}", file=sys.stderr)
+            return 1
+        state = f"завершено {job['finished']}" if job['finished'] else "не завершено"
+        print(f"#{job['id']} {job['name'] or ''} • создано {job['created']} • {state} • пар {job['total']}")
+        print(f"   {format_progress(store.progress(job['id']))}")
+    store.close()
+    return 0
+
+
+def job_export(args):
+    store = JobStore(args.jobs_db)
+    statuses = [DEAD] if args.dead else None
+    file, writer = open_output(args.output, args.format, JOB_RESULT_COLUMNS)
+    exported = 0
+    try:
+        for task in store.iter_tasks(args.job_id, statuses):
+            writer.write(task)
+            exported += 1
+    finally:
+        if file is not sys.stdout:
+            file.close()
+        store.close()
+    print(f"✅ Выгружено пар: {exported}", file=sys.stderr)
+    return 0
+
+
+def job_requeue(args):
+    store = JobStore(args.jobs_db)
+    requeued = store.requeue_dead(args.job_id)
+    store.close()
+    print(f"✅ Возвращено в очередь пар: {requeued}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="neurosignature", description="NeuroSignature без графического интерфейса")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Параметры выполнения, общие для verify и job run
+    runtime = argparse.ArgumentParser(add_help=False)
+    runtime.add_argument('--batch-size', type=int, default=None,
+                         help="Фиксированный размер пачки; по умолчанию подбирается по памяти и времени прохода")
+    runtime.add_argument('--rss-limit-mb', type=float, default=None,
+                         help="Лимит памяти процесса, МБ (по умолчанию - половина памяти машины)")
+    runtime.add_argument('--latency-slo-ms', type=float, default=DEFAULT_LATENCY_SLO_MS,
+                         help="Целевое время одного прохода модели, мс")
+    runtime.add_argument('--decode-processes', type=int, default=DEFAULT_DECODE_WORKERS,
+                         help="Процессы декодирования; 0 - потоки в основном процессе")
+    runtime.add_argument('--workers', type=int, default=0,
+                         help="Процессы инференса с общими весами (только CPU); 0 - один процесс")
+    runtime.add_argument('--threads-per-worker', type=int, default=DEFAULT_THREADS_PER_WORKER,
+                         help="Потоки torch в каждом процессе инференса")
+    runtime.add_argument('--device', default=None, help="cpu, cuda, cuda:1 ...")
+    runtime.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="База кэша результатов")
+    runtime.add_argument('--no-cache', action='store_true', help="Не использовать кэш результатов")
+    runtime.add_argument('-q', '--quiet', action='store_true', help="Без индикатора прогресса")
+
+    # Источник пар и модель, общие для verify и job submit
+    source = argparse.ArgumentParser(add_help=False)
+    source.add_argument('source', help="CSV пар (img1,img2[,label]) или каталог с reference/ и questioned/")
+    source.add_argument('--reference', default=None, help="Один эталон для всех изображений каталога")
+    source.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Чекпойнт модели (.pth, .safetensors)")
+    source.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Порог (доля или проценты)")
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('-o', '--output', default='-', help="Файл результатов (.csv, .jsonl); '-' - stdout")
+    output.add_argument('--format', choices=OUTPUT_FORMATS, default=None)
+
+    verify_parser = commands.add_parser(
+        'verify', parents=[source, output, runtime], help="Пакетная проверка пар подписей",
+        description="Пакетная проверка пар подписей. Код возврата 1, если хотя бы одна пара не обработана."
+    )
+    verify_parser.set_defaults(handler=verify)
+
+    job_parser = commands.add_parser('job', help="Возобновляемые задания пакетной проверки")
+    job_parser.add_argument('--jobs-db', default=DEFAULT_JOBS_DB, help="База заданий")
+    job_commands = job_parser.add_subparsers(dest='job_command', required=True)
+
+    submit_parser = job_commands.add_parser('submit', parents=[source], help="Создать задание (выводит id)")
+    submit_parser.add_argument('--name', default=None)
+    submit_parser.set_defaults(handler=job_submit)
+
+    run_parser = job_commands.add_parser(
+        'run', parents=[runtime], help="Выполнить или продолжить задание",
+        description="Выполнение задания с первой необработанной пары. Код возврата 1, если есть отложенные пары."
+    )
+    run_parser.add_argument('job_id', type=int)
+    run_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Пар в контрольной точке")
+    run_parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help="Попыток на пару до отложения")
+    run_parser.set_defaults(handler=job_run)
+
+    status_parser = job_commands.add_parser('status', help="Состояние заданий")
+    status_parser.add_argument('job_id', type=int, nargs='?', default=None)
+    status_parser.set_defaults(handler=job_status)
+
+    export_parser = job_commands.add_parser('export', parents=[output], help="Выгрузить результаты задания")
+    export_parser.add_argument('job_id', type=int)
+    export_parser.add_argument('--dead', action='store_true', help="Только отложенные пары")
+    export_parser.set_defaults(handler=job_export)
+
+    requeue_parser = job_commands.add_parser('requeue', help="Вернуть отложенные пары в очередь")
+    requeue_parser.add_argument('job_id', type=int)
+    requeue_parser.set_defaults(handler=job_requeue)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import time
+import threading
+import sys
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+
+import torch
+
+from .stage_timer import percentile, QUEUE, ENCODER, COMPARATOR
+
+
+# Максимальное количество пар в одном проходе модели (без BatchGovernor)
+DEFAULT_MAX_BATCH_SIZE = 32
+
+# Максимальное ожидание добора пачки после первого запроса
+DEFAULT_MAX_WAIT_MS = 5
+
+# Лимит очереди интерактивных запросов: при переполнении новые запросы отклоняются
+DEFAULT_MAX_QUEUE = 256
+
+# Виды запросов: оценка пары и вектор признаков одного изображения
+SCORE = 'score'
+ENCODE = 'encode'
+
+# Классы приоритета: одиночные запросы оператора и пакетные задания
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# Число последних ожиданий в очереди, по которым считается статистика класса
+WAIT_WINDOW = 1024
+
+
+class EngineOverloaded(RuntimeError):
+    """Очередь инференса заполнена, запрос нужно повторить позже"""
+    pass
+
+
+class _Request:
+    __slots__ = ('model', 'kind', 'tensors', 'future', 'priority', 'enqueued', 'timings')
+
+    def __init__(self, model, kind, tensors, priority, timings=None):
+        self.model = model
+        self.kind = kind
+        self.tensors = tensors
+        self.future = Future()
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.timings = timings
+
+
+class InferenceEngine:
+    """Динамическое объединение одиночных запросов в пачки с приоритетами.
+
+    Интерактивные запросы копятся в своей очереди; фоновый поток собирает
+    пачку до max_batch_size пар или до истечения max_wait_ms от первого
+    запроса и выполняет один проход модели. Пакетные задания ставят пары
+    в очереди по своему ключу (tenant) и обслуживаются только когда
+    интерактивных запросов нет: запрос оператора ждет не дольше одного уже
+    начатого прохода. Пачка пакетной работы набирается по кругу из очередей
+    заданий, поэтому одновременные задания делят модель поровну.
+
+    С регулятором (governor) размер прохода выбирается по замерам времени
+    и памяти, max_batch_size остается верхней границей.
+
+    В словарь timings, переданный с запросом, до получения результата
+    записывается время этапов: ожидание в очереди, кодировщик и компаратор
+    (для моделей с encode/compare; иначе весь проход считается кодировщиком).
+
+    Каждый запрос несет снимок модели, на которой он начат: при замене модели
+    запросы к старой и новой версиям считаются разными проходами.
+    """
+
+    def __init__(self, device='cpu', max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_queue=DEFAULT_MAX_QUEUE, governor=None):
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.governor = governor
+        # На GPU этапы разделяются синхронизацией, иначе время уйдет в следующий этап
+        self.synchronize = torch.device(device).type == 'cuda'
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.closed = False
+
+        self.condition = threading.Condition()
+        self.interactive = deque()
+        # Очереди пакетных заданий в порядке обхода по кругу
+        self.batch_queues = OrderedDict()
+
+        self.requests = dict.fromkeys(PRIORITIES, 0)
+        self.rejected = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.waits = {priority: deque(maxlen=WAIT_WINDOW) for priority in PRIORITIES}
+
+        self.thread = threading.Thread(target=self._run, name="InferenceEngine", daemon=True)
+        self.thread.start()
+
+    def submit(self, model, tensor1, tensor2, priority=INTERACTIVE, tenant=None, timings=None):
+        """Постановка пары тензоров [C, H, W] в очередь; возвращает Future с оценкой"""
+        return self._enqueue([_Request(model, SCORE, (tensor1, tensor2), priority, timings)], tenant)[0]
+
+    def submit_encode(self, model, tensor, priority=INTERACTIVE, tenant=None, timings=None):
+        """Постановка изображения [C, H, W] в очередь; возвращает Future с вектором признаков"""
+        return self._enqueue([_Request(model, ENCODE, (tensor,), priority, timings)], tenant)[0]
+
+    def submit_many(self, model, pairs, tenant=None, priority=BATCH):
+        """Постановка списка пар (tensor1, tensor2) пакетного задания; возвращает список Future.
+
+        tenant - ключ задания для равной доли между одновременными заданиями.
+        Пакетные пары не ограничиваются лимитом очереди: задание само ждет
+        результатов текущей порции перед постановкой следующей.
+        """
+        return self._enqueue([_Request(model, SCORE, tensors, priority) for tensors in pairs], tenant)
+
+    def score(self, model, tensor1, tensor2, timeout=None, timings=None):
+        """Синхронная оценка одной пары через общую очередь"""
+        return self.submit(model, tensor1, tensor2, timings=timings).result(timeout)
+
+    def _enqueue(self, requests, tenant):
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Движок инференса остановлен")
+
+            priority = requests[0].priority
+            if priority == INTERACTIVE:
+                if len(self.interactive) + len(requests) > self.max_queue:
+                    self.rejected += len(requests)
+                    raise EngineOverloaded(f"Очередь инференса заполнена ({self.max_queue})")
+                self.interactive.extend(requests)
+            elif priority == BATCH:
+                self.batch_queues.setdefault(tenant, deque()).extend(requests)
+            else:
+                raise ValueError(f"Неизвестный класс приоритета: {priority}")
+
+            self.requests[priority] += len(requests)
+            self.condition.notify()
+        return [request.future for request in requests]
+
+    def saturated(self):
+        with self.condition:
+            return len(self.interactive) >= self.max_queue
+
+    def stats(self):
+        with self.condition:
+            classes = {}
+            for priority in PRIORITIES:
+                waits = list(self.waits[priority])
+                classes[priority] = {
+                    'requests': self.requests[priority],
+                    'queued': self._queued(priority),
+                    'wait_ms_mean': sum(waits) / len(waits) if waits else 0.0,
+                    'wait_ms_p95': percentile(waits, 0.95),
+                    'wait_ms_max': max(waits, default=0.0),
+                }
+            classes[BATCH]['jobs'] = len(self.batch_queues)
+
+            return {
+                'requests': sum(self.requests.values()),
+                'rejected': self.rejected,
+                'batches': self.batches,
+                'mean_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+                'queue_depth': self._queued(INTERACTIVE) + self._queued(BATCH),
+                'queue_limit': self.max_queue,
+                'max_batch_size': self.max_batch_size,
+                'batch_size': self.batch_limit(),
+                'max_wait_ms': self.max_wait * 1000,
+                'classes': classes,
+                'governor': self.governor.state() if self.governor is not None else None,
+            }
+
+    def batch_limit(self):
+        """Текущий размер прохода: выбор регулятора в пределах max_batch_size"""
+        if self.governor is None:
+            return self.max_batch_size
+        return min(self.governor.batch_size, self.max_batch_size)
+
+    def _queued(self, priority):
+        if priority == INTERACTIVE:
+            return len(self.interactive)
+        return sum(len(requests) for requests in self.batch_queues.values())
+
+    def close(self):
+        """Обработка уже принятых запросов и остановка потока"""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.interactive and not self.batch_queues and not self.closed:
+                    self.condition.wait()
+
+                if self.interactive:
+                    batch = self._take_interactive()
+                elif self.batch_queues:
+                    batch = self._take_fair_share()
+                else:
+                    break
+
+            for group in self._group(batch):
+                self._forward(group)
+
+    def _take_interactive(self):
+        # Добор пачки в пределах max_wait от первого запроса; если он уже ждал
+        # конца предыдущего прохода, пачка уходит сразу
+        limit = self.batch_limit()
+        deadline = self.interactive[0].enqueued + self.max_wait
+        while len(self.interactive) < limit and not self.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.condition.wait(remaining)
+
+        count = min(len(self.interactive), limit)
+        return [self.interactive.popleft() for _ in range(count)]
+
+    def _take_fair_share(self):
+        # По одной паре из очереди каждого задания по кругу; порядок обхода
+        # сохраняется между проходами
+        limit = self.batch_limit()
+        batch = []
+        while self.batch_queues and len(batch) < limit:
+            tenant, requests = next(iter(self.batch_queues.items()))
+            batch.append(requests.popleft())
+            if requests:
+                self.batch_queues.move_to_end(tenant)
+            else:
+                del self.batch_queues[tenant]
+        return batch
+
+    def _group(self, batch):
+        # В один проход попадают запросы одного вида к одной и той же модели
+        groups = {}
+        for request in batch:
+            groups.setdefault((id(request.model), request.kind), []).append(request)
+        return groups.values()
+
+    def _forward(self, group):
+        # Отмененные ожидающими запросы не считаются
+        group = [request for request in group if request.future.set_running_or_notify_cancel()]
+        if not group:
+            return
+
+        started = time.monotonic()
+        waits = [(started - request.enqueued) * 1000 for request in group]
+        with self.condition:
+            for request, wait_ms in zip(group, waits):
+                self.waits[request.priority].append(wait_ms)
+
+        model, kind = group[0].model, group[0].kind
+        timings = {}
+        try:
+            inputs = [torch.stack([request.tensors[i] for request in group]).to(self.device)
+                      for i in range(len(group[0].tensors))]
+            with torch.no_grad():
+                if kind == ENCODE:
+                    outputs = model.encode(*inputs).cpu().tolist()
+                    timings[ENCODER] = (time.monotonic() - started) * 1000
+                elif hasattr(model, 'compare'):
+                    codes = [model.encode(batch) for batch in inputs]
+                    if self.synchronize:
+                        torch.cuda.synchronize(self.device)
+                    encoded = time.monotonic()
+                    outputs = model.compare(*codes).reshape(-1).tolist()
+                    timings[ENCODER] = (encoded - started) * 1000
+                    timings[COMPARATOR] = (time.monotonic() - encoded) * 1000
+                else:
+                    outputs = model(*inputs).reshape(-1).tolist()
+                    timings[ENCODER] = (time.monotonic() - started) * 1000
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+
+        for request, wait_ms in zip(group, waits):
+            if request.timings is not None:
+                request.timings[QUEUE] = wait_ms
+                request.timings.update(timings)
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self.condition:
+            self.batches += 1
+            self.batched_requests += len(group)
+        for request, output in zip(group, outputs):
+            request.future.set_result(output)
+
+        # Ошибка подстройки пачки не должна останавливать поток движка:
+        # иначе все ожидающие запросы зависнут
+        if self.governor is not None and kind == SCORE:
+            try:
+                self.governor.observe(len(group), elapsed_ms)
+            except Exception as e:
+                print(f"⚠️ Ошибка подстройки размера пачки: {e}", file=sys.stderr)
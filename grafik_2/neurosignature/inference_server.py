@@ -0,0 +1,182 @@
+import os
+import json
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .inference_engine import EngineOverloaded
+from .batch_governor import DEFAULT_LATENCY_SLO_MS
+from .analyzer import SignatureAnalyzer
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Одновременно обрабатываемые запросы (декодирование + ожидание в очереди движка)
+DEFAULT_MAX_INFLIGHT = 64
+
+# Подсказка клиенту при отказе из-за перегрузки, секунды
+RETRY_AFTER = 1
+
+# Ограничение размера тела запроса
+MAX_BODY_BYTES = 64 * 1024
+
+
+class InferenceHTTPServer(ThreadingHTTPServer):
+    """Локальный HTTP-сервис проверки подписей поверх SignatureAnalyzer"""
+
+    daemon_threads = True
+
+    def __init__(self, analyzer, address=(DEFAULT_HOST, DEFAULT_PORT), max_inflight=DEFAULT_MAX_INFLIGHT):
+        super().__init__(address, InferenceRequestHandler)
+        self.analyzer = analyzer
+        self.max_inflight = max_inflight
+        # Контроль допуска: сверх лимита запросы сразу получают 503
+        self.admission = threading.BoundedSemaphore(max_inflight)
+        self.inflight = 0
+        self.inflight_lock = threading.Lock()
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "NeuroSignature"
+
+    def do_GET(self):
+        analyzer = self.server.analyzer
+        if self.path == '/health':
+            # Процесс жив и отвечает (модель может быть еще не загружена)
+            self.send_json(200, {'status': 'ok'})
+        elif self.path == '/ready':
+            ready = analyzer.is_ready()
+            model_path = analyzer.model_path
+            self.send_json(200 if ready else 503, {
+                'ready': ready,
+                'model': os.path.basename(model_path) if model_path else None,
+                'model_id': analyzer.model_checksum,
+            })
+        elif self.path == '/stats':
+            stats = analyzer.engine.stats()
+            stats['inflight'] = self.server.inflight
+            stats['max_inflight'] = self.server.max_inflight
+            stats['latency'] = analyzer.latency_summary()
+            self.send_json(200, stats)
+        else:
+            self.send_json(404, {'error': f"Неизвестный путь: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/verify':
+            self.send_json(404, {'error': f"Неизвестный путь: {self.path}"})
+            return
+
+        if not self.server.admission.acquire(blocking=False):
+            self.send_overloaded("Превышено число одновременных запросов")
+            return
+        with self.server.inflight_lock:
+            self.server.inflight += 1
+        try:
+            self.handle_verify()
+        finally:
+            with self.server.inflight_lock:
+                self.server.inflight -= 1
+            self.server.admission.release()
+
+    def handle_verify(self):
+        # Тело с неверной длиной не читается: соединение закрывается после ответа
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_json(400, {'error': "Неверный заголовок Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_json(413, {'error': f"Слишком большой запрос (более {MAX_BODY_BYTES} байт)"})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            img1_path, img2_path = request['img1'], request['img2']
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': f"Ожидается JSON {{\"img1\": путь, \"img2\": путь}}: {e}"})
+            return
+
+        for path in (img1_path, img2_path):
+            if not os.path.isfile(path):
+                self.send_json(404, {'error': f"Файл не найден: {path}"})
+                return
+
+        analyzer = self.server.analyzer
+        if not analyzer.is_ready():
+            self.send_overloaded("Модель не загружена или очередь заполнена")
+            return
+
+        try:
+            result = analyzer.analyze_pair(img1_path, img2_path)
+        except EngineOverloaded as e:
+            self.send_overloaded(str(e))
+            return
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+
+        self.send_json(200, result)
+
+    def send_overloaded(self, message):
+        self.send_json(503, {'error': message}, {'Retry-After': str(RETRY_AFTER)})
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        # Журнал только ошибок: успешные запросы не засоряют вывод
+        if str(getattr(code, 'value', code)).startswith(('4', '5')):
+            super().log_request(code, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервис проверки подписей")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--model', default=None, help="Чекпойнт модели (по умолчанию - найденный автоматически)")
+    parser.add_argument('--threshold', type=float, default=None, help="Порог (доля или проценты)")
+    parser.add_argument('--max-batch-size', type=int, default=None,
+                        help="Верхняя граница пачки; в ее пределах размер подбирается по памяти и времени")
+    parser.add_argument('--rss-limit-mb', type=float, default=None,
+                        help="Лимит памяти процесса, МБ (по умолчанию - половина памяти машины)")
+    parser.add_argument('--latency-slo-ms', type=float, default=DEFAULT_LATENCY_SLO_MS,
+                        help="Целевое время одного прохода модели, мс")
+    parser.add_argument('--max-wait-ms', type=float, default=None)
+    parser.add_argument('--max-inflight', type=int, default=DEFAULT_MAX_INFLIGHT)
+    args = parser.parse_args()
+
+    analyzer = SignatureAnalyzer(model_path=args.model, rss_limit_mb=args.rss_limit_mb,
+                                 latency_slo_ms=args.latency_slo_ms)
+    analyzer.load_model()
+    if args.threshold is not None:
+        analyzer.policy.set_threshold(args.threshold)
+    if args.max_batch_size:
+        analyzer.engine.max_batch_size = args.max_batch_size
+    if args.max_wait_ms is not None:
+        analyzer.engine.max_wait = args.max_wait_ms / 1000
+
+    server = InferenceHTTPServer(analyzer, (args.host, args.port), args.max_inflight)
+    print(f"✅ Сервис проверки подписей: http://{args.host}:{args.port} (готов: {analyzer.is_ready()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        analyzer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+
+DEFAULT_JOBS_DB = "jobs.db"
+
+# Состояния пары в задании
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'      # попытка не удалась, пара будет повторена
+DEAD = 'dead'          # попытки исчерпаны: пара отложена для ручного разбора
+
+TASK_STATES = (PENDING, RUNNING, DONE, FAILED, DEAD)
+
+# Попыток на пару до переноса в отложенные
+MAX_ATTEMPTS = 3
+
+# Пар в одной контрольной точке: результаты пачки фиксируются одной транзакцией
+DEFAULT_CHUNK_SIZE = 512
+
+# Поля результата проверки, сохраняемые для пары
+RESULT_FIELDS = ('score', 'verdict', 'confidence_level', 'error', 'hash_ms', 'decode_ms',
+                 'preprocess_ms', 'inference_ms')
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class JobStore:
+    """Персистентная очередь заданий пакетной проверки в SQLite.
+
+    Состояние каждой пары хранится в базе, результаты пачки фиксируются
+    атомарно, поэтому после перезапуска задание продолжается с первой
+    необработанной пары.
+    """
+
+    def __init__(self, db_path=DEFAULT_JOBS_DB, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    created TEXT NOT NULL,
+                    finished TEXT,
+                    source TEXT,
+                    model_path TEXT,
+                    model_hash TEXT,
+                    threshold REAL,
+                    total INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    job_id INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    img1 TEXT NOT NULL,
+                    img2 TEXT NOT NULL,
+                    label REAL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    score REAL,
+                    verdict TEXT,
+                    confidence_level TEXT,
+                    error TEXT,
+                    hash_ms REAL,
+                    decode_ms REAL,
+                    preprocess_ms REAL,
+                    inference_ms REAL,
+                    updated TEXT,
+                    PRIMARY KEY (job_id, seq)
+                ) WITHOUT ROWID
+            """)
+            # Выборка следующей порции и подсчет прогресса по состояниям
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(job_id, status, seq)")
+
+            # Базы, созданные до замера предобработки
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+            if 'preprocess_ms' not in columns:
+                self.conn.execute("ALTER TABLE tasks ADD COLUMN preprocess_ms REAL")
+
+    # ===== ЗАДАНИЯ =====
+
+    def create_job(self, pairs, name=None, source=None, model_path=None, model_hash=None, threshold=None):
+        """Новое задание из списка пар {'img1', 'img2', 'label'}; возвращает id"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (name, created, source, model_path, model_hash, threshold, total) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, _now(), source, model_path, model_hash, threshold, len(pairs))
+            )
+            job_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO tasks (job_id, seq, img1, img2, label, status) VALUES (?, ?, ?, ?, ?, ?)",
+                ((job_id, seq, pair['img1'], pair['img2'], pair.get('label'), PENDING)
+                 for seq, pair in enumerate(pairs))
+            )
+        return job_id
+
+    def get_job(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def jobs(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY id DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def set_model_hash(self, job_id, model_hash):
+        """Контрольная сумма модели, фиксируемая при первом запуске задания"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET model_hash=? WHERE id=?", (model_hash, job_id))
+
+    def progress(self, job_id):
+        """Количество пар задания по состояниям"""
+        counts = dict.fromkeys(TASK_STATES, 0)
+        with self.lock:
+            for row in self.conn.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE job_id=? GROUP BY status", (job_id,)
+            ):
+                counts[row[0]] = row[1]
+        return counts
+
+    def delete_job(self, job_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM tasks WHERE job_id=?", (job_id,))
+            self.conn.execute("DELETE FROM jobs WHERE id=?", (job_id,))
+
+    # ===== ОБРАБОТКА =====
+
+    def recover(self, job_id):
+        """Возврат в очередь пар, оставшихся в работе после аварийной остановки.
+
+        Попытка при этом засчитывается: пара, которая раз за разом роняет
+        процесс, в итоге попадает в отложенные.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE tasks SET status=CASE WHEN attempts >= ? THEN '{DEAD}' ELSE '{FAILED}' END, "
+                "error=COALESCE(error, 'Обработка прервана'), updated=? "
+                "WHERE job_id=? AND status=?",
+                (self.max_attempts, _now(), job_id, RUNNING)
+            )
+
+    def claim(self, job_id, limit=DEFAULT_CHUNK_SIZE):
+        """Атомарный захват следующей порции пар: pending/failed -> running"""
+        with self.lock, self.conn:
+            # IMMEDIATE: два процесса не захватят одну и ту же порцию
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT seq, img1, img2, label FROM tasks WHERE job_id=? AND status IN (?, ?) "
+                "ORDER BY seq LIMIT ?",
+                (job_id, PENDING, FAILED, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE tasks SET status=?, attempts=attempts + 1, updated=? WHERE job_id=? AND seq=?",
+                [(RUNNING, _now(), job_id, row['seq']) for row in rows]
+            )
+        return [dict(row) for row in rows]
+
+    def complete(self, job_id, tasks, results):
+        """Фиксация результатов порции одной транзакцией (контрольная точка)"""
+        now = _now()
+        updates = []
+        for task, result in zip(tasks, results):
+            if result.get('error'):
+                # Ошибочные пары повторяются, пока не исчерпаны попытки
+                status = f"CASE WHEN attempts >= {int(self.max_attempts)} THEN '{DEAD}' ELSE '{FAILED}' END"
+            else:
+                status = f"'{DONE}'"
+            updates.append((status, tuple(result.get(field) for field in RESULT_FIELDS) + (now, job_id, task['seq'])))
+
+        assignments = ", ".join(f"{field}=?" for field in RESULT_FIELDS)
+        with self.lock, self.conn:
+            for status, values in updates:
+                self.conn.execute(
+                    f"UPDATE tasks SET status={status}, {assignments}, updated=? WHERE job_id=? AND seq=?",
+                    values
+                )
+            self._finish_if_complete(job_id)
+
+    def fail(self, job_id, tasks, error):
+        """Ошибка всей порции (например, сбой модели): пары возвращаются в очередь"""
+        self.complete(job_id, tasks, [{'error': error}] * len(tasks))
+
+    def requeue_dead(self, job_id):
+        """Повторная постановка отложенных пар (после исправления файлов)"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status=?, attempts=0, updated=? WHERE job_id=? AND status=?",
+                (PENDING, _now(), job_id, DEAD)
+            )
+            self.conn.execute("UPDATE jobs SET finished=NULL WHERE id=?", (job_id,))
+        return cursor.rowcount
+
+    def _finish_if_complete(self, job_id):
+        remaining = self.conn.execute(
+            "SELECT 1 FROM tasks WHERE job_id=? AND status IN (?, ?, ?) LIMIT 1",
+            (job_id, PENDING, RUNNING, FAILED)
+        ).fetchone()
+        if remaining is None:
+            self.conn.execute("UPDATE jobs SET finished=? WHERE id=? AND finished IS NULL", (_now(), job_id))
+
+    def iter_tasks(self, job_id, statuses=None, chunk_size=1000):
+        """Пары задания в порядке seq (генератор; статусы - фильтр)"""
+        statuses = tuple(statuses or TASK_STATES)
+        placeholders = ", ".join("?" * len(statuses))
+        last_seq = -1
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT * FROM tasks WHERE job_id=? AND seq > ? AND status IN ({placeholders}) "
+                    "ORDER BY seq LIMIT ?",
+                    (job_id, last_seq) + statuses + (chunk_size,)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_seq = rows[-1]['seq']
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def run_job(store, job_id, verifier, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, should_stop=None):
+    """Обработка задания до конца или до остановки.
+
+    verifier - BatchVerifier или InferencePool. Каждая порция фиксируется
+    отдельно, поэтому прерванное задание продолжается повторным вызовом.
+    Возвращает итоговый прогресс по состояниям.
+    """
+    store.recover(job_id)
+    while not (should_stop and should_stop()):
+        tasks = store.claim(job_id, chunk_size)
+        if not tasks:
+            break
+        try:
+            results = list(verifier.run(tasks))
+        except Exception as e:
+            # Сбой не отдельной пары, а всего прохода: фиксируем попытку и останавливаемся
+            store.fail(job_id, tasks, str(e))
+            raise
+        store.complete(job_id, tasks, results)
+        if progress:
+            progress(store.progress(job_id))
+    return store.progress(job_id)
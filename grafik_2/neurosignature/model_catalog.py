@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+
+from .checkpoint_io import read_checkpoint_metadata
+
+
+# Расширения файлов моделей
+MODEL_EXTENSIONS = ('.pth', '.pt', '.safetensors', '.onnx')
+
+# Расширения, для которых можно прочитать метаданные чекпойнта
+CHECKPOINT_EXTENSIONS = ('.pth', '.pt', '.safetensors')
+
+# Каталог моделей проекта; индекс хранится рядом с моделями, а не в текущем каталоге
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_MODELS_DIR, "model_index.json")
+
+DEFAULT_SEARCH_PATHS = [
+    'models',
+    '../models',
+    '../../models',
+    DEFAULT_MODELS_DIR,
+]
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Контрольная сумма файла (потоковое чтение)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelCatalog:
+    """Индекс файлов моделей с кэшированными метаданными чекпойнтов.
+
+    Методы потокобезопасны; внутри процесса используется общий экземпляр
+    get_catalog(), чтобы обновления индекса не перезаписывали друг друга.
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, search_paths=None):
+        self.index_path = index_path
+        self.search_paths = search_paths or DEFAULT_SEARCH_PATHS
+        self.entries = None
+        self.lock = threading.RLock()
+
+    def _load_index(self):
+        if self.entries is not None:
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('models', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save_index(self):
+        # Уникальный временный файл: другие процессы (CLI, сервер) пишут индекс одновременно
+        tmp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.index_path))
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, suffix=".tmp",
+                                             delete=False) as f:
+                tmp_path = f.name
+                json.dump({'models': self.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Ошибка сохранения индекса моделей: {e}", file=sys.stderr)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _scan_files(self):
+        found = set()
+        for path in self.search_paths:
+            if not os.path.isdir(path):
+                continue
+            for file in os.listdir(path):
+                if file.lower().endswith(MODEL_EXTENSIONS):
+                    found.add(os.path.abspath(os.path.join(path, file)))
+        return found
+
+    def _index_file(self, path, stat):
+        entry = {
+            'path': path,
+            'name': os.path.basename(path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_sha256(path),
+            'epoch': None,
+            'f1': None,
+            'model_config': None,
+            'format': None,
+        }
+
+        if path.lower().endswith(CHECKPOINT_EXTENSIONS):
+            try:
+                metadata = read_checkpoint_metadata(path)
+                entry['epoch'] = metadata.get('epoch', metadata.get('best_epoch'))
+                entry['f1'] = metadata.get('f1', metadata.get('best_f1'))
+                entry['model_config'] = metadata.get('model_config')
+                entry['format'] = metadata.get('format')
+            except Exception as e:
+                print(f"⚠ Не удалось прочитать метаданные {entry['name']}: {e}", file=sys.stderr)
+
+        return entry
+
+    def _is_current(self, entry, stat):
+        return entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+
+    def refresh(self, extra_paths=()):
+        """Инкрементальное обновление индекса: переиндексируются только измененные файлы"""
+        with self.lock:
+            return self._refresh(extra_paths)
+
+    def _refresh(self, extra_paths):
+        self._load_index()
+
+        # Ранее выбранные вручную файлы остаются в индексе, пока существуют
+        files = self._scan_files()
+        files.update(p for p in self.entries if os.path.isfile(p))
+        files.update(os.path.abspath(p) for p in extra_paths if p and os.path.isfile(p))
+
+        changed = False
+        for path in list(self.entries):
+            if path not in files:
+                del self.entries[path]
+                changed = True
+
+        for path in files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not self._is_current(self.entries.get(path), stat):
+                self.entries[path] = self._index_file(path, stat)
+                changed = True
+
+        if changed:
+            self._save_index()
+        return self.models()
+
+    def get(self, path):
+        """Метаданные одного файла (индексируется при необходимости)"""
+        if not path or not os.path.isfile(path):
+            return None
+
+        with self.lock:
+            self._load_index()
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            entry = self.entries.get(path)
+            if not self._is_current(entry, stat):
+                entry = self.entries[path] = self._index_file(path, stat)
+                self._save_index()
+            return entry
+
+    def models(self):
+        """Проиндексированные модели, новые первыми"""
+        with self.lock:
+            self._load_index()
+            return sorted(self.entries.values(), key=lambda e: e['mtime'], reverse=True)
+
+
+_default_catalog = None
+_default_lock = threading.Lock()
+
+
+def get_catalog():
+    """Общий каталог моделей процесса"""
+    global _default_catalog
+    with _default_lock:
+        if _default_catalog is None:
+            _default_catalog = ModelCatalog()
+        return _default_catalog
+
+
+def describe_model(entry):
+    """Короткое описание модели для списков выбора"""
+    parts = [entry['name']]
+    if entry.get('f1') is not None:
+        parts.append(f"F1 {entry['f1']:.3f}")
+    if entry.get('epoch') is not None:
+        parts.append(f"эпоха {entry['epoch']}")
+    return " • ".join(parts)
@@ -0,0 +1,123 @@
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+DEFAULT_CACHE_PATH = "result_cache.db"
+
+# Проверка лимита размера выполняется раз в EVICT_INTERVAL вставок
+EVICT_INTERVAL = 64
+
+
+def image_hash(path, chunk_size=1024 * 1024):
+    """Хэш содержимого файла изображения"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Персистентный LRU-кэш оценок модели по ключу (модель, изображение 1, изображение 2)"""
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_entries=50000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.puts_since_evict = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                model_hash TEXT NOT NULL,
+                img1_hash TEXT NOT NULL,
+                img2_hash TEXT NOT NULL,
+                score REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model_hash, img1_hash, img2_hash)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_used ON scores(last_used)")
+        self.conn.commit()
+
+    def get(self, model_hash, img1_hash, img2_hash):
+        """Оценка из кэша или None"""
+        key = (model_hash, img1_hash, img2_hash)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT score FROM scores WHERE model_hash=? AND img1_hash=? AND img2_hash=?", key
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.conn.execute(
+                "UPDATE scores SET last_used=? WHERE model_hash=? AND img1_hash=? AND img2_hash=?",
+                (time.time(),) + key
+            )
+            self.conn.commit()
+            return row[0]
+
+    def put(self, model_hash, img1_hash, img2_hash, score):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                (model_hash, img1_hash, img2_hash, float(score), time.time())
+            )
+            self.puts_since_evict += 1
+            if self.puts_since_evict >= EVICT_INTERVAL:
+                self._evict()
+            self.conn.commit()
+
+    def put_many(self, model_hash, items):
+        """Сохранение пачки оценок одной транзакцией: items - (img1_hash, img2_hash, score)"""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                [(model_hash, h1, h2, float(score), now) for h1, h2, score in items]
+            )
+            self.puts_since_evict += len(items)
+            if self.puts_since_evict >= EVICT_INTERVAL:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Вытеснение давно не использованных записей сверх лимита
+        self.puts_since_evict = 0
+        count = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM scores WHERE rowid IN "
+                "(SELECT rowid FROM scores ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM scores")
+            self.conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+# Этапы проверки пары в порядке конвейера
+HASH = 'hash'
+DECODE = 'decode'
+PREPROCESS = 'preprocess'
+QUEUE = 'queue'
+ENCODER = 'encoder'
+COMPARATOR = 'comparator'
+RENDER = 'render'
+# Пакетная проверка: время прохода модели, поделенное между парами пачки
+INFERENCE = 'inference'
+
+STAGES = (HASH, DECODE, PREPROCESS, QUEUE, ENCODER, COMPARATOR, INFERENCE, RENDER)
+
+STAGE_NAMES = {
+    HASH: "хэш",
+    DECODE: "декодирование",
+    PREPROCESS: "предобработка",
+    QUEUE: "очередь",
+    ENCODER: "кодировщик",
+    COMPARATOR: "компаратор",
+    INFERENCE: "инференс",
+    RENDER: "визуализация",
+}
+
+TOTAL = 'total'
+
+# Перцентили сводки и число последних проверок, по которым она считается
+PERCENTILES = (0.5, 0.9, 0.99)
+LATENCY_WINDOW = 1000
+
+
+def percentile(values, fraction):
+    """Перцентиль (fraction от 0 до 1) по ближайшему рангу; для пустого списка - 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def format_stages(stage_ms):
+    """Время этапов одной строкой: "декодирование 3 мс • кодировщик 41 мс ..." """
+    return " • ".join(
+        f"{STAGE_NAMES.get(stage, stage)} {stage_ms[stage]:.0f} мс"
+        for stage in sorted(stage_ms, key=_stage_order) if stage != TOTAL
+    )
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+class StageTimer:
+    """Замер времени этапов одной проверки, мс"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name, ms):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def update(self, timings):
+        for name, ms in timings.items():
+            self.add(name, ms)
+
+    def result(self):
+        """Время этапов и общее время с момента создания"""
+        return dict(self.timings, **{TOTAL: (time.perf_counter() - self.started) * 1000})
+
+
+class LatencyStats:
+    """Перцентили времени этапов по последним window проверкам"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.window = window
+        self.samples = {}
+
+    def record(self, stage_ms):
+        with self.lock:
+            for stage, ms in stage_ms.items():
+                if ms is None:
+                    continue
+                if stage not in self.samples:
+                    self.samples[stage] = deque(maxlen=self.window)
+                self.samples[stage].append(ms)
+
+    def summary(self):
+        """{этап: {'count', 'mean', 'p50', 'p90', 'p99'}} в порядке конвейера, 'total' последним"""
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+
+        result = {}
+        for stage in sorted(samples, key=lambda s: (s == TOTAL, _stage_order(s))):
+            values = samples[stage]
+            result[stage] = {'count': len(values), 'mean': sum(values) / len(values)}
+            for fraction in PERCENTILES:
+                result[stage][f"p{round(fraction * 100)}"] = percentile(values, fraction)
+        return result
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+DEFAULT_THRESHOLD = 0.5
+
+# Доля интервала [порог, 1] выше порога, начиная с которой сходство считается высоким
+HIGH_CONFIDENCE_MARGIN = 0.4
+
+# Вердикты сравнения по уровням уверенности
+LEVEL_VERDICTS = {
+    'high': ("ПОДПИСИ СХОДНЫ", "Высокая степень схожести стиля написания."),
+    'medium': ("СХОДСТВО ЕСТЬ", "Обнаружены некоторые схожие характеристики."),
+    'low': ("ПОДПИСИ РАЗЛИЧАЮТСЯ", "Значительные различия в стиле написания."),
+}
+
+LEVEL_TEXTS = {
+    'high': "ВЫСОКАЯ УВЕРЕННОСТЬ",
+    'medium': "СРЕДНЯЯ УВЕРЕННОСТЬ",
+    'low': "НИЗКАЯ УВЕРЕННОСТЬ",
+}
+
+
+def normalize_threshold(value):
+    """Порог в долях единицы (значения больше 1 считаются процентами)"""
+    value = float(value)
+    if value > 1.0:
+        value /= 100.0
+    return min(max(value, 0.01), 0.99)
+
+
+class ThresholdPolicy:
+    """Единая политика вынесения вердикта по оценке модели"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = normalize_threshold(threshold)
+
+    def set_threshold(self, threshold):
+        self.threshold = normalize_threshold(threshold)
+
+    @property
+    def high_threshold(self):
+        # При пороге 0.5 граница высокой уверенности равна 0.7
+        return self.threshold + (1.0 - self.threshold) * HIGH_CONFIDENCE_MARGIN
+
+    def is_genuine(self, score):
+        return score > self.threshold
+
+    def level(self, score):
+        if score > self.high_threshold:
+            return 'high'
+        if score > self.threshold:
+            return 'medium'
+        return 'low'
+
+    def verdict_for_level(self, level):
+        return LEVEL_VERDICTS[level][0]
+
+    def describe(self, score):
+        """Вердикт для одной оценки"""
+        level = self.level(score)
+        verdict, details = LEVEL_VERDICTS[level]
+        return {
+            'verdict': verdict,
+            'details': details,
+            'confidence_level': level,
+            'confidence_text': LEVEL_TEXTS[level],
+            'is_genuine': self.is_genuine(score),
+            'threshold': self.threshold,
+        }
+
+    def levels(self, scores):
+        """Векторизованное определение уровней для массива оценок"""
+        scores = np.asarray(scores, dtype=np.float64)
+        return np.select(
+            [scores > self.high_threshold, scores > self.threshold],
+            ['high', 'medium'],
+            default='low'
+        )
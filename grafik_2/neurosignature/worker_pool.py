@@ -0,0 +1,141 @@
+import os
+import queue
+
+import torch
+import torch.multiprocessing as mp
+
+from .result_cache import ResultCache
+from .batch_inference import BatchVerifier, DEFAULT_BATCH_SIZE
+
+
+# Потоки torch на один процесс: несколько процессов по 2 потока на многоядерных
+# серверах загружают ядра лучше, чем один процесс со всеми потоками
+DEFAULT_THREADS_PER_WORKER = 2
+
+# Пачек на задачу: внутри задачи процесс декодирует следующую пачку, пока считает текущую
+BATCHES_PER_TASK = 4
+
+# Задач в работе на один процесс (очередь не пустеет, пока процесс считает)
+TASKS_PER_WORKER = 2
+
+# Интервал проверки, живы ли процессы, при ожидании результатов
+LIVENESS_CHECK_INTERVAL = 1.0
+
+
+def default_workers(threads_per_worker=DEFAULT_THREADS_PER_WORKER):
+    return max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+
+def _worker_main(model, transform, policy, cache_path, model_hash, threads, batch_size, tasks, results):
+    """Цикл процесса инференса: задачи из общей очереди, результаты - в общую очередь"""
+    torch.set_num_threads(threads)
+    cache = ResultCache(cache_path) if cache_path and model_hash else None
+    # Один поток декодирования: параллелизм обеспечивают сами процессы
+    verifier = BatchVerifier(model, transform, 'cpu', policy=policy, cache=cache,
+                             model_hash=model_hash, batch_size=batch_size, decode_workers=1)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, pairs = task
+        try:
+            results.put((task_id, list(verifier.run(pairs)), None))
+        except Exception as e:
+            results.put((task_id, None, str(e)))
+
+    if cache is not None:
+        cache.close()
+
+
+class InferencePool:
+    """Пул процессов инференса с общими весами модели.
+
+    Веса переносятся в разделяемую память один раз (model.share_memory())
+    и передаются процессам без копирования. Пары делятся на задачи по
+    BATCHES_PER_TASK пачек; свободный процесс забирает следующую задачу из
+    общей очереди, поэтому более быстрые процессы получают больше работы.
+    Инференс в пуле выполняется на CPU.
+    """
+
+    def __init__(self, model, transform, policy=None, cache_path=None, model_hash=None,
+                 workers=None, threads_per_worker=DEFAULT_THREADS_PER_WORKER,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.model = model.cpu().share_memory()
+        self.transform = transform
+        self.policy = policy
+        self.cache_path = cache_path
+        self.model_hash = model_hash
+        self.workers = workers or default_workers(threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.processes = []
+        self.next_task_id = 0
+
+        # spawn: дочерние процессы не наследуют потоки и состояние OpenMP родителя
+        self.context = mp.get_context('spawn')
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+
+    def start(self):
+        for index in range(self.workers):
+            process = self.context.Process(
+                target=_worker_main,
+                args=(self.model, self.transform, self.policy, self.cache_path, self.model_hash,
+                      self.threads_per_worker, self.batch_size, self.tasks, self.results),
+                name=f"InferenceWorker-{index}",
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def close(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, pairs):
+        """Генератор результатов в порядке пар (формат как у BatchVerifier.run)"""
+        task_size = self.batch_size * BATCHES_PER_TASK
+        chunks = [pairs[i:i + task_size] for i in range(0, len(pairs), task_size)]
+        max_in_flight = self.workers * TASKS_PER_WORKER
+
+        first_id = self.next_task_id
+        self.next_task_id += len(chunks)
+        submitted = 0
+        ready = {}
+
+        for index in range(len(chunks)):
+            # Пополнение очереди задач в пределах окна
+            while submitted < len(chunks) and submitted - index < max_in_flight:
+                self.tasks.put((first_id + submitted, chunks[submitted]))
+                submitted += 1
+
+            # Результаты приходят в порядке завершения, отдаются в порядке пар
+            while first_id + index not in ready:
+                task_id, results, error = self._next_result()
+                # Результаты задач прерванного ранее прогона отбрасываются
+                if task_id < first_id:
+                    continue
+                if error:
+                    raise RuntimeError(f"Ошибка процесса инференса: {error}")
+                ready[task_id] = results
+
+            yield from ready.pop(first_id + index)
+
+    def _next_result(self):
+        while True:
+            try:
+                return self.results.get(timeout=LIVENESS_CHECK_INTERVAL)
+            except queue.Empty:
+                dead = [process.name for process in self.processes if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Процессы инференса завершились: {', '.join(dead)}")
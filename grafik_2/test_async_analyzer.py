@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from neurosignature import async_analyzer
+from neurosignature.async_analyzer import AsyncSignatureAnalyzer
+from neurosignature.verdict_policy import ThresholdPolicy
+
+
+class StubEngine:
+    """Движок без модели: оценка - scores[img2], через delays[img2] секунд; без задержки - никогда"""
+
+    def __init__(self, scores, delays):
+        self.scores = scores
+        self.delays = delays
+        self.futures = []
+
+    def submit(self, model, first, second, timings=None):
+        future = Future()
+        self.futures.append(future)
+        delay = self.delays.get(second)
+        if delay is not None:
+            threading.Timer(delay, self._resolve, (future, self.scores[second])).start()
+        return future
+
+    @staticmethod
+    def _resolve(future, score):
+        if not future.cancelled():
+            future.set_result(score)
+
+
+class StubCache:
+    def get(self, model_hash, first_hash, second_hash):
+        return None
+
+    def put(self, model_hash, first_hash, second_hash, score):
+        pass
+
+
+class StubLatency:
+    def record(self, stage_ms):
+        pass
+
+
+class StubAnalyzer:
+    def __init__(self, engine):
+        self.engine = engine
+        self.result_cache = StubCache()
+        self.policy = ThresholdPolicy()
+        self.latency = StubLatency()
+
+    def _active_model(self):
+        return object(), (lambda image: image), "ab" * 32
+
+
+@pytest.fixture(autouse=True)
+def no_files(monkeypatch):
+    """Путь изображения служит и хэшем, и "тензором"; путь broken не декодируется"""
+    def decode(path):
+        if path == "broken":
+            raise OSError("Не удалось открыть файл")
+        return path
+
+    monkeypatch.setattr(async_analyzer, 'image_hash', lambda path: path)
+    monkeypatch.setattr(async_analyzer, 'decode_image', decode)
+
+
+def run(engine, coroutine_factory):
+    async def main():
+        async with AsyncSignatureAnalyzer(StubAnalyzer(engine)) as analyzer:
+            return await coroutine_factory(analyzer)
+    return asyncio.run(main())
+
+
+async def wait_for_submit(engine, count=1):
+    while len(engine.futures) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_timeout_cancels_engine_future():
+    engine = StubEngine({}, {})
+
+    async def scenario(analyzer):
+        with pytest.raises(asyncio.TimeoutError):
+            await analyzer.verify("ref", "pending", timeout=0.2)
+
+    run(engine, scenario)
+    # Запрос не остается в очереди движка после истечения таймаута
+    assert len(engine.futures) == 1
+    assert engine.futures[0].cancelled()
+
+
+def test_cancelled_task_cancels_engine_future():
+    engine = StubEngine({}, {})
+
+    async def scenario(analyzer):
+        task = asyncio.ensure_future(analyzer.verify("ref", "pending"))
+        await wait_for_submit(engine)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(engine, scenario)
+    assert engine.futures[0].cancelled()
+
+
+def test_verify_many_keeps_input_order():
+    # Поздние пары завершаются раньше ранних
+    scores = {"a": 0.1, "b": 0.5, "c": 0.9}
+    engine = StubEngine(scores, {"a": 0.3, "b": 0.2, "c": 0.05})
+
+    async def scenario(analyzer):
+        pairs = [("ref", "a"), ("ref", "broken"), ("ref", "b"), ("ref", "c")]
+        return await analyzer.verify_many(pairs, timeout=5, return_exceptions=True)
+
+    results = run(engine, scenario)
+    assert isinstance(results[1], OSError)
+    assert [results[i]['raw_similarity'] for i in (0, 2, 3)] == [0.1, 0.5, 0.9]
+    assert all(results[i]['model_id'] == "ab" * 32 for i in (0, 2, 3))
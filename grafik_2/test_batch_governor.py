@@ -0,0 +1,62 @@
+import pytest
+
+from neurosignature import batch_governor
+from neurosignature.batch_governor import BatchGovernor
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """Управляемая память процесса: rss.append(МБ) перед каждым замером"""
+    values = []
+    monkeypatch.setattr(batch_governor, 'process_rss_mb', lambda: values[-1] if values else None)
+    return values
+
+
+def test_growth_is_at_most_double(rss):
+    governor = BatchGovernor(rss_limit_mb=1000, latency_slo_ms=200, initial_batch_size=8)
+    assert governor.observe(8, 10) == 16
+    assert governor.state()['limited_by'] == 'growth'
+
+
+def test_latency_limit(rss):
+    governor = BatchGovernor(rss_limit_mb=1000, latency_slo_ms=200, initial_batch_size=8)
+    # Проход: 10 мс накладных расходов + 5 мс на пару
+    for size in (8, 16, 32):
+        governor.observe(size, 10 + size * 5)
+
+    state = governor.state()
+    assert state['overhead_ms'] == pytest.approx(10)
+    assert state['per_sample_ms'] == pytest.approx(5)
+    assert state['batch_size'] == 38
+    assert state['limited_by'] == 'latency'
+
+
+def test_memory_limit(rss):
+    rss.append(500)
+    governor = BatchGovernor(rss_limit_mb=1000, latency_slo_ms=200, initial_batch_size=8)
+    # Каждая пара добавляет 10 МБ
+    for size in (8, 16, 32):
+        rss.append(500 + size * 10)
+        governor.observe(size, 1)
+
+    state = governor.state()
+    assert state['per_sample_mb'] == pytest.approx(10)
+    assert state['batch_size'] == 50
+    assert state['limited_by'] == 'memory'
+
+    # Выход за лимит: пачка сразу уменьшается вдвое
+    rss.append(1200)
+    assert governor.observe(50, 1) == 25
+
+
+def test_partial_batches_do_not_grow(rss):
+    governor = BatchGovernor(latency_slo_ms=200, initial_batch_size=16)
+    assert governor.observe(4, 1) == 16
+
+
+def test_configure_clamps_batch_size(rss):
+    governor = BatchGovernor(latency_slo_ms=200, initial_batch_size=32)
+    governor.configure(max_batch_size=10)
+    assert governor.batch_size == 10
+    assert governor.observe(10, 1) == 10
+    assert governor.state()['limited_by'] == 'max_batch_size'
@@ -0,0 +1,43 @@
+import torch
+from PIL import Image
+
+from neurosignature.batch_inference import BatchVerifier
+from neurosignature.result_cache import ResultCache
+from neurosignature.verdict_policy import ThresholdPolicy
+
+
+def to_tensor(image):
+    pixels = torch.frombuffer(bytearray(image.tobytes()), dtype=torch.uint8)
+    return pixels.float().reshape(1, image.height, image.width) / 255
+
+
+def mean_brightness(first, second):
+    """Модель-заглушка: оценка - средняя яркость второго изображения"""
+    return second.mean(dim=(1, 2, 3))
+
+
+def write_image(path, brightness):
+    Image.new('L', (4, 4), color=brightness).save(path)
+    return str(path)
+
+
+def test_results_carry_scoring_model(tmp_path):
+    reference = write_image(tmp_path / "ref.png", 0)
+    pairs = [{'img1': reference, 'img2': write_image(tmp_path / f"{value}.png", value)} for value in (51, 204)]
+    pairs.append({'img1': reference, 'img2': str(tmp_path / "missing.png")})
+    cache = ResultCache(str(tmp_path / "cache.db"))
+
+    verifier = BatchVerifier(mean_brightness, to_tensor, policy=ThresholdPolicy(), cache=cache,
+                             model_hash="ab" * 32, batch_size=2)
+    results = list(verifier.run(pairs))
+
+    assert [round(result['score'], 2) for result in results[:2]] == [0.2, 0.8]
+    assert [result['confidence_level'] for result in results[:2]] == ['low', 'high']
+    assert results[2]['score'] is None and results[2]['error']
+    # Каждый результат несет модель, на которой посчитан, а не активную в момент чтения
+    assert {result['model_id'] for result in results} == {"ab" * 32}
+
+    # Повторная проверка берется из кэша этой модели
+    cached = list(BatchVerifier(mean_brightness, to_tensor, cache=cache, model_hash="ab" * 32).run(pairs[:2]))
+    assert all(result['cached'] for result in cached)
+    cache.close()
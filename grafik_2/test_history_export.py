@@ -0,0 +1,62 @@
+import csv
+import json
+import os
+
+import pytest
+
+from history_export import export_history, format_from_path, ExportCancelled, EXPORT_COLUMNS
+from history_store import HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.add_many([
+        {'timestamp': f"2025-01-0{day} 10:00:00", 'image_name': f"{day}.png vs ref.png",
+         'processing_type': "Верификация", 'score': day / 10, 'threshold': 0.5,
+         'verdict': "ПОДПИСИ РАЗЛИЧАЮТСЯ", 'confidence_level': 'low', 'stage_ms': {'total': day}}
+        for day in range(1, 6)
+    ])
+    yield store
+    store.close()
+
+
+def test_format_from_path():
+    assert format_from_path("out.CSV") == 'csv'
+    assert format_from_path("out.json") == 'jsonl'
+    assert format_from_path("out.parquet") == 'parquet'
+    with pytest.raises(ValueError):
+        format_from_path("out.xlsx")
+
+
+def test_export_csv(store, tmp_path):
+    path = str(tmp_path / "history.csv")
+    progress = []
+    assert export_history(store, path, progress=lambda done, total: progress.append((done, total)),
+                          chunk_size=2) == 5
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert tuple(rows[0]) == EXPORT_COLUMNS
+    assert [row['image_name'] for row in rows] == [f"{day}.png vs ref.png" for day in range(1, 6)]
+    assert "СТЕПЕНЬ СХОДСТВА: 10.0%" in rows[0]['report']
+    assert json.loads(rows[0]['stage_ms']) == {'total': 1}
+
+
+def test_export_jsonl_with_filters(store, tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    filters = {'date_from': "2025-01-02", 'date_to': "2025-01-03"}
+    assert export_history(store, path, filters=filters) == 2
+
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['score'] for row in rows] == [0.2, 0.3]
+
+
+def test_cancelled_export_leaves_no_file(store, tmp_path):
+    path = str(tmp_path / "history.csv")
+    with pytest.raises(ExportCancelled):
+        export_history(store, path, should_stop=lambda: True)
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
@@ -0,0 +1,312 @@
+import json
+import sqlite3
+
+from history_store import HistoryStore, report_lines
+from neurosignature.verdict_policy import ThresholdPolicy
+from neurosignature.stage_timer import DECODE, TOTAL
+
+
+def make_entry(timestamp, score=None, name="1.png vs 2.png", **fields):
+    entry = {
+        'timestamp': timestamp,
+        'image_name': name,
+        'processing_type': "Верификация",
+        'score': score,
+    }
+    if score is not None:
+        entry.update(ThresholdPolicy().describe(score))
+    entry.update(fields)
+    return entry
+
+
+def open_store(tmp_path):
+    return HistoryStore(str(tmp_path / "history.db"))
+
+
+def test_add_and_get(tmp_path):
+    store = open_store(tmp_path)
+    model_id = "ab" * 32
+    entry_id = store.add(make_entry("2025-01-01 10:00:00", 0.8, model_id=model_id,
+                                    img1_hash="00ff", stage_ms={'total': 12.3456}))
+
+    entry = store.get(entry_id)
+    assert entry['score'] == 0.8
+    assert entry['confidence_level'] == 'high'
+    assert entry['model_id'] == model_id
+    assert entry['img1_hash'] == "00ff"
+    assert entry['stage_ms'] == {'total': 12.346}
+    # Отчет по оценке не хранится, а строится при чтении
+    assert entry['report'] is None
+    assert "СТЕПЕНЬ СХОДСТВА: 80.0%" in report_lines(entry)
+    store.close()
+
+
+def test_long_report_is_compressed(tmp_path):
+    store = open_store(tmp_path)
+    report = "АНАЛИЗ ПОДПИСИ\n" * 100
+    entry_id = store.add(make_entry("2025-01-01 10:00:00", full_result=report))
+
+    raw = store.conn.execute("SELECT report FROM entries WHERE id=?", (entry_id,)).fetchone()[0]
+    assert isinstance(raw, bytes) and len(raw) < len(report.encode('utf-8'))
+    assert store.get(entry_id)['report'] == report
+    store.close()
+
+
+def test_pages_newest_first(tmp_path):
+    store = open_store(tmp_path)
+    ids = store.add_many([make_entry(f"2025-01-0{day} 10:00:00", 0.5) for day in range(1, 6)])
+
+    assert [e['id'] for e in store.page(limit=2)] == ids[::-1][:2]
+    first = store.summary_page(limit=2)
+    second = store.summary_page(limit=2, before=(first[-1]['timestamp'], first[-1]['id']))
+    assert [e['id'] for e in first + second] == ids[::-1][:4]
+    assert [e['id'] for e in store.summaries_after(ids[2])] == ids[:2:-1]
+
+    chunks = list(store.iter_entries(chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [e['id'] for chunk in chunks for e in chunk] == ids
+    store.close()
+
+
+def test_delete_keeps_ids_unique(tmp_path):
+    store = open_store(tmp_path)
+    first, second = store.add_many([make_entry("2025-01-01 10:00:00", 0.5)] * 2)
+    store.delete(second)
+
+    assert store.get(second) is None
+    assert store.count() == 1
+    assert store.add(make_entry("2025-01-02 10:00:00", 0.5)) > second
+    assert store.max_id() == second + 1
+    store.close()
+
+
+def test_rederive_verdicts(tmp_path):
+    store = open_store(tmp_path)
+    scored = store.add(make_entry("2025-01-01 10:00:00", 0.6))
+    unscored = store.add(make_entry("2025-01-01 11:00:00", full_result="Анализ"))
+    assert store.get(scored)['confidence_level'] == 'medium'
+
+    policy = ThresholdPolicy(0.7)
+    assert store.rederive_verdicts(policy) == 1
+
+    entry = store.get(scored)
+    assert entry['confidence_level'] == 'low'
+    assert entry['verdict'] == policy.verdict_for_level('low')
+    assert entry['threshold'] == 0.7
+    assert store.get(unscored)['confidence_level'] is None
+    store.close()
+
+
+def test_text_search(tmp_path):
+    store = open_store(tmp_path)
+    store.add_many([
+        make_entry("2025-01-01 10:00:00", 0.9, name="ivanov_1.png vs ivanov_2.png"),
+        make_entry("2025-01-02 10:00:00", 0.2, name="petrov.png vs scan.png"),
+    ])
+    assert store.has_fts
+
+    def names(text):
+        return [e['image_name'] for e in store.summary_page(filters={'text': text})]
+
+    # Префиксный поиск по словам имени файла и вердикта
+    assert names("ivan") == ["ivanov_1.png vs ivanov_2.png"]
+    assert names("РАЗЛИЧАЮТСЯ") == ["petrov.png vs scan.png"]
+    assert names('scan "petrov') == ["petrov.png vs scan.png"]
+    assert names("sidorov") == []
+    assert store.count({'text': "png"}) == 2
+
+    # Индекс следует за изменением вердикта и удалением
+    store.rederive_verdicts(ThresholdPolicy(0.95))
+    assert len(names("РАЗЛИЧАЮТСЯ")) == 2
+    store.delete(store.summary_page(filters={'text': "petrov"})[0]['id'])
+    assert names("petrov") == []
+    store.close()
+
+
+def test_faceted_filters(tmp_path):
+    store = open_store(tmp_path)
+    store.add_many([
+        make_entry("2025-01-01 10:00:00", 0.9),
+        make_entry("2025-01-02 10:00:00", 0.6, processing_type="Пакетная проверка"),
+        make_entry("2025-01-03 10:00:00", 0.1),
+    ])
+
+    assert store.count({'confidence_level': 'medium'}) == 1
+    assert store.count({'processing_type': "Верификация"}) == 2
+    assert store.count({'date_from': "2025-01-02", 'date_to': "2025-01-02"}) == 1
+    assert store.count({'score_min': 0.5, 'score_max': 0.95}) == 2
+    assert store.facet_values('confidence_level') == ['high', 'low', 'medium']
+    store.close()
+
+
+def test_stats_follow_inserts_deletes_and_rederive(tmp_path):
+    store = open_store(tmp_path)
+    model_id = "cd" * 32
+    ids = store.add_many([
+        make_entry("2025-01-01 10:00:00", 0.95, model_id=model_id),
+        make_entry("2025-01-01 11:00:00", 0.6, model_id=model_id),
+        make_entry("2025-01-02 10:00:00", 0.1),
+        make_entry("2025-01-02 11:00:00", full_result="Анализ", processing_type="Анализ подписи"),
+    ])
+
+    stats = store.stats()
+    assert stats['total'] == 4
+    assert stats['scored'] == 3
+    assert abs(stats['mean_score'] - 0.55) < 1e-9
+    assert stats['by_level'] == {'high': 1, 'medium': 1, 'low': 1, '': 1}
+    assert stats['by_type'] == {"Верификация": 3, "Анализ подписи": 1}
+    assert stats['by_day'] == [("2025-01-01", 2), ("2025-01-02", 2)]
+    assert stats['by_model'][model_id]['total'] == 2
+    assert stats['histogram'][9] == 1 and stats['histogram'][6] == 1 and stats['histogram'][1] == 1
+
+    store.delete(ids[0])
+    store.rederive_verdicts(ThresholdPolicy(0.7))
+    stats = store.stats()
+    assert store.count() == stats['total'] == 3
+    assert stats['by_level'] == {'low': 2, '': 1}
+    assert stats['histogram'][9] == 0
+
+    store.clear()
+    assert store.count() == 0
+    assert store.stats()['by_level'] == {}
+    store.close()
+
+
+def test_stats_rebuilt_for_existing_entries(tmp_path):
+    store = open_store(tmp_path)
+    store.add_many([make_entry("2025-01-01 10:00:00", 0.9), make_entry("2025-01-01 11:00:00", 0.2)])
+    with store.conn:
+        store.conn.execute("DROP TABLE stats")
+    store.close()
+
+    store = open_store(tmp_path)
+    assert store.count() == 2
+    assert store.stats()['by_level'] == {'high': 1, 'low': 1}
+    store.close()
+
+
+def test_latency_summary(tmp_path):
+    store = open_store(tmp_path)
+    store.add_many([
+        make_entry("2025-01-01 10:00:00", 0.9, duration_ms=float(ms), stage_ms={DECODE: ms / 2})
+        for ms in range(1, 101)
+    ])
+
+    summary = store.latency_summary(limit=10)
+    assert list(summary) == [DECODE, TOTAL]
+    assert summary[TOTAL]['count'] == 10
+    assert summary[TOTAL]['mean'] == 95.5
+    assert summary[DECODE]['mean'] == 47.75
+    store.close()
+
+
+LEGACY_REPORT = """РЕЗУЛЬТАТ ВЕРИФИКАЦИИ
+==================================================
+
+ВЕРДИКТ: ПОДПИСИ СХОДНЫ
+СТЕПЕНЬ СХОДСТВА: 91.5%
+УВЕРЕННОСТЬ: ВЫСОКАЯ
+
+КАЧЕСТВО МОДЕЛИ: F1 = 0.9878
+
+ХАРАКТЕРИСТИКИ ПОДПИСЕЙ:
+• Схожесть стиля: 100.0%
+"""
+
+
+def test_migrate_legacy_json(tmp_path):
+    processing = tmp_path / "processing_history.json"
+    verification = tmp_path / "verification_history.json"
+    processing.write_text(json.dumps([
+        {'id': 1, 'timestamp': "2025-01-01 10:00:00", 'image_name': "1.jpg",
+         'processing_type': "Верификация", 'full_result': LEGACY_REPORT},
+        {'id': 2, 'timestamp': "2025-01-01 09:00:00", 'image_name': "2.jpg",
+         'processing_type': "Анализ подписи", 'full_result': "АНАЛИЗ ПОДПИСИ\n• Уверенность анализа: 95.0%"},
+    ], ensure_ascii=False), encoding='utf-8')
+    verification.write_text(json.dumps([
+        {'timestamp': "2025-01-02 10:00:00", 'original_file': "1.jpg", 'test_file': "for1.jpg",
+         'result': "ПОДДЕЛКА", 'confidence': 0.2, 'threshold': 86},
+    ], ensure_ascii=False), encoding='utf-8')
+
+    store = open_store(tmp_path)
+    paths = (str(processing), str(verification))
+    assert store.migrate_legacy_json(paths) == 3
+    # Повторный перенос не выполняется
+    assert store.migrate_legacy_json(paths) == 0
+
+    # Записи упорядочены по времени, а не по порядку в файлах
+    assert store.page()[-1]['image_name'] == "2.jpg"
+    entries = {e['image_name']: e for e in store.page()}
+
+    parsed = entries["1.jpg"]
+    assert parsed['score'] == 0.915
+    assert parsed['confidence_level'] == 'high'
+    # Подробности старого отчета не строятся по оценке и сохраняются (сжатыми)
+    assert parsed['report'] == LEGACY_REPORT
+    raw = store.conn.execute("SELECT report FROM entries WHERE id=?", (parsed['id'],)).fetchone()[0]
+    assert isinstance(raw, bytes)
+    lines = report_lines(parsed)
+    assert lines[0] == "ВЕРДИКТ: ПОДПИСИ СХОДНЫ"
+    assert "КАЧЕСТВО МОДЕЛИ: F1 = 0.9878" in lines
+
+    unscored = entries["2.jpg"]
+    assert unscored['score'] is None
+    assert unscored['confidence_level'] is None
+    assert unscored['report'].startswith("АНАЛИЗ ПОДПИСИ")
+
+    verified = entries["1.jpg vs for1.jpg"]
+    assert verified['score'] == 0.2
+    assert verified['threshold'] == 0.86
+    assert verified['confidence_level'] == 'low'
+    # Отчет из двух строк полностью строится по оценке
+    assert verified['report'] is None
+    assert store.stats()['by_level'] == {'high': 1, 'low': 1, '': 1}
+    store.close()
+
+
+def test_migrate_compact_schema(tmp_path):
+    path = str(tmp_path / "history.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            image_name TEXT,
+            image_path TEXT,
+            processing_type TEXT,
+            result_preview TEXT,
+            full_result TEXT,
+            score REAL,
+            model_id TEXT,
+            verdict TEXT,
+            confidence_level TEXT,
+            threshold REAL
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO entries (timestamp, image_name, full_result, score, model_id) VALUES (?, ?, ?, ?, ?)",
+        [("2025-01-01 10:00:00", "a", "СТЕПЕНЬ СХОДСТВА: 10.0%", None, None),
+         ("2025-01-01 11:00:00", "b", "ВЕРДИКТ: ...", 0.8, "ef" * 32),
+         ("2025-01-01 11:30:00", "d", LEGACY_REPORT, None, None),
+         ("2025-01-01 12:00:00", "c", "Без оценки", None, None)]
+    )
+    conn.execute("DELETE FROM entries WHERE image_name = 'c'")
+    conn.commit()
+    conn.close()
+
+    store = HistoryStore(path)
+    columns = [row[1] for row in store.conn.execute("PRAGMA table_info(entries)")]
+    assert 'full_result' not in columns
+
+    entries = {e['image_name']: e for e in store.page()}
+    assert entries["a"]['score'] == 0.1
+    assert entries["a"]['confidence_level'] == 'low'
+    assert entries["b"]['confidence_level'] == 'high'
+    assert entries["b"]['model_id'] == "ef" * 32
+    assert entries["b"]['report'] is None
+    assert entries["d"]['score'] == 0.915
+    assert entries["d"]['report'] == LEGACY_REPORT
+    assert store.stats()['by_level'] == {'high': 2, 'low': 1}
+    # Идентификаторы удаленных записей не выдаются снова
+    assert store.add(make_entry("2025-01-02 10:00:00", 0.5)) == 5
+    store.close()
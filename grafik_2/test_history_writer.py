@@ -0,0 +1,109 @@
+import os
+import sqlite3
+
+import history_writer
+from history_store import HistoryStore
+from history_writer import HistoryWriter
+from neurosignature.verdict_policy import ThresholdPolicy
+
+
+class FlakyStore:
+    """Обертка хранилища: первые failures вызовов add_many завершаются ошибкой"""
+
+    def __init__(self, store, failures):
+        self.store = store
+        self.db_path = store.db_path
+        self.lock = store.lock
+        self.failures = failures
+
+    def add_many(self, entries):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.store.add_many(entries)
+
+
+def entry(name):
+    return {'timestamp': "2025-01-01 10:00:00", 'image_name': name, 'processing_type': "Верификация"}
+
+
+def test_batches_are_written(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    written = []
+    writer = HistoryWriter(store, on_written=written.extend, flush_interval=0.01)
+    for i in range(5):
+        writer.submit(entry(f"{i}.png"))
+    writer.flush()
+
+    assert store.count() == 5
+    assert sorted(e['id'] for e in written) == [1, 2, 3, 4, 5]
+    writer.close()
+    store.close()
+
+
+def test_failed_batch_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_writer, 'RETRY_DELAY', 0.01)
+    store = HistoryStore(str(tmp_path / "history.db"))
+    errors = []
+    writer = HistoryWriter(FlakyStore(store, failures=2), on_error=errors.append, flush_interval=0.01)
+    writer.submit(entry("1.png"))
+    writer.flush()
+
+    assert store.count() == 1
+    assert len(errors) == 2
+    writer.close()
+    store.close()
+
+
+def test_flush_times_out_while_database_refuses_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_writer, 'RETRY_DELAY', 0.01)
+    store = HistoryStore(str(tmp_path / "history.db"))
+    flaky = FlakyStore(store, failures=1000)
+    writer = HistoryWriter(flaky, on_error=lambda message: None, flush_interval=0.01)
+    writer.submit(entry("1.png"))
+
+    assert not writer.flush(timeout=0.1)
+    flaky.failures = 0
+    assert writer.flush(timeout=5)
+    assert store.count() == 1
+    writer.close()
+    store.close()
+
+
+def test_prepare_runs_at_insert_time(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    policy = ThresholdPolicy(0.5)
+
+    def prepare(batch):
+        for item in batch:
+            item['confidence_level'] = policy.level(item['score'])
+
+    writer = HistoryWriter(store, prepare=prepare, flush_interval=0.2)
+    writer.submit(dict(entry("1.png"), score=0.6))
+    # Порог изменен, пока запись ждет в очереди
+    policy.set_threshold(0.7)
+    writer.flush()
+
+    assert store.page()[0]['confidence_level'] == 'low'
+    writer.close()
+    store.close()
+
+
+def test_unwritten_entries_are_kept_on_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_writer, 'RETRY_DELAY', 0.01)
+    store = HistoryStore(str(tmp_path / "history.db"))
+    writer = HistoryWriter(FlakyStore(store, failures=1000), on_error=lambda message: None,
+                           flush_interval=0.01)
+    writer.submit(entry("1.png"))
+    writer.submit(entry("2.png"))
+    writer.close()
+
+    assert store.count() == 0
+    assert os.path.exists(writer.spill_path)
+
+    # Следующий запуск переносит сохраненные записи в базу
+    writer = HistoryWriter(store)
+    assert not os.path.exists(writer.spill_path)
+    assert sorted(e['image_name'] for e in store.page()) == ["1.png", "2.png"]
+    writer.close()
+    store.close()
@@ -0,0 +1,170 @@
+import csv
+import glob
+import json
+import os
+import sqlite3
+
+import pytest
+
+from history_store import HistoryStore
+from inbox_daemon import InboxDaemon, InboxState, ReferenceMatcher, FAILED, PROCESSED, MAX_ATTEMPTS, STABLE_CHECKS
+from neurosignature.batch_inference import REFERENCE_DIR
+from neurosignature.verdict_policy import ThresholdPolicy
+
+
+class FakeAnalyzer:
+    """Пакетная проверка без модели: файлы из broken завершаются ошибкой"""
+
+    model_checksum = "ab" * 32
+    # Модель, посчитавшая оценки; активная к моменту записи уже другая
+    scoring_model = "cd" * 32
+
+    def __init__(self):
+        self.policy = ThresholdPolicy()
+        self.broken = set()
+        self.checked = []
+
+    def verify_batch(self, pairs):
+        for pair in pairs:
+            self.checked.append(os.path.basename(pair['img2']))
+            result = {
+                'img1': pair['img1'], 'img2': pair['img2'], 'label': None,
+                'score': None, 'cached': False, 'error': None, 'hashes': None,
+                'hash_ms': 1.0, 'decode_ms': 2.0, 'preprocess_ms': 0.5, 'inference_ms': 3.0,
+                'model_id': self.scoring_model,
+            }
+            if os.path.basename(pair['img2']) in self.broken:
+                result['error'] = "Не удалось открыть файл"
+            else:
+                result['score'] = 0.9
+                result.update(self.policy.describe(0.9))
+            yield result
+
+
+def write(path, data=b"image"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    inbox = tmp_path / "inbox"
+    write(str(inbox / REFERENCE_DIR / "12345.png"))
+    return inbox
+
+
+@pytest.fixture
+def daemon(inbox, tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    daemon = InboxDaemon(FakeAnalyzer(), str(inbox), str(tmp_path / "results"), store)
+    yield daemon
+    daemon.close()
+    store.close()
+
+
+def poll(daemon, times=STABLE_CHECKS + 1):
+    return sum(daemon.run_once() for _ in range(times))
+
+
+def test_state_retries_failed_versions(tmp_path):
+    state = InboxState(str(tmp_path / "state.db"), max_attempts=2)
+    signature = (10, 1)
+
+    for _ in range(2):
+        assert not state.is_processed("a.png", signature)
+        state.mark_many([("a.png", signature, "ref.png", FAILED, None, "error")])
+    assert state.is_processed("a.png", signature)
+    assert state.attempts("a.png") == 2
+
+    # Новая версия файла проверяется заново
+    assert not state.is_processed("a.png", (11, 2))
+    state.mark_many([("a.png", (11, 2), "ref.png", PROCESSED, 0.9, None)])
+    state.close()
+
+    state = InboxState(str(tmp_path / "state.db"))
+    assert state.is_processed("a.png", (11, 2))
+    assert state.attempts("a.png") == 0
+    state.close()
+
+
+def test_state_upgrades_old_database(tmp_path):
+    path = str(tmp_path / "state.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE processed (
+            path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, reference TEXT,
+            status TEXT NOT NULL, score REAL, error TEXT, processed_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("INSERT INTO processed VALUES ('a.png', 1, 1, NULL, 'failed', NULL, 'error', '')")
+    conn.execute("INSERT INTO processed VALUES ('b.png', 1, 1, NULL, 'processed', 0.5, NULL, '')")
+    conn.commit()
+    conn.close()
+
+    state = InboxState(path)
+    # Ошибка, записанная до учета попыток, считается первой попыткой
+    assert not state.is_processed('a.png', (1, 1))
+    assert state.attempts('a.png') == 1
+    assert state.is_processed('b.png', (1, 1))
+    state.close()
+
+
+def test_reference_matcher(tmp_path):
+    references = tmp_path / "references"
+    write(str(references / "12345.png"))
+    write(str(references / "nested" / "777.jpg"))
+    matcher = ReferenceMatcher(str(references))
+    matcher.refresh()
+
+    assert matcher.match(str(tmp_path / "12345_scan.png")) == str(references / "12345.png")
+    assert matcher.match(str(tmp_path / "777.png")) == str(references / "nested" / "777.jpg")
+    assert matcher.match(str(tmp_path / "999_scan.png")) is None
+
+    # Файл-спутник важнее правила именования
+    (tmp_path / "12345_other.json").write_text(json.dumps({'reference': "nested/777.jpg"}))
+    assert matcher.match(str(tmp_path / "12345_other.png")) == str(references / "nested" / "777.jpg")
+
+
+def test_new_files_are_processed_once(daemon, inbox):
+    write(str(inbox / "12345_scan.png"))
+
+    # Файл берется в работу только после STABLE_CHECKS одинаковых опросов
+    assert poll(daemon, STABLE_CHECKS - 1) == 0
+    assert poll(daemon, 1) == 1
+    assert poll(daemon) == 0
+
+    output, = glob.glob(os.path.join(daemon.output_dir, "results-*.csv"))
+    with open(output, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['questioned'] for row in rows] == [str(inbox / "12345_scan.png")]
+    assert rows[0]['model_id'] == FakeAnalyzer.scoring_model
+
+    entry = daemon.history_store.page()[0]
+    assert entry['image_name'] == "12345.png vs 12345_scan.png"
+    assert entry['score'] == 0.9
+    assert entry['model_id'] == FakeAnalyzer.scoring_model
+
+    # Измененный файл проверяется снова
+    write(str(inbox / "12345_scan.png"), b"rescanned image")
+    assert poll(daemon) == 1
+    assert daemon.analyzer.checked == ["12345_scan.png"] * 2
+
+
+def test_file_waits_for_reference(daemon, inbox):
+    write(str(inbox / "555_scan.png"))
+    assert poll(daemon) == 0
+    assert str(inbox / "555_scan.png") in daemon.waiting
+
+    write(str(inbox / REFERENCE_DIR / "555.png"))
+    assert poll(daemon, 1) == 1
+    assert not daemon.waiting
+
+
+def test_failed_files_are_retried_a_bounded_number_of_times(daemon, inbox):
+    daemon.analyzer.broken.add("12345_scan.png")
+    write(str(inbox / "12345_scan.png"))
+
+    poll(daemon, (STABLE_CHECKS + 1) * (MAX_ATTEMPTS + 2))
+    assert daemon.analyzer.checked == ["12345_scan.png"] * MAX_ATTEMPTS
+    assert daemon.history_store.count() == 0
@@ -0,0 +1,156 @@
+import threading
+
+import pytest
+import torch
+
+from neurosignature.inference_engine import InferenceEngine, EngineOverloaded, BATCH, INTERACTIVE
+from neurosignature.stage_timer import QUEUE, ENCODER, COMPARATOR
+
+
+def sample(value):
+    """Тензор изображения [C, H, W], по которому модель возвращает value"""
+    return torch.full((1, 2, 2), float(value))
+
+
+class RecordingModel:
+    """Оценка пары - значение первого тензора; проходы записываются, первый можно задержать"""
+
+    def __init__(self):
+        self.passes = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, first, second):
+        self.passes.append(first[:, 0, 0, 0].tolist())
+        self.entered.set()
+        self.release.wait(5)
+        return first[:, 0, 0, 0]
+
+    def encode(self, batch):
+        return batch.flatten(1)
+
+
+class EncoderComparator(RecordingModel):
+    def compare(self, first, second):
+        return (first - second).abs().mean(dim=1)
+
+
+@pytest.fixture
+def engine():
+    engine = InferenceEngine(max_batch_size=2, max_wait_ms=1)
+    yield engine
+    engine.close()
+
+
+def block(engine, model):
+    """Занимает поток движка проходом, который ждет model.release"""
+    model.release.clear()
+    model.entered.clear()
+    future = engine.submit(model, sample(-1), sample(0))
+    assert model.entered.wait(5)
+    return future
+
+
+def test_scores_are_returned(engine):
+    model = RecordingModel()
+    timings = {}
+    assert engine.score(model, sample(0.25), sample(0), timeout=5, timings=timings) == 0.25
+    assert set(timings) == {QUEUE, ENCODER}
+
+
+def test_interactive_requests_go_first(engine):
+    model = RecordingModel()
+    blocker = block(engine, model)
+
+    batch = engine.submit_many(model, [(sample(i), sample(0)) for i in range(1, 5)], tenant='job')
+    interactive = engine.submit(model, sample(9), sample(0))
+    model.release.set()
+
+    assert interactive.result(5) == 9
+    assert [future.result(5) for future in batch] == [1, 2, 3, 4]
+    blocker.result(5)
+    assert model.passes == [[-1], [9], [1, 2], [3, 4]]
+
+
+def test_batch_jobs_share_passes(engine):
+    model = RecordingModel()
+    block(engine, model)
+
+    first = engine.submit_many(model, [(sample(i), sample(0)) for i in (1, 2, 3, 4)], tenant='first')
+    second = engine.submit_many(model, [(sample(i), sample(0)) for i in (10, 20)], tenant='second')
+    model.release.set()
+    for future in first + second:
+        future.result(5)
+
+    # По одной паре от каждого задания за проход, пока у обоих есть работа
+    assert model.passes[1:] == [[1, 10], [2, 20], [3, 4]]
+    stats = engine.stats()
+    assert stats['classes'][BATCH]['requests'] == 6
+    assert stats['classes'][INTERACTIVE]['requests'] == 1
+
+
+def test_full_queue_rejects_interactive_requests():
+    engine = InferenceEngine(max_batch_size=1, max_queue=1)
+    model = RecordingModel()
+    blocker = block(engine, model)
+
+    queued = engine.submit(model, sample(1), sample(0))
+    with pytest.raises(EngineOverloaded):
+        engine.submit(model, sample(2), sample(0))
+    # Пакетные пары лимитом очереди не ограничиваются
+    batch = engine.submit_many(model, [(sample(3), sample(0))])
+    model.release.set()
+
+    assert [blocker.result(5), queued.result(5), batch[0].result(5)] == [-1, 1, 3]
+    assert engine.stats()['rejected'] == 1
+    engine.close()
+
+
+def test_cancelled_requests_are_skipped(engine):
+    model = RecordingModel()
+    block(engine, model)
+    cancelled = engine.submit(model, sample(1), sample(0))
+    kept = engine.submit(model, sample(2), sample(0))
+    assert cancelled.cancel()
+    model.release.set()
+
+    assert kept.result(5) == 2
+    assert model.passes[1:] == [[2]]
+
+
+def test_encoder_and_comparator_stages(engine):
+    model = EncoderComparator()
+    timings = {}
+    score = engine.submit(model, sample(0.5), sample(0.25), timings=timings).result(5)
+    assert score == pytest.approx(0.25)
+    assert set(timings) == {QUEUE, ENCODER, COMPARATOR}
+    assert engine.submit_encode(model, sample(1)).result(5) == [1.0, 1.0, 1.0, 1.0]
+
+
+def test_model_errors_reach_callers(engine):
+    class BrokenModel:
+        def __call__(self, first, second):
+            raise RuntimeError("out of memory")
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        engine.score(BrokenModel(), sample(1), sample(0), timeout=5)
+    # Поток движка продолжает работу
+    assert engine.score(RecordingModel(), sample(1), sample(0), timeout=5) == 1
+
+
+def test_governor_errors_do_not_stop_engine():
+    class BrokenGovernor:
+        batch_size = 4
+
+        def observe(self, batch_size, elapsed_ms):
+            raise ValueError("bad sample")
+
+        def state(self):
+            return {}
+
+    engine = InferenceEngine(governor=BrokenGovernor())
+    model = RecordingModel()
+    assert engine.score(model, sample(1), sample(0), timeout=5) == 1
+    assert engine.score(model, sample(2), sample(0), timeout=5) == 2
+    engine.close()
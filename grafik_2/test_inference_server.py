@@ -0,0 +1,139 @@
+import json
+import http.client
+import threading
+
+import pytest
+
+from neurosignature.inference_engine import EngineOverloaded
+from neurosignature.inference_server import InferenceHTTPServer, MAX_BODY_BYTES, RETRY_AFTER
+
+
+class StubAnalyzer:
+    """Анализатор без модели: analyze_pair ждет release, если задан"""
+
+    model_path = "/models/signature.pth"
+    model_checksum = "ab" * 32
+
+    def __init__(self):
+        self.ready = True
+        self.overloaded = False
+        self.release = None
+        self.entered = threading.Event()
+
+    def is_ready(self):
+        return self.ready
+
+    def analyze_pair(self, img1_path, img2_path):
+        self.entered.set()
+        if self.release is not None:
+            self.release.wait(5)
+        if self.overloaded:
+            raise EngineOverloaded("Очередь движка заполнена")
+        return {'score': 0.9, 'model_id': self.model_checksum}
+
+
+@pytest.fixture
+def server():
+    server = InferenceHTTPServer(StubAnalyzer(), ("127.0.0.1", 0), max_inflight=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+@pytest.fixture
+def pair(tmp_path):
+    paths = []
+    for name in ("ref.png", "questioned.png"):
+        (tmp_path / name).write_bytes(b"image")
+        paths.append(str(tmp_path / name))
+    return {'img1': paths[0], 'img2': paths[1]}
+
+
+def request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def post_with_length(server, length):
+    """POST /verify с произвольным Content-Length и без тела"""
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        conn.putrequest('POST', '/verify')
+        conn.putheader('Content-Length', length)
+        conn.endheaders()
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_health_and_ready(server):
+    status, _, payload = request(server, 'GET', '/health')
+    assert (status, payload) == (200, {'status': 'ok'})
+
+    status, _, payload = request(server, 'GET', '/ready')
+    assert status == 200
+    assert payload == {'ready': True, 'model': "signature.pth", 'model_id': "ab" * 32}
+
+    # Процесс жив, но модель не загружена
+    server.analyzer.ready = False
+    status, _, payload = request(server, 'GET', '/ready')
+    assert status == 503 and payload['ready'] is False
+    assert request(server, 'GET', '/health')[0] == 200
+
+
+def test_verify(server, pair):
+    status, _, payload = request(server, 'POST', '/verify', json.dumps(pair))
+    assert (status, payload['score']) == (200, 0.9)
+
+    status, _, _ = request(server, 'POST', '/verify', json.dumps(dict(pair, img2="/missing.png")))
+    assert status == 404
+
+
+def test_bad_content_length(server):
+    status, _, payload = post_with_length(server, "abc")
+    assert status == 400 and "Content-Length" in payload['error']
+    assert post_with_length(server, "-1")[0] == 400
+
+    # Тело сверх лимита не читается
+    assert post_with_length(server, str(MAX_BODY_BYTES + 1))[0] == 413
+    assert request(server, 'GET', '/health')[0] == 200
+
+
+def test_admission_control(server, pair):
+    server.admission = threading.BoundedSemaphore(1)
+    analyzer = server.analyzer
+    analyzer.release = threading.Event()
+    first = {}
+    worker = threading.Thread(target=lambda: first.update(
+        result=request(server, 'POST', '/verify', json.dumps(pair))))
+    worker.start()
+    assert analyzer.entered.wait(5)
+
+    # Единственное место занято: следующий запрос сразу получает 503
+    status, headers, _ = request(server, 'POST', '/verify', json.dumps(pair))
+    assert status == 503
+    assert headers['Retry-After'] == str(RETRY_AFTER)
+
+    analyzer.release.set()
+    worker.join(5)
+    assert first['result'][0] == 200
+
+
+def test_overloaded_engine_and_unready_model(server, pair):
+    server.analyzer.overloaded = True
+    status, headers, _ = request(server, 'POST', '/verify', json.dumps(pair))
+    assert status == 503 and headers['Retry-After'] == str(RETRY_AFTER)
+
+    server.analyzer.overloaded = False
+    server.analyzer.ready = False
+    status, headers, _ = request(server, 'POST', '/verify', json.dumps(pair))
+    assert status == 503 and 'Retry-After' in headers
@@ -0,0 +1,99 @@
+import pytest
+
+from neurosignature.job_queue import JobStore, run_job, PENDING, RUNNING, DONE, FAILED, DEAD
+
+
+def make_pairs(count):
+    return [{'img1': f"ref/{i}.png", 'img2': f"scan/{i}.png", 'label': 1.0} for i in range(count)]
+
+
+class FakeVerifier:
+    """Оценка по номеру пары; пары из broken всегда завершаются ошибкой"""
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.calls = 0
+
+    def run(self, tasks):
+        self.calls += 1
+        for task in tasks:
+            if task['seq'] in self.broken:
+                yield {'error': "Не удалось открыть файл"}
+            else:
+                yield {'score': task['seq'] / 10, 'verdict': "ПОДПИСИ СХОДНЫ", 'confidence_level': 'high'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), max_attempts=2)
+    yield store
+    store.close()
+
+
+def test_claim_is_exclusive_and_ordered(store):
+    job_id = store.create_job(make_pairs(5), name="test")
+
+    first = store.claim(job_id, limit=3)
+    second = store.claim(job_id, limit=3)
+    assert [task['seq'] for task in first] == [0, 1, 2]
+    assert [task['seq'] for task in second] == [3, 4]
+    assert store.claim(job_id) == []
+    assert store.progress(job_id)[RUNNING] == 5
+
+
+def test_complete_and_finish(store):
+    job_id = store.create_job(make_pairs(2))
+    tasks = store.claim(job_id)
+    store.complete(job_id, tasks, [{'score': 0.9}, {'score': 0.1}])
+
+    assert store.progress(job_id)[DONE] == 2
+    assert store.get_job(job_id)['finished'] is not None
+    assert [task['score'] for task in store.iter_tasks(job_id)] == [0.9, 0.1]
+
+
+def test_failed_pairs_retry_then_dead_letter(store):
+    job_id = store.create_job(make_pairs(3))
+    verifier = FakeVerifier(broken={1})
+
+    progress = run_job(store, job_id, verifier, chunk_size=10)
+    # Первая попытка, повтор, затем пара отложена
+    assert verifier.calls == 2
+    assert progress[DONE] == 2
+    assert progress[DEAD] == 1
+    dead = list(store.iter_tasks(job_id, statuses=[DEAD]))
+    assert dead[0]['seq'] == 1 and dead[0]['attempts'] == 2
+    assert store.get_job(job_id)['finished'] is not None
+
+    # Повторная постановка после исправления файла
+    assert store.requeue_dead(job_id) == 1
+    assert store.get_job(job_id)['finished'] is None
+    progress = run_job(store, job_id, FakeVerifier(), chunk_size=10)
+    assert progress[DONE] == 3
+
+
+def test_interrupted_job_resumes(store):
+    job_id = store.create_job(make_pairs(4))
+    # Порция захвачена, но процесс остановился до фиксации
+    store.claim(job_id, limit=2)
+
+    stops = iter([False, True])
+    progress = run_job(store, job_id, FakeVerifier(), chunk_size=2, should_stop=lambda: next(stops))
+    # Прерванная порция возвращается в очередь и обрабатывается первой
+    assert progress[DONE] == 2
+    assert progress[PENDING] == 2
+    assert [task['attempts'] for task in store.iter_tasks(job_id, statuses=[DONE])] == [2, 2]
+
+    progress = run_job(store, job_id, FakeVerifier(), chunk_size=2)
+    assert progress == {PENDING: 0, RUNNING: 0, DONE: 4, FAILED: 0, DEAD: 0}
+
+
+def test_verifier_crash_counts_attempt(store):
+    class CrashingVerifier:
+        def run(self, tasks):
+            raise RuntimeError("CUDA error")
+
+    job_id = store.create_job(make_pairs(2))
+    with pytest.raises(RuntimeError):
+        run_job(store, job_id, CrashingVerifier())
+    assert store.progress(job_id)[FAILED] == 2
+    assert {task['error'] for task in store.iter_tasks(job_id)} == {"CUDA error"}
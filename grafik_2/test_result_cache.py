@@ -0,0 +1,70 @@
+from neurosignature import result_cache
+from neurosignature.result_cache import ResultCache, image_hash
+
+
+def test_get_put(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+
+    assert cache.get("model", "a", "b") is None
+    cache.put("model", "a", "b", 0.75)
+    assert cache.get("model", "a", "b") == 0.75
+    # Порядок изображений и модель входят в ключ
+    assert cache.get("model", "b", "a") is None
+    assert cache.get("other", "a", "b") is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 3
+    assert stats['entries'] == 1
+    cache.close()
+
+
+def test_entries_survive_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(path)
+    cache.put_many("model", [("a", "b", 0.1), ("c", "d", 0.9)])
+    cache.close()
+
+    cache = ResultCache(path)
+    assert cache.get("model", "c", "d") == 0.9
+    assert cache.stats()['entries'] == 2
+    cache.close()
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, 'EVICT_INTERVAL', 1)
+    cache = ResultCache(str(tmp_path / "cache.db"), max_entries=2)
+
+    cache.put("model", "a", "1", 0.1)
+    cache.put("model", "a", "2", 0.2)
+    # Обращение обновляет время использования: вытесняется второй ключ
+    cache.conn.execute("UPDATE scores SET last_used = last_used - 10 WHERE img2_hash IN ('1', '2')")
+    cache.get("model", "a", "1")
+    cache.put("model", "a", "3", 0.3)
+
+    assert cache.stats()['entries'] == 2
+    assert cache.get("model", "a", "1") == 0.1
+    assert cache.get("model", "a", "2") is None
+    assert cache.get("model", "a", "3") == 0.3
+    cache.close()
+
+
+def test_clear_resets_counters(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    cache.put("model", "a", "b", 0.5)
+    cache.get("model", "a", "b")
+    cache.clear()
+
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'entries': 0}
+    cache.close()
+
+
+def test_image_hash_depends_on_content(tmp_path):
+    first = tmp_path / "1.png"
+    second = tmp_path / "2.png"
+    first.write_bytes(b"signature")
+    second.write_bytes(b"signature")
+    assert image_hash(str(first)) == image_hash(str(second))
+
+    second.write_bytes(b"other")
+    assert image_hash(str(first)) != image_hash(str(second))
@@ -0,0 +1,41 @@
+import pytest
+
+from neurosignature.verdict_policy import ThresholdPolicy, normalize_threshold, LEVEL_VERDICTS
+
+
+def test_normalize_threshold():
+    assert normalize_threshold(0.6) == 0.6
+    # Значения больше 1 - проценты
+    assert normalize_threshold(86) == pytest.approx(0.86)
+    assert normalize_threshold(0) == 0.01
+    assert normalize_threshold(100) == 0.99
+
+
+def test_levels_follow_threshold():
+    policy = ThresholdPolicy(0.5)
+    assert policy.high_threshold == pytest.approx(0.7)
+    assert policy.level(0.9) == 'high'
+    assert policy.level(0.6) == 'medium'
+    assert policy.level(0.5) == 'low'
+    assert policy.is_genuine(0.51)
+    assert not policy.is_genuine(0.5)
+
+    policy.set_threshold(80)
+    assert policy.level(0.6) == 'low'
+    assert policy.level(0.85) == 'medium'
+    assert policy.level(0.95) == 'high'
+
+
+def test_describe():
+    description = ThresholdPolicy(0.5).describe(0.9)
+    assert description['verdict'] == LEVEL_VERDICTS['high'][0]
+    assert description['details'] == LEVEL_VERDICTS['high'][1]
+    assert description['confidence_level'] == 'high'
+    assert description['is_genuine']
+    assert description['threshold'] == 0.5
+
+
+def test_vectorized_levels_match_scalar():
+    policy = ThresholdPolicy(0.4)
+    scores = [0.0, 0.4, 0.41, 0.64, 0.65, 1.0]
+    assert list(policy.levels(scores)) == [policy.level(score) for score in scores]